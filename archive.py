@@ -0,0 +1,156 @@
+from config import get_db_connection
+from jobs import JobRejected
+from project_management import CLOSED_PROJECT_STATUSES
+from collections import Counter
+from datetime import date, datetime, timedelta
+import dashboard
+import logging
+import os
+import sys
+import time
+import queries
+
+# Moves closed projects out of the hot tables. A project in one of the
+# closed_project_statuses whose end_date is more than archive_after_days ago is
+# copied with its timeline, cost and assignment rows into the *_archive tables
+# and deleted from the hot ones, one batch of projects per transaction.
+# Reads opt in with ?include_archived=1 and fall through to the archive when the
+# project is no longer hot. Daily load rows of archived assignments are left in
+# place; they only cover past days. Archived rows keep their ids, which MySQL 8
+# never hands out again because it persists each table's AUTO_INCREMENT counter.
+#   python archive.py report                   table sizes and the timeline/cost join time
+#   python archive.py run [days] [--report]    archive; --report measures before and after
+
+ARCHIVE_AFTER_DAYS = int(os.getenv('archive_after_days', '365'))
+ARCHIVE_BATCH_SIZE = int(os.getenv('archive_batch_size', '200'))
+
+HOT_TABLES = ('projects', 'proj_breakdown', 'proj_cost', 'project_assignments')
+ARCHIVE_TABLES = tuple(f"{table}_archive" for table in HOT_TABLES)
+
+
+def archive_batch(connection, cutoff, archived_at, limit=ARCHIVE_BATCH_SIZE):
+    # Returns {hot table: rows moved}, or {} once nothing is left to archive.
+    # The candidates stay locked until commit, so a concurrent edit either lands
+    # before the copy or finds the project gone.
+    cursor = connection.cursor()
+    try:
+        connection.begin()
+        candidates = queries.fetchall(cursor, queries.ARCHIVE_CANDIDATES, (cutoff, CLOSED_PROJECT_STATUSES, limit))
+        if not candidates:
+            connection.rollback()
+            return {}
+        ids = [proj_id for proj_id, _, _ in candidates]
+        for _, batch in queries.ARCHIVE_COPY:
+            queries.execute_by_ids(cursor, batch, ids, scope=(archived_at,))
+        moved = {table: queries.execute_by_ids(cursor, batch, ids) for table, batch in queries.ARCHIVE_DELETE}
+        # The status counters describe the hot table, as reconcile() rebuilds them
+        for (tenant, status), count in Counter((tenant, status) for _, tenant, status in candidates).items():
+            dashboard.bump(cursor, dashboard.project_status_key(tenant, status), -count)
+        connection.commit()
+        return moved
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def _probe(cursor, rounds=3):
+    # Best of a few runs of the join the timeline and cost reads pay for
+    best = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        row = queries.fetchone(cursor, queries.ARCHIVE_PROBE)
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return dict(queries.ARCHIVE_PROBE.to_dict(row), ms=round(best, 1))
+
+
+def report(connection):
+    cursor = connection.cursor()
+    try:
+        # information_schema serves cached statistics until the tables are analyzed
+        cursor.execute(f"ANALYZE TABLE {', '.join(HOT_TABLES + ARCHIVE_TABLES)}")
+        cursor.fetchall()
+        sizes = {table: {'rows': rows, 'bytes': size}
+                 for table, rows, size in queries.fetchall(cursor, queries.TABLE_SIZES,
+                                                           (','.join(HOT_TABLES + ARCHIVE_TABLES),))}
+        return {'tables': sizes, 'probe': _probe(cursor)}
+    finally:
+        cursor.close()
+
+
+def check_after_days(value):
+    # Anything under a day would archive projects that closed today
+    after_days = int(value)
+    if after_days < 1:
+        raise ValueError(f"after_days must be at least 1, got {after_days}")
+    return after_days
+
+
+def run(connection, after_days=ARCHIVE_AFTER_DAYS, measure=False):
+    # measure=True analyzes every hot and archive table and times the join probe
+    # before and after; that is for an operator at the console, not for the job.
+    cutoff = date.today() - timedelta(days=check_after_days(after_days))
+    archived_at = datetime.now()
+    before = report(connection) if measure else None
+    moved = Counter()
+    while True:
+        batch = archive_batch(connection, cutoff, archived_at)
+        if not batch:
+            break
+        moved.update(batch)
+        logging.info(f"Archived {batch.get('projects', 0)} project(s) ending before {cutoff}")
+    if not measure:
+        logging.info(f"Archive run moved {dict(moved)}")
+        return {'cutoff': cutoff, 'moved': dict(moved)}
+    after = report(connection)
+    logging.info(f"Archive run moved {dict(moved)}; timeline/cost join "
+                 f"{before['probe']['ms']} ms -> {after['probe']['ms']} ms")
+    return {'cutoff': cutoff, 'moved': dict(moved), 'before': before, 'after': after}
+
+
+def archive_job(cursor, payload):
+    # Background job entry point (`python jobs.py enqueue archive_projects
+    # '{"after_days": 730}'`). It archives every workshop, so it is not public.
+    # Batches commit as they go, so a retry picks up where a failed run stopped.
+    try:
+        after_days = check_after_days(payload.get('after_days', ARCHIVE_AFTER_DAYS))
+    except (TypeError, ValueError) as e:
+        raise JobRejected(f"Invalid after_days: {e}")
+    return run(cursor.connection, after_days)
+
+
+def _print_report(label, result):
+    print(label)
+    for table in HOT_TABLES + ARCHIVE_TABLES:
+        size = result['tables'].get(table, {'rows': 0, 'bytes': 0})
+        print(f"  {table:<30} {size['rows'] or 0:>12} rows {(size['bytes'] or 0) / 1048576:>10.1f} MiB")
+    probe = result['probe']
+    print(f"  timeline/cost join: {probe['timeline_rows']} + {probe['cost_rows']} rows in {probe['ms']} ms")
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'report'
+    if command not in ('report', 'run'):
+        sys.exit(f"Unknown command '{command}'. Use report or run.")
+    connection = get_db_connection()
+    if connection is None:
+        sys.exit("Failed to establish database connection.")
+    try:
+        if command == 'report':
+            _print_report('Current', report(connection))
+        else:
+            args = [arg for arg in sys.argv[2:] if arg != '--report']
+            measure = '--report' in sys.argv[2:]
+            try:
+                after_days = check_after_days(args[0]) if args else ARCHIVE_AFTER_DAYS
+            except ValueError as e:
+                sys.exit(str(e))
+            result = run(connection, after_days, measure)
+            print(f"Archived projects closed and ended before {result['cutoff']}: {result['moved']}")
+            if measure:
+                _print_report('Before', result['before'])
+                _print_report('After', result['after'])
+    finally:
+        connection.close()
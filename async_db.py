@@ -0,0 +1,66 @@
+import aiomysql
+import os
+import logging
+import config  # noqa: F401  loads .env before the settings below are read
+
+
+# Async connection pool used by the ASGI serving mode (fbms_asgi.py).
+# The pool belongs to the server's event loop, so it is opened on startup
+# and closed on shutdown rather than at import time.
+# Connections run in autocommit: a read must not leave a transaction open, or
+# aiomysql closes the connection on release instead of pooling it.
+_pool = None
+
+
+async def open_pool():
+    global _pool
+    if _pool is None:
+        _pool = await aiomysql.create_pool(
+            host=os.getenv('mysql_host'),
+            user=os.getenv('mysql_user'),
+            password=os.getenv('mysql_password'),
+            db=os.getenv('mysql_database'),
+            minsize=int(os.getenv('mysql_async_pool_min', '1')),
+            maxsize=int(os.getenv('mysql_async_pool_max', '10')),
+            autocommit=True,
+        )
+        logging.info("Async MySQL connection pool opened")
+    return _pool
+
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
+        logging.info("Async MySQL connection pool closed")
+
+
+async def fetchone(query, args=None):
+    pool = await open_pool()
+    async with pool.acquire() as connection:
+        async with connection.cursor() as cursor:
+            await cursor.execute(query, args)
+            return await cursor.fetchone()
+
+
+async def fetchall(query, args=None):
+    pool = await open_pool()
+    async with pool.acquire() as connection:
+        async with connection.cursor() as cursor:
+            await cursor.execute(query, args)
+            return await cursor.fetchall()
+
+
+async def execute(query, args=None):
+    pool = await open_pool()
+    async with pool.acquire() as connection:
+        async with connection.cursor() as cursor:
+            try:
+                await cursor.execute(query, args)
+                await connection.commit()
+                return cursor.rowcount
+            except Exception:
+                await connection.rollback()
+                raise
@@ -0,0 +1,291 @@
+from quart import Blueprint, jsonify, request
+from functools import wraps
+import asyncio
+import logging
+import bcrypt
+import jwt
+
+import async_db
+from config import SECRET_KEY
+from verify_jwt import is_path_allowed
+from validation import include_archived
+from login import generate_jwt
+from project_breakdown import _format_costs
+import queries
+
+# Coroutine versions of the I/O-bound routes, served by fbms_asgi.py.
+# Responses match the Flask handlers they shadow.
+auth_async = Blueprint('login_async', __name__)
+prj_async = Blueprint('projects_async', __name__)
+cli_async = Blueprint('clients_async', __name__)
+inv_async = Blueprint('inventory_async', __name__)
+breakdown_async = Blueprint('breakdown_async', __name__)
+
+
+def async_token_required(f):
+    @wraps(f)
+    async def decorated(*args, **kwargs):
+        token = request.headers.get('Authorization')
+        if not token:
+            logging.warning("Missing token in request headers")
+            return jsonify({'error': 'Missing token'}), 401
+
+        if token.startswith("Bearer "):
+            token = token[7:]
+
+        try:
+            decoded = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+        except jwt.ExpiredSignatureError:
+            logging.warning("Token expired")
+            return jsonify({'error': 'Token expired'}), 401
+        except jwt.InvalidTokenError:
+            logging.warning("Invalid token")
+            return jsonify({'error': 'Invalid token'}), 403
+
+        if not decoded.get('tenant'):
+            logging.warning(f"Token without workshop claim for user ID: {decoded.get('user_id')}")
+            return jsonify({'error': 'Token has no workshop, please sign in again'}), 401
+
+        # The stored-token check and the permission lookup are independent
+        stored, permissions = await asyncio.gather(
+            async_db.fetchone(queries.LOGIN_TOKEN.sql, (decoded['user_id'], decoded['email'])),
+            async_db.fetchall(queries.PATH_PERMISSIONS.sql, (decoded.get('role'),))
+        )
+
+        if not stored or stored[0] != token:
+            logging.warning(f"Invalid or expired token for user ID: {decoded['user_id']}")
+            return jsonify({'error': 'Invalid or expired token'}), 403
+
+        if not is_path_allowed([row[0] for row in permissions], request.path):
+            logging.warning(f"Access denied for role: {decoded.get('role')} on path: {request.path}")
+            return jsonify({'error': 'Access denied'}), 403
+
+        return await f(decoded, *args, **kwargs)
+    return decorated
+
+
+# --- Auth ---
+@auth_async.route('/login', methods=['POST'])
+async def login():
+    logging.info("POST request received for /login (async)")
+    data = await request.get_json()
+    email = data.get("email")
+    password = data.get("password")
+
+    if not email or not password:
+        logging.warning("Email and password are required for login")
+        return jsonify({"error": "Email and password are required"}), 400
+
+    try:
+        user = await async_db.fetchone(queries.LOGIN_BY_EMAIL.sql, (email,))
+        if not user:
+            logging.warning(f"Invalid login attempt for email: {email} - User not found")
+            return jsonify({"error": "Invalid email or password"}), 401
+
+        emp_id, email, db_hashed_password, permission, role, workshop_name = user
+
+        if not db_hashed_password:
+            # Same answer as an unknown email, see login.py
+            logging.warning(f"Login attempt for user ID: {emp_id} before the password was set")
+            return jsonify({"error": "Invalid email or password"}), 401
+
+        # bcrypt is CPU-bound, keep it off the event loop
+        password_ok = await asyncio.to_thread(bcrypt.checkpw, password.encode('utf-8'), db_hashed_password.encode('utf-8'))
+        if not password_ok:
+            logging.warning(f"Invalid password attempt for email: {email}")
+            return jsonify({"error": "Invalid email or password"}), 401
+
+        if permission != "TRUE":
+            logging.warning(f"Permission denied for user ID: {emp_id} - Account not active")
+            return jsonify({"error": "Permission denied. Your account is not active."}), 403
+
+        if not workshop_name:
+            logging.warning(f"Login refused for user ID: {emp_id} - no workshop assigned")
+            return jsonify({"error": "Your account is not assigned to a workshop."}), 403
+
+        token = generate_jwt(emp_id, email, role, workshop_name)
+        await async_db.execute(queries.LOGIN_STORE_TOKEN.sql, (token, emp_id))
+        logging.info(f"Successfully Login for user ID: {emp_id}")
+
+        return jsonify({
+            "message": "Login successful",
+            "user": {"emp_id": emp_id, "email": email, "permission": permission, "role": role},
+            "token": token
+        }), 200
+
+    except Exception as e:
+        logging.error(f"Login error: {e}")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
+
+# --- Projects ---
+@prj_async.route('/projects', methods=['GET'])
+@async_token_required
+async def get_projects(decoded):
+    logging.info("GET request received for /projects (async)")
+    try:
+        if include_archived(request.args):
+            # Archived projects follow the hot ones; archived_at is null for the hot rows
+            results, archived = await asyncio.gather(
+                async_db.fetchall(queries.PROJECT_LIST.sql, (decoded['tenant'],)),
+                async_db.fetchall(queries.ARCHIVED_PROJECT_LIST.sql, (decoded['tenant'],))
+            )
+            return jsonify(queries.ARCHIVED_PROJECT_LIST.to_dicts([row + (None,) for row in results] + list(archived))), 200
+        results = await async_db.fetchall(queries.PROJECT_LIST.sql, (decoded['tenant'],))
+        return jsonify(queries.PROJECT_LIST.to_dicts(results)), 200
+    except Exception as e:
+        logging.error(f"Error processing GET request for /projects: {e}")
+        return jsonify({'error': f"An internal server error occurred: {str(e)}"}), 500
+
+
+@prj_async.route('/projects/<int:project_id>', methods=['GET'])
+@async_token_required
+async def get_project_by_id(decoded, project_id):
+    logging.info(f"GET request received for /projects/{project_id} (async)")
+    try:
+        query = queries.PROJECT_BY_ID
+        result = await async_db.fetchone(query.sql, (decoded['tenant'], project_id))
+        if not result and include_archived(request.args):
+            query = queries.ARCHIVED_PROJECT_BY_ID
+            result = await async_db.fetchone(query.sql, (decoded['tenant'], project_id))
+        if not result:
+            logging.warning(f"Project with ID '{project_id}' not found.")
+            return jsonify({'error': 'Project not found'}), 404
+
+        project = query.to_dict(result)
+        project['client_name'] = f"{project['client_first_name']} ({project['client_company']})" if project['client_first_name'] else ''
+        return jsonify(project), 200
+    except Exception as e:
+        logging.error(f"Error processing GET request for /projects/{project_id}: {e}")
+        return jsonify({'error': f"An internal server error occurred: {str(e)}"}), 500
+
+
+# --- Clients ---
+@cli_async.route('/clients', methods=['GET'])
+@async_token_required
+async def get_clients(decoded):
+    logging.info("GET request received for /clients (async)")
+    try:
+        results = await async_db.fetchall(queries.CLIENT_LIST.sql, (decoded['tenant'],))
+        return jsonify(queries.CLIENT_LIST.to_dicts(results))
+    except Exception as e:
+        logging.error(f"Error processing GET request for /clients: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@cli_async.route('/clients/suggestions', methods=['GET'])
+@async_token_required
+async def get_client_suggestions(decoded):
+    query = request.args.get('query', '').strip()
+    logging.info(f"Client suggestion query received: '{query}' (async)")
+    if not query:
+        return jsonify([])
+
+    try:
+        search_pattern = f"%{query}%"
+        results = await async_db.fetchall(queries.CLIENT_SUGGESTIONS.sql, (decoded['tenant'], search_pattern, search_pattern))
+        return jsonify(queries.CLIENT_SUGGESTIONS.to_dicts(results)), 200
+    except Exception as e:
+        logging.error(f"Error fetching client suggestions for query '{query}': {e}", exc_info=True)
+        return jsonify({'error': f"An internal server error occurred: {str(e)}"}), 500
+
+
+@cli_async.route('/clients/<int:client_id>', methods=['GET'])
+@async_token_required
+async def get_single_client(decoded, client_id):
+    logging.info(f"GET request received for /clients/{client_id} (async)")
+    try:
+        result = await async_db.fetchone(queries.CLIENT_BY_ID.sql, (decoded['tenant'], client_id))
+        if not result:
+            logging.warning(f"Client with ID {client_id} not found.")
+            return jsonify({'error': 'Client not found'}), 404
+        return jsonify(queries.CLIENT_BY_ID.to_dict(result)), 200
+    except Exception as e:
+        logging.error(f"Error fetching client {client_id}: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+# --- Inventory ---
+@inv_async.route('/inventory', methods=['GET'])
+@async_token_required
+async def get_inventory(decoded):
+    logging.info("GET request received for /inventory (async)")
+    try:
+        results = await async_db.fetchall(queries.INVENTORY_LIST.sql, (decoded['tenant'],))
+        return jsonify(queries.INVENTORY_LIST.to_dicts(results)), 200
+    except Exception as e:
+        logging.error(f"Error processing GET request for /inventory: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@inv_async.route('/inventory/<string:inventory_code>', methods=['GET'])
+@async_token_required
+async def get_inventory_item(decoded, inventory_code):
+    logging.info(f"GET request received for /inventory/{inventory_code} (async)")
+    try:
+        result = await async_db.fetchone(queries.INVENTORY_BY_CODE.sql, (decoded['tenant'], inventory_code))
+        if not result:
+            logging.warning(f"Inventory item with code {inventory_code} not found.")
+            return jsonify({'error': 'Inventory item not found'}), 404
+
+        return jsonify(queries.INVENTORY_BY_CODE.to_dict(result)), 200
+    except Exception as e:
+        logging.error(f"Error processing GET request for /inventory/{inventory_code}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+# --- Breakdown ---
+@breakdown_async.route('/projectbreakdown/<int:proj_id>', methods=['GET'])
+@async_token_required
+async def get_project_breakdown(decoded, proj_id):
+    logging.info(f"GET request received for /projectbreakdown/{proj_id} (async)")
+    try:
+        # The project row and its timeline are independent, so fetch them concurrently
+        project_query, history_query = queries.BREAKDOWN_PROJECT, queries.BREAKDOWN_HISTORY
+        project_details, breakdown_entries = await asyncio.gather(
+            async_db.fetchone(project_query.sql, (decoded['tenant'], proj_id)),
+            async_db.fetchall(history_query.sql, (decoded['tenant'], proj_id))
+        )
+        if not project_details and include_archived(request.args):
+            project_query, history_query = queries.ARCHIVED_BREAKDOWN_PROJECT, queries.ARCHIVED_BREAKDOWN_HISTORY
+            project_details, breakdown_entries = await asyncio.gather(
+                async_db.fetchone(project_query.sql, (decoded['tenant'], proj_id)),
+                async_db.fetchall(history_query.sql, (decoded['tenant'], proj_id))
+            )
+
+        if not project_details:
+            logging.warning(f"Project with ID '{proj_id}' not found.")
+            return jsonify({'error': f"Project with ID '{proj_id}' not found."}), 404
+
+        return jsonify({
+            'project_details': project_query.to_dict(project_details),
+            'breakdown_history': history_query.to_dicts(breakdown_entries)
+        }), 200
+    except Exception as e:
+        logging.error(f"Error processing GET request for /projectbreakdown/{proj_id}: {e}")
+        return jsonify({'error': f"An internal server error occurred: {str(e)}"}), 500
+
+
+@breakdown_async.route('/costbreakdown/<string:proj_id>', methods=['GET'])
+@async_token_required
+async def get_cost_breakdown(decoded, proj_id):
+    logging.info(f"GET request received for /costbreakdown/{proj_id} (async)")
+    try:
+        cost_entries = await async_db.fetchall(queries.COST_BREAKDOWN.sql, (decoded['tenant'], proj_id))
+        if not cost_entries and include_archived(request.args):
+            cost_entries = await async_db.fetchall(queries.ARCHIVED_COST_BREAKDOWN.sql, (decoded['tenant'], proj_id))
+
+        if not cost_entries:
+            return jsonify({'message': f"No cost breakdown entries found for project ID '{proj_id}'."}), 200
+
+        formatted_cost_entries, total_project_cost = _format_costs(cost_entries)
+        return jsonify({
+            'cost_breakdown': formatted_cost_entries,
+            'total_project_cost': total_project_cost
+        }), 200
+    except Exception as e:
+        logging.error(f"Error processing GET request for /costbreakdown/{proj_id}: {e}")
+        return jsonify({'error': f"An internal server error occurred: {str(e)}"}), 500
+
+
+ASYNC_BLUEPRINTS = (auth_async, prj_async, cli_async, inv_async, breakdown_async)
@@ -0,0 +1,299 @@
+from flask import Blueprint, jsonify, request
+from config import get_db_connection
+from verify_jwt import token_required
+from validation import iso_date
+from json_provider import dumps
+from collections import deque
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import atexit
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import queries
+
+# Change audit for the update endpoints. After its commit a handler passes
+# diff(before, after) to record(); only changed columns are kept, as
+# {"column": [before, after]}. Records wait in an in-process buffer and a
+# background flusher appends them with multi-row INSERTs, so an update pays for
+# a dict comparison rather than another write. Records still buffered when the
+# process dies are lost (at most one flush interval's worth).
+# audit_log is partitioned by month (see queries, Audit trail); retention drops
+# whole partitions, so no row is ever updated or deleted.
+#   python audit.py partitions         create the upcoming months, drop expired ones
+
+AUDIT_FLUSH_INTERVAL = float(os.getenv('audit_flush_interval', '1'))
+AUDIT_BATCH_SIZE = int(os.getenv('audit_batch_size', '500'))
+AUDIT_BUFFER_MAX = int(os.getenv('audit_buffer_max', '50000'))  # oldest records are dropped beyond this
+AUDIT_RETENTION_MONTHS = int(os.getenv('audit_retention_months', '0'))  # 0 keeps every month
+AUDIT_MONTHS_AHEAD = 3
+AUDIT_PARTITION_CHECK = 24 * 3600
+AUDIT_DEFAULT_DAYS = 30
+AUDIT_PAGE_MAX = 500
+
+ENTITIES = ('employee', 'inventory', 'project')
+REDACTED = '[redacted]'
+
+aud = Blueprint('audit', __name__)
+_audit_date = iso_date('Invalid date format. Use YYYY-MM-DD')
+
+_buffer = deque()
+_lock = threading.Lock()
+_wakeup = threading.Event()
+_flusher = None
+_counts = {'recorded': 0, 'written': 0, 'dropped': 0, 'flush_errors': 0}
+
+
+# ===== Recording =====
+
+def _same(old, new):
+    # Values from the database against values from the validated request body
+    if old in (None, '') and new in (None, ''):
+        return True
+    if isinstance(old, Decimal) and isinstance(new, (int, float)):
+        return old == Decimal(str(new))
+    if isinstance(new, str) and old is not None and not isinstance(old, str):
+        return str(old) == new  # e.g. client_id sent as "5"
+    return old == new
+
+
+def diff(before, after):
+    # {column: [before, after]} for every column of `after` that changed
+    return {column: [before.get(column), value] for column, value in after.items()
+            if not _same(before.get(column), value)}
+
+
+def record(tenant, entity, entity_id, action, changed_by, changes):
+    if not changes:
+        return
+    entry = (datetime.now(), tenant, entity, entity_id, action, changed_by, dumps(changes))
+    with _lock:
+        if len(_buffer) >= AUDIT_BUFFER_MAX:
+            _buffer.popleft()
+            _counts['dropped'] += 1
+        _buffer.append(entry)
+        _counts['recorded'] += 1
+        full = len(_buffer) >= AUDIT_BATCH_SIZE
+    if full:
+        _wakeup.set()
+
+
+def _requeue(entries):
+    # A failed write goes back in front of anything recorded since, in order
+    with _lock:
+        _buffer.extendleft(reversed(entries))
+        while len(_buffer) > AUDIT_BUFFER_MAX:
+            _buffer.popleft()
+            _counts['dropped'] += 1
+
+
+def flush():
+    # Writes everything buffered so far; returns the number of records written
+    with _lock:
+        entries = list(_buffer)
+        _buffer.clear()
+    if not entries:
+        return 0
+
+    written = 0
+    connection = get_db_connection()
+    if connection is None:
+        _requeue(entries)
+        with _lock:
+            _counts['flush_errors'] += 1
+        logging.error(f"Audit flush skipped, no database connection ({len(entries)} record(s) kept)")
+        return 0
+    cursor = connection.cursor()
+    try:
+        for start in range(0, len(entries), AUDIT_BATCH_SIZE):
+            batch = entries[start:start + AUDIT_BATCH_SIZE]
+            queries.executemany(cursor, queries.AUDIT_INSERT, batch)
+            connection.commit()
+            written += len(batch)
+    except Exception as e:
+        connection.rollback()
+        _requeue(entries[written:])
+        with _lock:
+            _counts['flush_errors'] += 1
+        logging.error(f"Audit flush failed after {written} record(s): {e}", exc_info=True)
+    finally:
+        cursor.close()
+        connection.close()
+        with _lock:
+            _counts['written'] += written
+    return written
+
+
+# ===== Partitions =====
+
+def _add_months(day, months):
+    month = day.month - 1 + months
+    return day.replace(year=day.year + month // 12, month=month % 12 + 1, day=1)
+
+
+def ensure_partitions(connection, months_ahead=AUDIT_MONTHS_AHEAD, retention_months=AUDIT_RETENTION_MONTHS):
+    # Splits pYYYYMM partitions off p_future up to months_ahead from now and drops
+    # months older than the retention window. Returns (created, dropped).
+    cursor = connection.cursor()
+    try:
+        existing = sorted(name for (name,) in queries.fetchall(cursor, queries.AUDIT_PARTITIONS) if name != 'p_future')
+        this_month = date.today().replace(day=1)
+        created = []
+        for offset in range(months_ahead + 1):
+            start = _add_months(this_month, offset)
+            name = f"p{start:%Y%m}"
+            # Bounds must keep increasing, so only months after the newest partition
+            if not existing or name > existing[-1]:
+                created.append((name, _add_months(start, 1)))
+        if created:
+            parts = ', '.join(f"PARTITION {name} VALUES LESS THAN ('{end:%Y-%m-%d}')" for name, end in created)
+            cursor.execute(f"ALTER TABLE audit_log REORGANIZE PARTITION p_future INTO "
+                           f"({parts}, PARTITION p_future VALUES LESS THAN (MAXVALUE))")
+            logging.info(f"Created audit partitions {', '.join(name for name, _ in created)}")
+
+        dropped = []
+        if retention_months > 0:
+            oldest_kept = f"p{_add_months(this_month, -retention_months):%Y%m}"
+            dropped = [name for name in existing if name < oldest_kept]
+            if dropped:
+                cursor.execute(f"ALTER TABLE audit_log DROP PARTITION {', '.join(dropped)}")
+                logging.info(f"Dropped expired audit partitions {', '.join(dropped)}")
+        return [name for name, _ in created], dropped
+    finally:
+        cursor.close()
+
+
+def _maintain_partitions():
+    connection = get_db_connection()
+    if connection is None:
+        logging.error("Audit partition check skipped, no database connection")
+        return
+    try:
+        ensure_partitions(connection)
+    except Exception as e:
+        # Several workers may race on the same ALTER; the loser tries again next time
+        logging.warning(f"Audit partition check failed: {e}")
+    finally:
+        connection.close()
+
+
+def _run_flusher(interval):
+    last_check = None
+    while True:
+        if last_check is None or time.monotonic() - last_check > AUDIT_PARTITION_CHECK:
+            _maintain_partitions()
+            last_check = time.monotonic()
+        _wakeup.wait(interval)
+        _wakeup.clear()
+        try:
+            flush()
+        except Exception as e:
+            logging.error(f"Audit flusher error: {e}", exc_info=True)
+
+
+def start_flusher(interval=AUDIT_FLUSH_INTERVAL):
+    global _flusher
+    if _flusher is not None:
+        return
+    _flusher = threading.Thread(target=_run_flusher, args=(interval,), name='audit-flusher', daemon=True)
+    _flusher.start()
+    atexit.register(flush)
+
+
+def stats():
+    with _lock:
+        return dict(_counts, buffered=len(_buffer))
+
+
+# ===== Query API =====
+
+def _parse_cursor(raw):
+    # "<changed_at ISO>,<audit_id>" as returned in next_cursor
+    changed_at, _, audit_id = raw.partition(',')
+    return datetime.fromisoformat(changed_at), int(audit_id)
+
+
+@aud.route('/audit', methods=['GET'])
+@token_required
+def get_audit(decoded):
+    # ?entity=project|employee|inventory (required), ?entity_id=, ?from=&to= (dates,
+    # inclusive, default the last 30 days), ?limit= and ?cursor= for the next page
+    logging.info(f"GET request received for /audit with args: {dict(request.args)}")
+    entity = request.args.get('entity')
+    if entity not in ENTITIES:
+        return jsonify({'error': f"Query parameter 'entity' must be one of: {', '.join(ENTITIES)}"}), 400
+    try:
+        entity_id = int(request.args['entity_id']) if request.args.get('entity_id') else None
+        limit = min(int(request.args.get('limit', '100')), AUDIT_PAGE_MAX)
+    except ValueError:
+        return jsonify({'error': "'entity_id' and 'limit' must be whole numbers"}), 400
+    if limit < 1:
+        return jsonify({'error': "'limit' must be at least 1"}), 400
+    try:
+        window_end = _audit_date(request.args['to']) if request.args.get('to') else date.today()
+        window_start = _audit_date(request.args['from']) if request.args.get('from') \
+            else window_end - timedelta(days=AUDIT_DEFAULT_DAYS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if window_start > window_end:
+        return jsonify({'error': "'from' must not be after 'to'"}), 400
+    try:
+        # (next midnight, 0) is below every real (changed_at, audit_id) of that midnight
+        before = _parse_cursor(request.args['cursor']) if request.args.get('cursor') \
+            else (datetime.combine(window_end + timedelta(days=1), datetime.min.time()), 0)
+    except ValueError:
+        return jsonify({'error': "Invalid 'cursor'; pass back next_cursor unchanged"}), 400
+
+    connection = None
+    cursor = None
+    try:
+        connection = get_db_connection(read_only=True, session=decoded['user_id'])
+        if connection is None:
+            logging.error("Failed to establish database connection for GET /audit")
+            return jsonify({'error': 'Failed to connect to the database'}), 500
+        cursor = connection.cursor()
+        start = datetime.combine(window_start, datetime.min.time())
+        if entity_id is None:
+            query = queries.AUDIT_BY_TYPE
+            args = (decoded['tenant'], entity, start) + before + (limit,)
+        else:
+            query = queries.AUDIT_BY_ENTITY
+            args = (decoded['tenant'], entity, entity_id, start) + before + (limit,)
+        rows = queries.fetchall(cursor, query, args)
+
+        entries = query.to_dicts(rows)
+        for entry in entries:
+            entry['changes'] = json.loads(entry['changes'])
+        next_cursor = None
+        if len(entries) == limit:
+            last = entries[-1]
+            next_cursor = f"{last['changed_at'].isoformat()},{last['audit_id']}"
+        logging.info(f"Retrieved {len(entries)} audit entries for {entity} {entity_id or '*'}")
+        return jsonify({'entries': entries, 'next_cursor': next_cursor}), 200
+
+    except Exception as e:
+        logging.error(f"Error processing GET request for /audit: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            connection.close()
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'partitions'
+    if command != 'partitions':
+        sys.exit(f"Unknown command '{command}'. Use partitions.")
+    connection = get_db_connection()
+    if connection is None:
+        sys.exit("Failed to establish database connection.")
+    try:
+        created, dropped = ensure_partitions(connection)
+        print(f"created: {', '.join(created) or '-'}")
+        print(f"dropped: {', '.join(dropped) or '-'}")
+    finally:
+        connection.close()
@@ -0,0 +1,69 @@
+from flask import jsonify, request
+from config import get_db_connection
+import logging
+import os
+import queries
+
+# Shared body of the GET /<resource>/batch?ids=3,1,2 endpoints: one connection and
+# one IN (...) query for up to BATCH_MAX_IDS records. Results come back in the
+# order the ids were asked for, and ids that matched nothing are listed in 'missing'.
+
+BATCH_MAX_IDS = int(os.getenv('batch_max_ids', '100'))
+
+
+def parse_ids(raw):
+    # Returns (ids, None) or (None, error_message); duplicates are dropped, order kept
+    ids = []
+    seen = set()
+    for part in (raw or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            value = int(part)
+        except ValueError:
+            return None, f"Invalid id '{part}'; ids must be whole numbers"
+        if value not in seen:
+            seen.add(value)
+            ids.append(value)
+    if not ids:
+        return None, "Query parameter 'ids' is required, e.g. ?ids=3,1,2"
+    if len(ids) > BATCH_MAX_IDS:
+        return None, f"At most {BATCH_MAX_IDS} ids can be requested at once"
+    return ids, None
+
+
+def lookup(decoded, label, batch, format_record=None):
+    logging.info(f"GET request received for {label} with ids: {request.args.get('ids')}")
+    ids, error = parse_ids(request.args.get('ids'))
+    if error:
+        logging.warning(f"Rejected GET {label}: {error}")
+        return jsonify({'error': error}), 400
+
+    connection = None
+    cursor = None
+    try:
+        connection = get_db_connection(read_only=True, session=decoded['user_id'])
+        if connection is None:
+            logging.error(f"Failed to establish database connection for GET {label}")
+            return jsonify({'error': 'Failed to connect to the database'}), 500
+        cursor = connection.cursor()
+        found = queries.fetch_by_ids(cursor, batch, ids, scope=(decoded['tenant'],))
+
+        results = []
+        for record_id in ids:
+            if record_id in found:
+                record = dict(zip(batch.columns, found[record_id]))
+                results.append(format_record(record) if format_record else record)
+        missing = [record_id for record_id in ids if record_id not in found]
+        logging.info(f"GET {label}: {len(results)} found, {len(missing)} missing")
+        return jsonify({'results': results, 'missing': missing}), 200
+
+    except Exception as e:
+        logging.error(f"Error processing GET request for {label}: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            connection.close()
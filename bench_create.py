@@ -0,0 +1,115 @@
+from config import get_db_connection
+from project_management import create_project
+from employee_management import create_employee
+from datetime import date, datetime, timedelta
+import logging
+import sys
+import time
+import uuid
+
+# Create-path throughput, legacy insert-then-SELECT flow vs lastrowid.
+#   python bench_create.py [rounds]
+# Rows are tagged with a per-run marker and deleted afterwards.
+
+logging.getLogger().setLevel(logging.WARNING)
+
+ROUNDS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+RUN = uuid.uuid4().hex[:8]
+CLIENT_ID = None  # the legacy lookup matches on client_id, so it cannot be NULL
+WORKSHOP = None  # the new path creates rows in the client's workshop
+
+
+def legacy_create_project(connection, cursor, project):
+    cursor.execute(
+        "INSERT INTO projects (proj_name, start_date, end_date, status, url, remarks, client_id) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+        (project['proj_name'], project['start_date'], project['end_date'], project['status'],
+         project['url'], project['remarks'], project['client_id'])
+    )
+    cursor.execute("SELECT proj_id FROM projects WHERE proj_name = %s AND client_id = %s",
+                   (project['proj_name'], project['client_id']))
+    connection.commit()
+    proj_id = cursor.fetchone()[0]
+    cursor.execute("INSERT INTO proj_breakdown (proj_id, date_time, description) VALUES (%s, %s, %s)",
+                   (proj_id, datetime.now(), f"Project created with initial status: {project['status']}"))
+    connection.commit()
+
+
+def legacy_create_employee(connection, cursor, employee, hashed_pw):
+    cursor.execute(
+        "INSERT INTO employee (first_name, last_name, email, address, nic, birth_day, role, workshop_name, design_category) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+        (employee['first_name'], employee['last_name'], employee['email'], employee['address'], employee['nic'],
+         employee['birth_day'], employee['role'], employee['workshop_name'], employee['design_category'])
+    )
+    connection.commit()
+    cursor.execute("SELECT emp_id FROM employee WHERE email = %s AND nic = %s", (employee['email'], employee['nic']))
+    connection.commit()
+    emp_id = cursor.fetchone()[0]
+    cursor.execute("INSERT INTO login (emp_id, email, hashed_password, permission) VALUES (%s, %s, %s, %s)",
+                   (emp_id, employee['email'], hashed_pw, employee['permission']))
+    connection.commit()
+
+
+def make_project(label, i):
+    return {
+        'proj_name': f"bench-{RUN}-{label}-{i}", 'start_date': date.today(),
+        'end_date': date.today() + timedelta(days=30), 'status': 'Pending',
+        'url': None, 'remarks': None, 'client_id': CLIENT_ID
+    }
+
+
+def make_employee(label, i):
+    # NICs well outside the real range, separate per label in case nic is unique
+    nic = 990000000000 + (ROUNDS if label == 'new' else 0) + i
+    return {
+        'first_name': 'Bench', 'last_name': label, 'email': f"bench-{RUN}-{label}-{i}@example.com",
+        'address': None, 'nic': str(nic), 'birth_day': date(1990, 1, 1), 'role': None,
+        'workshop_name': None, 'design_category': None, 'permission': 'FALSE'
+    }
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    for i in range(ROUNDS):
+        fn(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {ROUNDS / elapsed:8.1f} creates/s")
+
+
+def cleanup(cursor, connection):
+    cursor.execute("DELETE FROM proj_breakdown WHERE proj_id IN (SELECT proj_id FROM projects WHERE proj_name LIKE %s)",
+                   (f"bench-{RUN}-%",))
+    cursor.execute("DELETE FROM projects WHERE proj_name LIKE %s", (f"bench-{RUN}-%",))
+    cursor.execute("DELETE FROM login WHERE email LIKE %s", (f"bench-{RUN}-%",))
+    cursor.execute("DELETE FROM employee WHERE email LIKE %s", (f"bench-{RUN}-%",))
+    connection.commit()
+
+
+if __name__ == '__main__':
+    connection = get_db_connection()
+    if connection is None:
+        sys.exit("Failed to establish database connection.")
+    cursor = connection.cursor()
+    cursor.execute("SELECT client_id, workshop_name FROM clients ORDER BY client_id LIMIT 1")
+    CLIENT_ID, WORKSHOP = cursor.fetchone() or (None, None)
+    if CLIENT_ID is None:
+        sys.exit("At least one client is required to benchmark project creation.")
+    # A fixed dummy hash keeps bcrypt out of the measurement
+    hashed_pw = '$2b$12$' + 'x' * 53
+
+    def new_project(i):
+        create_project(cursor, WORKSHOP, make_project('new', i))
+        connection.commit()
+
+    def new_employee(i):
+        create_employee(cursor, WORKSHOP, make_employee('new', i), hashed_pw)
+        connection.commit()
+
+    try:
+        timed('projects: insert + SELECT', lambda i: legacy_create_project(connection, cursor, make_project('old', i)))
+        timed('projects: lastrowid', new_project)
+        timed('employees: insert + SELECT', lambda i: legacy_create_employee(connection, cursor, make_employee('old', i), hashed_pw))
+        timed('employees: lastrowid', new_employee)
+    finally:
+        cleanup(cursor, connection)
+        cursor.close()
+        connection.close()
@@ -0,0 +1,52 @@
+import os
+import statistics
+import subprocess
+import sys
+
+# Worker cold-start time: fresh interpreter -> create_app() with every blueprint.
+#   python bench_startup.py [runs]
+# Exits non-zero when the median is over startup_budget_ms, so it can gate CI.
+# The slowest imports come from python -X importtime (cumulative, microseconds).
+
+RUNS = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+BUDGET_MS = float(os.getenv('startup_budget_ms', '1500'))
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+BOOT = (
+    "import time; started = time.perf_counter(); "
+    "import fbms_main; fbms_main.create_app(background_jobs=False); "
+    "print((time.perf_counter() - started) * 1000)"
+)
+
+
+def boot_ms():
+    result = subprocess.run([sys.executable, '-c', BOOT], cwd=HERE, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(limit=10):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', BOOT], cwd=HERE,
+                            capture_output=True, text=True, check=True)
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        # Nested imports are indented under their parent; keep the top level only
+        if not module[1:].startswith(' '):
+            timings.append((int(cumulative), module.strip()))
+    return sorted(timings, reverse=True)[:limit]
+
+
+if __name__ == '__main__':
+    timings = sorted(boot_ms() for _ in range(RUNS))
+    median = statistics.median(timings)
+    print(f"create_app cold start over {RUNS} runs: median {median:.0f} ms, min {timings[0]:.0f} ms, max {timings[-1]:.0f} ms")
+
+    print("slowest top-level imports (cumulative):")
+    for cumulative, module in slowest_imports():
+        print(f"  {cumulative / 1000:8.1f} ms  {module}")
+
+    if median > BUDGET_MS:
+        sys.exit(f"Startup budget exceeded: {median:.0f} ms > {BUDGET_MS:.0f} ms")
+    print(f"within budget ({BUDGET_MS:.0f} ms)")
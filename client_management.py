@@ -2,7 +2,10 @@ from flask import Blueprint, jsonify, request
 from config import get_db_connection
 import logging
 from verify_jwt import token_required
-import re
+from validation import CLIENT_SCHEMA
+from json_provider import rows_response
+import batch_lookup
+import queries
 
 cli = Blueprint('clients',__name__)
 
@@ -17,39 +20,21 @@ def add_client(decoded):
     data = request.get_json()
     logging.info(f"Received JSON data: {data}")
 
-    # client_id = data['client_id']
-    first_name = data['first_name']
-    last_name = data['last_name']
-    country = data['country']
-    company = data['company']
-    email = data['email']
-    contact_nu = data['contact_nu']
-
-     # ===== Required Fields =====
-    if not email or not first_name:
-        return jsonify({'error': 'Client ID, first name, and email are required'}), 400
-
-    # ===== First and Last Name Validation =====
-    name_pattern = r'^[A-Za-z\s\-]+$'
-    if not re.match(name_pattern, first_name):
-        return jsonify({'error': 'First name must contain only letters, spaces, or hyphens'}), 400
-    if last_name and not re.match(name_pattern, last_name):
-        return jsonify({'error': 'Last name must contain only letters, spaces, or hyphens'}), 400
-
-    # ===== Email Validation =====
-    email_pattern = r'^[\w\.-]+@[\w\.-]+\.\w{2,}$'
-    if not re.match(email_pattern, email):
-        return jsonify({'error': 'Invalid email format'}), 400
-
-    # ===== Contact Number Validation (optional field) =====
-    if contact_nu:
-        contact_pattern = r'^\+?\d{10,15}$'
-    if not re.match(contact_pattern, contact_nu):
-        return jsonify({'error': 'Contact number must be 10 to 15 digits and may start with "+"'}), 400
+    # ===== Field Validation =====
+    client, error = CLIENT_SCHEMA.validate(data)
+    if error:
+        return jsonify({'error': error}), 400
+
+    first_name = client['first_name']
+    last_name = client['last_name']
+    country = client['country']
+    company = client['company']
+    email = client['email']
+    contact_nu = client['contact_nu']
 
 
     try:
-        connection = get_db_connection()
+        connection = get_db_connection(session=decoded['user_id'])
         if connection is None:
             return jsonify({'error': 'Failed to connect to the database'}), 500
         cursor = connection.cursor()
@@ -62,8 +47,7 @@ def add_client(decoded):
         #     logging.warning(f"Client ID '{client_id}' already exists")
         #     return jsonify({'error': 'Client ID already exists'}), 400
 
-        cursor.execute("INSERT INTO clients (first_name, last_name, country, company, email, contact_nu) VALUES ( %s, %s, %s, %s, %s, %s)", 
-                       (first_name, last_name, country, company, email, contact_nu))
+        queries.execute(cursor, queries.CLIENT_INSERT, (decoded['tenant'], first_name, last_name, country, company, email, contact_nu))
         connection.commit()
         logging.info(f"Client added successfully")
         return jsonify({'message': 'Client added successfully'}), 201
@@ -91,25 +75,15 @@ def get_clients(decoded):
     connection = None
     cursor = None
     try:
-        connection = get_db_connection() 
+        connection = get_db_connection(read_only=True, session=decoded['user_id'])
+        if connection is None:
+            return jsonify({'error': 'Failed to connect to the database'}), 500
         cursor = connection.cursor()
-        cursor.execute("SELECT * FROM clients")
-        results = cursor.fetchall()
+        results = queries.fetchall(cursor, queries.CLIENT_LIST, (decoded['tenant'],))
         logging.info(f"Retrieved {len(results)} clients from the database")
 
-        clients_data = []
-        for row in results:
-            clients_data.append({
-                'client_id': row[0],
-                'first_name': row[1],
-                'last_name': row[2],
-                'country': row[3],
-                'company': row[4],
-                'email': row[5], 
-                'contact_nu': row[6]
-            })
         logging.info("Successfully processed client data for response")
-        return jsonify(clients_data) 
+        return rows_response(queries.CLIENT_LIST.columns, results)
 
     except Exception as e:
         if connection:
@@ -142,7 +116,7 @@ def get_client_suggestions(decoded):
     connection = None
     cursor = None
     try:
-        connection = get_db_connection()
+        connection = get_db_connection(read_only=True, session=decoded['user_id'])
         if connection is None:
             logging.error("Failed to establish database connection in get_client_suggestions.")
             return jsonify({'error': 'Failed to connect to the database'}), 500
@@ -150,40 +124,10 @@ def get_client_suggestions(decoded):
         cursor = connection.cursor()
 
         search_pattern = f"%{query}%"
-        cursor.execute(
-            """
-            SELECT
-                client_id,
-                first_name,
-                company,
-                country
-            FROM
-                clients
-            WHERE
-                first_name LIKE %s OR company LIKE %s
-            ORDER BY
-                first_name ASC
-            LIMIT 10;
-            """,
-            (search_pattern, search_pattern)
-        )
-        
-        results = cursor.fetchall()  # Fetch all matching rows
+        results = queries.fetchall(cursor, queries.CLIENT_SUGGESTIONS, (decoded['tenant'], search_pattern, search_pattern))
         logging.info(f"Found {len(results)} client suggestions for query '{query}'.")
 
-        # Convert results to a list of dictionaries for JSON response
-        clients = []
-        for row in results:
-            # Assuming `row` can be accessed like a dictionary (e.g., if using DictCursor or row_factory for SQLite)
-            client = {
-                'client_id': row[0],
-                'first_name': row[1],
-                'company': row[2],
-                'country': row[3]
-            }
-            clients.append(client)
-        
-        return jsonify(clients), 200 
+        return rows_response(queries.CLIENT_SUGGESTIONS.columns, results)
 
     except Exception as e:
         logging.error(f"Error fetching client suggestions for query '{query}': {e}", exc_info=True)
@@ -195,6 +139,12 @@ def get_client_suggestions(decoded):
             connection.close()
         logging.info("Database connection closed after GET /clients/suggestions.")
 
+@cli.route('/clients/batch', methods=['GET'])
+@token_required
+def get_clients_batch(decoded):
+    return batch_lookup.lookup(decoded, '/clients/batch', queries.CLIENT_BATCH)
+
+
 @cli.route('/clients/<int:client_id>', methods=['GET'])
 @token_required
 def get_single_client(decoded, client_id):
@@ -203,38 +153,16 @@ def get_single_client(decoded, client_id):
     connection = None
     cursor = None
     try:
-        connection = get_db_connection()
+        connection = get_db_connection(read_only=True, session=decoded['user_id'])
         if connection is None:
             logging.error("Failed to establish database connection for GET /clients/<client_id>")
             return jsonify({'error': 'Failed to connect to the database'}), 500
         cursor = connection.cursor()
 
-        cursor.execute("""
-            SELECT
-                client_id,
-                first_name,
-                last_name,
-                country,
-                company,
-                email,
-                contact_nu
-            FROM
-                clients
-            WHERE client_id = %s
-        """, (client_id,)) # Pass client_id as a tuple
-
-        result = cursor.fetchone()
+        result = queries.fetchone(cursor, queries.CLIENT_BY_ID, (decoded['tenant'], client_id))
 
         if result:
-            client_data = {
-                'client_id': result[0],
-                'first_name': result[1],
-                'last_name': result[2],
-                'country': result[3],
-                'company': result[4],
-                'email': result[5],
-                'contact_nu': result[6]
-            }
+            client_data = queries.CLIENT_BY_ID.to_dict(result)
             logging.info(f"Client {client_id} fetched successfully.")
             return jsonify(client_data), 200
         else:
@@ -0,0 +1,211 @@
+from flask import request, current_app
+from collections import OrderedDict
+from functools import wraps
+import hashlib
+import logging
+import os
+import threading
+import zlib
+import config  # noqa: F401  loads .env before the settings below are read
+
+try:
+    import brotli
+except ImportError:  # brotli is optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional
+    zstandard = None
+
+
+COMPRESS_MIN_SIZE = int(os.getenv('compress_min_size', '1024'))
+COMPRESS_LEVEL = int(os.getenv('compress_level', '6'))
+COMPRESS_CACHE_SIZE = int(os.getenv('compress_cache_size', '256'))
+COMPRESS_CACHE_BYTES = int(os.getenv('compress_cache_bytes', str(32 * 1024 * 1024)))  # total compressed bytes kept
+COMPRESS_CACHE_MAX_BODY = int(os.getenv('compress_cache_max_body', str(1024 * 1024)))  # larger bodies are not cached
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+
+# ===== Encoders =====
+# Each encoder exposes compress(bytes) for buffered bodies and stream() which
+# returns (compress_chunk, finish) callables for generator responses.
+
+def _gzip_compress(data):
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _gzip_stream():
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)
+    return (lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH),
+            compressor.flush)
+
+
+def _brotli_compress(data):
+    return brotli.compress(data, quality=min(COMPRESS_LEVEL, 11))
+
+
+def _brotli_stream():
+    compressor = brotli.Compressor(quality=min(COMPRESS_LEVEL, 11))
+    return (lambda chunk: compressor.process(chunk) + compressor.flush(), compressor.finish)
+
+
+def _zstd_compress(data):
+    return zstandard.ZstdCompressor(level=COMPRESS_LEVEL).compress(data)
+
+
+def _zstd_stream():
+    compressor = zstandard.ZstdCompressor(level=COMPRESS_LEVEL).compressobj()
+    return (lambda chunk: compressor.compress(chunk) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+            compressor.flush)
+
+
+# Listed in server preference order; ties in client q-values pick the first one
+ENCODERS = OrderedDict()
+if brotli is not None:
+    ENCODERS['br'] = (_brotli_compress, _brotli_stream)
+if zstandard is not None:
+    ENCODERS['zstd'] = (_zstd_compress, _zstd_stream)
+ENCODERS['gzip'] = (_gzip_compress, _gzip_stream)
+
+
+class CompressedCache:
+    # LRU of compressed bodies keyed by (ETag, encoding), so repeated identical
+    # list responses only pay for hashing, not for compression. Bounded by entry
+    # count and by total bytes; a body over max_body is never kept, so one large
+    # export cannot push out every list response.
+
+    def __init__(self, max_entries, max_bytes, max_body):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_body = max_body
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+
+    def get(self, key):
+        with self.lock:
+            body = self.entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            if len(body) > min(self.max_body, self.max_bytes):
+                self.skipped += 1
+                return
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= len(previous)
+            self.entries[key] = body
+            self.bytes += len(body)
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= len(evicted)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'skipped': self.skipped
+            }
+
+
+compressed_cache = CompressedCache(COMPRESS_CACHE_SIZE, COMPRESS_CACHE_BYTES, COMPRESS_CACHE_MAX_BODY)
+
+
+def no_compression(f):
+    # Per-route opt-out, e.g. for endpoints that already send compressed bytes
+    f.skip_compression = True
+    return f
+
+
+def _route_opted_out():
+    view = current_app.view_functions.get(request.endpoint)
+    return view is not None and getattr(view, 'skip_compression', False)
+
+
+def _should_compress(response):
+    if request.method == 'HEAD' or response.direct_passthrough:
+        return False
+    if response.status_code < 200 or response.status_code >= 300 or response.status_code == 204:
+        return False
+    if 'Content-Encoding' in response.headers:
+        return False
+    if 'no-transform' in response.headers.get('Cache-Control', ''):
+        return False
+    if not response.mimetype or not response.mimetype.startswith(COMPRESSIBLE_TYPES):
+        return False
+    return not _route_opted_out()
+
+
+def _stream_compressed(chunks, stream_factory):
+    # The WSGI server closes this generator when the client goes away; pass that
+    # on so the wrapped body runs its own cleanup (the export's connections)
+    # instead of waiting for garbage collection.
+    compress_chunk, finish = stream_factory()
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compress_chunk(chunk)
+            if data:
+                yield data
+        yield finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def compress_response(response):
+    if not _should_compress(response):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(list(ENCODERS))
+    if encoding is None:
+        return response
+
+    compress, stream_factory = ENCODERS[encoding]
+
+    if response.is_streamed:
+        response.response = _stream_compressed(response.response, stream_factory)
+        response.headers.pop('Content-Length', None)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE:
+        return response
+
+    digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+    etag = f"{digest}-{encoding}"
+    compressed = compressed_cache.get(etag)
+    if compressed is None:
+        compressed = compress(body)
+        compressed_cache.put(etag, compressed)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
+def init_compression(app):
+    app.after_request(compress_response)
+    logging.info(f"Response compression enabled ({', '.join(ENCODERS)}; min size {COMPRESS_MIN_SIZE} bytes)")
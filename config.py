@@ -1,32 +1,510 @@
 import pymysql
+from pymysql.constants import CLIENT
 from dotenv import load_dotenv
 import os  # os is the Python module for interacting with the operating system.
 import logging
+import itertools
+import queue
+import random
+import threading
+import time
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# The only place .env is loaded; other modules read their settings after importing config
 load_dotenv()
+SECRET_KEY = os.getenv('jwt_secret_key')
+
+PREPARED_STATEMENTS = os.getenv('mysql_prepared_statements', 'false').lower() in ('1', 'true', 'yes')
+POOL_SIZE = int(os.getenv('mysql_pool_size', '10'))
+POOL_TIMEOUT = float(os.getenv('mysql_pool_timeout', '5'))
+POOL_RECYCLE = float(os.getenv('mysql_pool_recycle', '300'))
+# Connections that accept several statements per query, for get_db_connection(pipeline=True)
+PIPELINE_POOL_SIZE = int(os.getenv('mysql_pipeline_pool_size', '4'))
+
+# Socket timeouts (seconds): a database that stops answering fails the request
+# instead of holding its worker thread indefinitely
+CONNECT_TIMEOUT = float(os.getenv('mysql_connect_timeout', '5'))
+READ_TIMEOUT = float(os.getenv('mysql_read_timeout', '30'))
+WRITE_TIMEOUT = float(os.getenv('mysql_write_timeout', '30'))
+
+# Reads (read_only=True checkouts and their SELECTs) retry this many times after
+# a connection error, sleeping retry_backoff * 2^attempt with jitter in between
+READ_RETRIES = int(os.getenv('mysql_read_retries', '2'))
+RETRY_BACKOFF = float(os.getenv('mysql_retry_backoff', '0.05'))
+
+# After breaker_threshold connection failures in a row the primary is treated as
+# down for breaker_reset seconds: checkouts fail at once instead of each thread
+# waiting out a connect timeout. One trial connection then decides.
+BREAKER_THRESHOLD = int(os.getenv('mysql_breaker_threshold', '5'))
+BREAKER_RESET = float(os.getenv('mysql_breaker_reset', '10'))
+
+# Read replicas: comma separated host or host:port entries
+REPLICA_HOSTS = [host.strip() for host in os.getenv('mysql_replica_hosts', '').split(',') if host.strip()]
+REPLICA_STRATEGY = os.getenv('mysql_replica_strategy', 'round_robin').lower()  # or least_latency
+REPLICA_CHECK_INTERVAL = float(os.getenv('mysql_replica_check_interval', '10'))
+REPLICA_MAX_LAG = float(os.getenv('mysql_replica_max_lag', '30'))
+READ_YOUR_WRITES_SECONDS = float(os.getenv('read_your_writes_seconds', '5'))
 
-logging.info("Attempting to connect to MySQL...")
 
 # Function to create a MySQL connection
-def get_db_connection():
-    mydb = None
+def create_connection(host=None, port=None, multi_statements=False):
+    # multi_statements lets queries.fetch_pipeline (and SET + EXECUTE of a prepared
+    # statement) go out as one round trip. It also lets one query string carry
+    # stacked statements, so only the separate pipeline pools turn it on.
+    connect_args = {'connect_timeout': CONNECT_TIMEOUT, 'read_timeout': READ_TIMEOUT, 'write_timeout': WRITE_TIMEOUT}
+    if multi_statements:
+        connect_args['client_flag'] = CLIENT.MULTI_STATEMENTS
+    if port:
+        connect_args['port'] = port
+    return pymysql.connect(
+        host=host or os.getenv('mysql_host'),
+        user=os.getenv('mysql_user'),
+        password=os.getenv('mysql_password'),
+        database=os.getenv('mysql_database'),
+        **connect_args
+    )
+
+
+# Client-side codes for "could not connect" / "server has gone away" / "lost
+# connection during query" (also what a read_timeout surfaces as)
+CONNECTION_ERRORS = (2003, 2006, 2013)
+
+
+def is_connection_error(error):
+    return isinstance(error, pymysql.OperationalError) and bool(error.args) and error.args[0] in CONNECTION_ERRORS
+
+
+def retry_delay(attempt):
+    return RETRY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.0)  # jitter keeps retries from lining up
+
+
+class PoolTimeout(pymysql.OperationalError):
+    # Every pooled connection is busy: the pool is saturated, the database may be fine
+    pass
+
+
+class CircuitBreaker:
+    # closed: normal. open: checkouts fail fast until reset_timeout has passed.
+    # half_open: a single trial checkout is let through; its outcome closes the
+    # breaker again or re-opens it for another reset_timeout.
+
+    def __init__(self, threshold, reset_timeout, on_open=None):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.on_open = on_open
+        self.state = 'closed'
+        self.failures = 0  # consecutive
+        self.opened_at = 0.0
+        self.trial = False
+        self.trips = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self.trial = False
+            if self.state == 'closed':
+                return True
+            if self.state == 'half_open' and not self.trial:
+                self.trial = True
+                return True
+            self.rejected += 1
+            return False
+
+    def success(self):
+        with self.lock:
+            if self.state != 'closed':
+                logging.info("MySQL circuit breaker closed, database reachable again")
+            self.state = 'closed'
+            self.failures = 0
+            self.trial = False
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            tripped = self.state == 'half_open' or (self.state == 'closed' and self.failures >= self.threshold)
+            if tripped:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                self.trips += 1
+            self.trial = False
+        if tripped:
+            logging.error(f"MySQL circuit breaker open after {self.failures} connection failure(s); "
+                          f"failing fast for {self.reset_timeout}s")
+            if self.on_open:
+                self.on_open()
+
+    def cancel(self):
+        # The trial never reached the database (e.g. the pool was saturated)
+        with self.lock:
+            self.trial = False
+
+    def stats(self):
+        with self.lock:
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at)) if self.state == 'open' else 0.0
+            return {'state': self.state, 'consecutive_failures': self.failures, 'trips': self.trips,
+                    'rejected': self.rejected, 'retry_in': round(retry_in, 1)}
+
+
+class PooledConnection:
+    # Behaves like the pymysql connection it wraps, except close() hands the
+    # connection back to the pool so it (and its prepared statements) is reused.
+
+    def __init__(self, pool, connection, session=None, read_only=False, replica=None):
+        self._pool = pool
+        self._connection = connection
+        self._session = session
+        # queries.execute may reconnect and repeat a SELECT on read-only checkouts
+        connection.retry_reads = read_only
+        # None for the primary; see connection_lost()
+        connection.replica = replica
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def commit(self):
+        self._connection.commit()
+        if self._session is not None:
+            sessions.record_write(self._session)
+
+    def close(self):
+        if self._connection is not None:
+            self._pool.release(self._connection)
+            self._connection = None
+
+
+class ConnectionPool:
+
+    def __init__(self, size, timeout, recycle, connect=create_connection):
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.connect = connect
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+        # Saturation counters for /debug/pool: checkouts that found every
+        # connection busy, how long they queued, and how many gave up
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+
+    def _usable(self, connection, idle_since, verify=False):
+        if not connection.open:
+            return False
+        if not verify and time.monotonic() - idle_since < self.recycle:
+            return True
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except pymysql.Error:
+            return False
+
+    def _discard(self, connection):
+        with self.lock:
+            self.created -= 1
+        try:
+            connection.close()
+        except pymysql.Error:
+            pass
+
+    def clear_idle(self):
+        # Idle connections are presumed dead once the breaker opens
+        while True:
+            try:
+                connection, _ = self.idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(connection)
+
+    def _waited(self, seconds, timed_out=False):
+        with self.lock:
+            self.waits += 1
+            self.wait_seconds += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            self.timeouts += timed_out
+
+    def stats(self):
+        idle = self.idle.qsize()
+        with self.lock:
+            return {
+                'size': self.size,
+                'open': self.created,
+                'idle': idle,
+                'in_use': max(0, self.created - idle),
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'avg_wait_ms': round(self.wait_seconds / self.waits * 1000, 1) if self.waits else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 1)
+            }
+
+    def acquire(self, verify=False):
+        # verify=True pings even a recently used idle connection
+        while True:
+            try:
+                connection, idle_since = self.idle.get_nowait()
+            except queue.Empty:
+                with self.lock:
+                    can_create = self.created < self.size
+                    if can_create:
+                        self.created += 1
+                if can_create:
+                    try:
+                        connection = self.connect()
+                    except Exception:
+                        with self.lock:
+                            self.created -= 1
+                        raise
+                    with self.lock:
+                        self.checkouts += 1
+                    return connection
+                started = time.monotonic()
+                try:
+                    connection, idle_since = self.idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    self._waited(time.monotonic() - started, timed_out=True)
+                    raise PoolTimeout(f"Timed out after {self.timeout}s waiting for a pooled connection")
+                self._waited(time.monotonic() - started)
+
+            if self._usable(connection, idle_since, verify):
+                with self.lock:
+                    self.checkouts += 1
+                return connection
+            self._discard(connection)
+
+    def release(self, connection):
+        try:
+            # Never hand an open transaction to the next request
+            connection.rollback()
+        except pymysql.Error:
+            self._discard(connection)
+            return
+        self.idle.put((connection, time.monotonic()))
+
+
+class SessionWrites:
+    # Remembers who wrote recently so their next reads stay on the primary
+    # until replicas have had time to catch up (read-your-writes).
+
+    def __init__(self, window):
+        self.window = window
+        self.expires = {}
+        self.lock = threading.Lock()
+
+    def record_write(self, session):
+        now = time.monotonic()
+        with self.lock:
+            self.expires[session] = now + self.window
+            if len(self.expires) > 10000:
+                self.expires = {key: until for key, until in self.expires.items() if until > now}
+
+    def is_pinned(self, session):
+        with self.lock:
+            until = self.expires.get(session)
+        return until is not None and until > time.monotonic()
+
+
+class Replica:
+
+    def __init__(self, address):
+        host, _, port = address.partition(':')
+        self.address = address
+        port = int(port) if port else None
+        self.pool = ConnectionPool(POOL_SIZE, POOL_TIMEOUT, POOL_RECYCLE,
+                                   connect=lambda: create_connection(host, port))
+        self.pipeline_pool = ConnectionPool(PIPELINE_POOL_SIZE, POOL_TIMEOUT, POOL_RECYCLE,
+                                            connect=lambda: create_connection(host, port, multi_statements=True))
+        self.healthy = True
+        self.latency = 0.0  # moving average of health-check round trips, seconds
+
+
+class ReplicaSet:
+
+    def __init__(self, addresses, strategy, check_interval, max_lag):
+        self.replicas = [Replica(address) for address in addresses]
+        self.strategy = strategy
+        self.check_interval = check_interval
+        self.max_lag = max_lag
+        self.counter = itertools.count()
+        self.checker = None
+        self.lock = threading.Lock()
+
+    def choose(self):
+        self._start_checker()
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        if self.strategy == 'least_latency':
+            return min(healthy, key=lambda replica: replica.latency)
+        return healthy[next(self.counter) % len(healthy)]
+
+    def mark_unhealthy(self, replica):
+        if replica.healthy:
+            logging.warning(f"Read replica {replica.address} marked unhealthy")
+        replica.healthy = False
+
+    def check(self, replica):
+        connection = None
+        try:
+            started = time.perf_counter()
+            connection = replica.pool.acquire()
+            cursor = connection.cursor(pymysql.cursors.DictCursor)
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            elapsed = time.perf_counter() - started
+
+            status = None
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+                status = cursor.fetchone()
+            except pymysql.Error:
+                pass  # needs REPLICATION CLIENT; without it only liveness is checked
+            cursor.close()
+            lag = status.get('Seconds_Behind_Source') if status else None
+
+            replica.latency = elapsed if replica.latency == 0.0 else 0.8 * replica.latency + 0.2 * elapsed
+            if status and lag is None:
+                # NULL lag means a replication thread has stopped: the data is stale without bound
+                logging.warning(f"Replication on read replica {replica.address} is stopped, skipping it")
+                self.mark_unhealthy(replica)
+            elif lag is not None and lag > self.max_lag:
+                logging.warning(f"Read replica {replica.address} is {lag}s behind, skipping it")
+                self.mark_unhealthy(replica)
+            else:
+                if not replica.healthy:
+                    logging.info(f"Read replica {replica.address} is healthy again")
+                replica.healthy = True
+        except pymysql.Error as e:
+            logging.warning(f"Health check failed for read replica {replica.address}: {e}")
+            self.mark_unhealthy(replica)
+        finally:
+            if connection is not None:
+                replica.pool.release(connection)
+
+    def _run_checks(self):
+        while True:
+            for replica in self.replicas:
+                self.check(replica)
+            time.sleep(self.check_interval)
+
+    def _start_checker(self):
+        if self.checker is not None:
+            return
+        with self.lock:
+            if self.checker is None:
+                self.checker = threading.Thread(target=self._run_checks, name='replica-health', daemon=True)
+                self.checker.start()
+
+
+pool = ConnectionPool(POOL_SIZE, POOL_TIMEOUT, POOL_RECYCLE)
+pipeline_pool = ConnectionPool(PIPELINE_POOL_SIZE, POOL_TIMEOUT, POOL_RECYCLE,
+                               connect=lambda: create_connection(multi_statements=True))
+
+
+def _clear_idle():
+    pool.clear_idle()
+    pipeline_pool.clear_idle()
+
+
+breaker = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_RESET, on_open=_clear_idle)
+sessions = SessionWrites(READ_YOUR_WRITES_SECONDS)
+replicas = ReplicaSet(REPLICA_HOSTS, REPLICA_STRATEGY, REPLICA_CHECK_INTERVAL, REPLICA_MAX_LAG)
+
+
+def _get_replica_connection(session, pipeline):
+    if not replicas.replicas or (session is not None and sessions.is_pinned(session)):
+        return None
+    replica = replicas.choose()
+    if replica is None:
+        return None
+    replica_pool = replica.pipeline_pool if pipeline else replica.pool
     try:
-        mydb = pymysql.connect(
-            host=os.getenv('mysql_host'),
-            user=os.getenv('mysql_user'),
-            password=os.getenv('mysql_password'),
-            database=os.getenv('mysql_database'),
-        )
-        logging.info("Successfully Connected to MySQL")
-        return mydb
+        return PooledConnection(replica_pool, replica_pool.acquire(), read_only=True, replica=replica)
     except pymysql.Error as e:
-        logging.error(f"Error connecting to MySQL: {e}")
+        logging.warning(f"Read replica {replica.address} unavailable, using primary: {e}")
+        replicas.mark_unhealthy(replica)
         return None
 
 
+def _acquire_primary(primary_pool, attempts):
+    for attempt in range(attempts):
+        if not breaker.allow():
+            logging.warning("MySQL circuit breaker open, not connecting")
+            return None
+        try:
+            connection = primary_pool.acquire(verify=breaker.state == 'half_open')
+        except PoolTimeout as e:
+            # Saturation rather than an outage; retrying would only queue longer
+            breaker.cancel()
+            logging.error(f"Error connecting to MySQL: {e}")
+            return None
+        except pymysql.Error as e:
+            breaker.failure()
+            if attempt + 1 < attempts and breaker.state != 'open':
+                delay = retry_delay(attempt)
+                logging.warning(f"Error connecting to MySQL, retrying in {delay * 1000:.0f} ms: {e}")
+                time.sleep(delay)
+                continue
+            logging.error(f"Error connecting to MySQL: {e}")
+            return None
+        breaker.success()
+        return connection
+    return None
+
+
+# read_only=True lets GET handlers use a replica and retry after connection
+# errors; session (the user id) pins that user to the primary for a short
+# window after their own commits. pipeline=True checks out a multi-statement
+# connection for queries.fetch_pipeline. Returns None when no connection could be had.
+def get_db_connection(read_only=False, session=None, pipeline=False):
+    if read_only:
+        mydb = _get_replica_connection(session, pipeline)
+        if mydb is not None:
+            return mydb
+    primary_pool = pipeline_pool if pipeline else pool
+    connection = _acquire_primary(primary_pool, 1 + READ_RETRIES if read_only else 1)
+    if connection is None:
+        return None
+    logging.debug("Connection checked out from MySQL pool")
+    return PooledConnection(primary_pool, connection, session, read_only)
+
+
+def connection_lost(connection):
+    # A dropped primary connection counts against the circuit breaker; a dropped
+    # replica connection takes that replica out of rotation instead, so a
+    # flapping replica cannot fail writes fast while the primary is healthy.
+    # connection is the pymysql connection, e.g. cursor.connection
+    replica = getattr(connection, 'replica', None)
+    if replica is not None:
+        replicas.mark_unhealthy(replica)
+    else:
+        breaker.failure()
+
+
+def multi_statements(connection):
+    # connection is the pymysql connection, e.g. cursor.connection
+    return bool(getattr(connection, 'client_flag', 0) & CLIENT.MULTI_STATEMENTS)
+
+
+def stats():
+    return {
+        'breaker': breaker.stats(),
+        'pool': pool.stats(),
+        'pipeline_pool': pipeline_pool.stats(),
+        'replicas': [{'address': replica.address, 'healthy': replica.healthy,
+                      'latency_ms': round(replica.latency * 1000, 1), 'pool': replica.pool.stats(),
+                      'pipeline_pool': replica.pipeline_pool.stats()}
+                     for replica in replicas.replicas],
+        'pinned_sessions': len(sessions.expires)  # users reading from the primary after a write
+    }
+
 if __name__ == '__main__':
     connection = get_db_connection()
     if connection:
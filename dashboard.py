@@ -0,0 +1,251 @@
+from flask import Blueprint, jsonify
+from config import get_db_connection
+from verify_jwt import token_required
+from datetime import date
+import logging
+import os
+import sys
+import threading
+import time
+import queries
+
+# The dashboard figures live as counters in dashboard_counters. Every write that
+# changes one bumps it inside its own transaction, so /dashboard/summary reads a
+# handful of rows instead of downloading whole tables. reconcile() rebuilds the
+# counters from the base tables to repair drift from manual SQL edits.
+# Every counter belongs to one workshop: its name is "<workshop>|<counter>".
+# An item is low on stock at or below its reorder_threshold (see low_stock.py).
+#   python dashboard.py reconcile
+
+RECONCILE_INTERVAL = float(os.getenv('dashboard_reconcile_interval', '3600'))  # 0 disables the background job
+
+ACTIVE_EMPLOYEES = 'employees_active'
+LOW_STOCK = 'inventory_low_stock'
+PROJECT_STATUS_PREFIX = 'projects_status:'
+# Deployment-wide bookkeeping; the missing "<workshop>|" keeps it out of reconcile()
+LAST_RECONCILED = 'reconciled_at'
+RECONCILE_LOCK = 'fbms_dashboard_reconcile'
+
+dash = Blueprint('dashboard', __name__)
+
+
+def counter_key(tenant, name):
+    return f"{tenant}|{name}"
+
+
+def project_status_key(tenant, status):
+    return counter_key(tenant, PROJECT_STATUS_PREFIX + status)
+
+
+def month_cost_key(tenant, day):
+    return counter_key(tenant, f"cost_month:{day:%Y-%m}")
+
+
+def _like_prefix(prefix):
+    # Workshop names are user data; keep their % and _ literal in LIKE
+    return prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def _month_bounds(day):
+    start = day.replace(day=1)
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start, end
+
+
+def bump(cursor, name, delta):
+    if delta:
+        queries.execute(cursor, queries.COUNTER_BUMP, (name, delta))
+
+
+# ===== Write hooks (called inside the caller's transaction) =====
+
+def project_status_changed(cursor, tenant, old_status, new_status):
+    if old_status == new_status:
+        return
+    if old_status is not None:
+        bump(cursor, project_status_key(tenant, old_status), -1)
+    if new_status is not None:
+        bump(cursor, project_status_key(tenant, new_status), 1)
+
+
+def permission_changed(cursor, tenant, old_permission, new_permission):
+    bump(cursor, counter_key(tenant, ACTIVE_EMPLOYEES), (new_permission == 'TRUE') - (old_permission == 'TRUE'))
+
+
+def low_stock_changed(cursor, tenant, was_low, now_low):
+    bump(cursor, counter_key(tenant, LOW_STOCK), now_low - was_low)
+
+
+def cost_added(cursor, tenant, when, amount):
+    bump(cursor, month_cost_key(tenant, when), amount)
+
+
+# ===== Reconciliation =====
+
+def reconcile(connection, min_age=0):
+    # The counters and the base tables are read from one consistent snapshot
+    # without locking anything, then the drift found there is added to the live
+    # counters with COUNTER_BUMP. Writers bump a counter in the same transaction
+    # as the row it counts, so anything committed after the snapshot is already
+    # in both and its delta survives; only the short bump transaction takes row
+    # locks. The named lock keeps a second run from applying the same drift
+    # again, and min_age skips the run when another process reconciled recently.
+    # Returns the rebuilt counters, or None when the run was skipped.
+    cursor = connection.cursor()
+    try:
+        if not queries.fetchone(cursor, queries.RECONCILE_GET_LOCK, (RECONCILE_LOCK,))[0]:
+            logging.info("Dashboard reconciliation skipped, already running elsewhere")
+            return None
+        try:
+            if min_age > 0:
+                row = queries.fetchone(cursor, queries.COUNTER_VALUE, (LAST_RECONCILED,))
+                if row and time.time() - float(row[0]) < min_age:
+                    return None
+
+            queries.execute(cursor, queries.RECONCILE_SNAPSHOT)
+            try:
+                before = {name: value for name, value in queries.fetchall(cursor, queries.COUNTER_ALL)
+                          if '|' in name}
+                counters = {project_status_key(tenant, status): count
+                            for tenant, status, count in queries.fetchall(cursor, queries.RECONCILE_PROJECT_STATUS)}
+                for tenant, count in queries.fetchall(cursor, queries.RECONCILE_ACTIVE_EMPLOYEES):
+                    counters[counter_key(tenant, ACTIVE_EMPLOYEES)] = count
+                for tenant, count in queries.fetchall(cursor, queries.RECONCILE_LOW_STOCK):
+                    counters[counter_key(tenant, LOW_STOCK)] = count
+                # Only the current month is shown; closed months are left as they are
+                start, end = _month_bounds(date.today())
+                current_month = f"cost_month:{start:%Y-%m}"
+                for tenant, cost in queries.fetchall(cursor, queries.RECONCILE_MONTH_COST, (start, end)):
+                    counters[month_cost_key(tenant, start)] = cost
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+
+            # Counters whose rows have all gone (a status nobody uses any more, a
+            # workshop with no low stock) are zeroed rather than left stale
+            for name in before:
+                counter = name.split('|', 1)[1]
+                if name not in counters and (not counter.startswith('cost_month:') or counter == current_month):
+                    counters[name] = 0
+
+            drifted = {name: (before.get(name, 0), value) for name, value in counters.items()
+                       if before.get(name, 0) != value}
+            try:
+                connection.begin()
+                for name in sorted(drifted):
+                    was, now = drifted[name]
+                    bump(cursor, name, now - was)
+                queries.execute(cursor, queries.COUNTER_SET, (LAST_RECONCILED, int(time.time())))
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+        finally:
+            queries.execute(cursor, queries.RECONCILE_RELEASE_LOCK, (RECONCILE_LOCK,))
+    finally:
+        cursor.close()
+
+    if drifted:
+        logging.warning(f"Dashboard counters drifted (was, now): {drifted}")
+    else:
+        logging.info("Dashboard counters reconciled, no drift")
+    return counters
+
+
+def reconcile_job(cursor, payload):
+    # Background job entry point (`python jobs.py enqueue reconcile_dashboard`).
+    # The values span every workshop, so only the count goes into the result.
+    counters = reconcile(cursor.connection)
+    if counters is None:
+        return {'skipped': True}
+    return {'counters': len(counters)}
+
+
+def _run_reconciler(interval):
+    while True:
+        connection = get_db_connection()
+        if connection is None:
+            logging.error("Dashboard reconciliation skipped, no database connection")
+        else:
+            try:
+                reconcile(connection, min_age=interval)
+            except Exception as e:
+                logging.error(f"Dashboard reconciliation failed: {e}", exc_info=True)
+            finally:
+                connection.close()
+        time.sleep(interval)
+
+
+_reconciler = None
+
+
+def start_reconciler(interval=RECONCILE_INTERVAL):
+    # Every worker process starts one, but a tick finds either the named lock
+    # taken or a reconciliation younger than the interval, so the deployment as
+    # a whole rebuilds the counters about once per interval
+    global _reconciler
+    if interval <= 0 or _reconciler is not None:
+        return
+    _reconciler = threading.Thread(target=_run_reconciler, args=(interval,), name='dashboard-reconcile', daemon=True)
+    _reconciler.start()
+
+
+@dash.route('/dashboard/summary', methods=['GET'])
+@token_required
+def get_summary(decoded):
+    logging.info("GET request received for /dashboard/summary")
+    connection = None
+    cursor = None
+    tenant = decoded['tenant']
+    today = date.today()
+    active_key = counter_key(tenant, ACTIVE_EMPLOYEES)
+    low_stock_key = counter_key(tenant, LOW_STOCK)
+    month_key = month_cost_key(tenant, today)
+    status_prefix = project_status_key(tenant, '')
+    try:
+        connection = get_db_connection(read_only=True, session=decoded['user_id'])
+        if connection is None:
+            logging.error("Failed to establish database connection for GET /dashboard/summary")
+            return jsonify({'error': 'Failed to connect to the database'}), 500
+        cursor = connection.cursor()
+
+        counters = dict(queries.fetchall(cursor, queries.COUNTER_SUMMARY,
+                                         (active_key, low_stock_key, month_key, _like_prefix(status_prefix))))
+
+        projects_by_status = {name[len(status_prefix):]: int(value) for name, value in counters.items()
+                              if name.startswith(status_prefix) and value}
+        return jsonify({
+            'projects_by_status': projects_by_status,
+            'total_projects': sum(projects_by_status.values()),
+            'active_employees': int(counters.get(active_key, 0)),
+            'low_stock_items': int(counters.get(low_stock_key, 0)),
+            'month': f"{today:%Y-%m}",
+            'month_cost': float(counters.get(month_key, 0))
+        }), 200
+
+    except Exception as e:
+        logging.error(f"Error processing GET request for /dashboard/summary: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            connection.close()
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'reconcile'
+    if command != 'reconcile':
+        sys.exit(f"Unknown command '{command}'. Use reconcile.")
+    connection = get_db_connection()
+    if connection is None:
+        sys.exit("Failed to establish database connection.")
+    try:
+        counters = reconcile(connection)
+        if counters is None:
+            sys.exit("Another process is reconciling the dashboard counters.")
+        for name, value in sorted(counters.items()):
+            print(f"{name:<32} {value}")
+    finally:
+        connection.close()
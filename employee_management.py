@@ -1,18 +1,15 @@
 from flask import Blueprint, jsonify, request
-from config import get_db_connection
+from config import get_db_connection, SECRET_KEY
 import logging, bcrypt
 from verify_jwt import token_required
-from datetime import datetime
-import re
+from validation import EMPLOYEE_SCHEMA, EMPLOYEE_UPDATE_SCHEMA
+from json_provider import rows_response
+import audit
+import batch_lookup
+import dashboard
+import jobs
+import queries
 import jwt
-from dotenv import load_dotenv
-import os
-
-load_dotenv()
-SECRET_KEY = os.getenv('jwt_secret_key')
-
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 emp = Blueprint('employee', __name__)
 
@@ -22,6 +19,35 @@ def hash_password(password):
 def check_password(password, hashed):
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
+def _own_workshop(decoded, employee):
+    # Employees are created and edited inside the caller's workshop only; an
+    # empty workshop_name means that workshop
+    if employee['workshop_name'] and employee['workshop_name'] != decoded['tenant']:
+        return "Employees can only be managed within your own workshop"
+    employee['workshop_name'] = decoded['tenant']
+    return None
+
+
+def create_employee(cursor, tenant, employee, hashed_pw):
+    # Inserts the employee and its login row; the caller owns the transaction
+    queries.execute(cursor, queries.EMPLOYEE_INSERT, (
+        employee['first_name'], employee['last_name'], employee['email'], employee['address'], employee['nic'],
+        employee['birth_day'], employee['role'], employee['workshop_name'], employee['design_category']
+    ))
+    emp_id = cursor.lastrowid
+    queries.execute(cursor, queries.LOGIN_INSERT, (emp_id, employee['email'], hashed_pw, employee['permission']))
+    dashboard.permission_changed(cursor, tenant, None, employee['permission'])
+    return emp_id
+
+def set_initial_password(cursor, payload):
+    # Background job queued by add_employee: the first password is the NIC
+    emp_id = payload['emp_id']
+    row = queries.fetchone(cursor, queries.EMPLOYEE_NIC, (emp_id,))
+    if not row:
+        raise LookupError(f"Employee {emp_id} no longer exists")
+    queries.execute(cursor, queries.LOGIN_SET_INITIAL_PASSWORD, (hash_password(row[0]), emp_id))
+    return {'emp_id': emp_id, 'password_set': cursor.rowcount == 1}
+
 #get all employees
 @emp.route('/employees', methods=['GET'])
 @token_required
@@ -30,31 +56,14 @@ def get_employees(decoded):
     connection = None
     cursor = None
     try:
-        connection = get_db_connection()
+        connection = get_db_connection(read_only=True, session=decoded['user_id'])
+        if connection is None:
+            return jsonify({'error': 'Failed to connect to the database'}), 500
         cursor = connection.cursor()
-        cursor.execute("""
-            SELECT employee.*, login.permission
-            FROM employee INNER JOIN login ON employee.emp_id = login.emp_id
-        """)
-        results = cursor.fetchall()
+        results = queries.fetchall(cursor, queries.EMPLOYEE_LIST, (decoded['tenant'],))
         logging.info(f"Retrieved {len(results)} employees from the database")
 
-        users = []
-        for row in results:
-            users.append({
-                'emp_id': row[0],
-                'first_name': row[1],
-                'last_name': row[2],
-                'email': row[9],
-                'address': row[3],
-                'nic': row[4],
-                'birth_day': row[5],
-                'role': row[6],
-                'workshop_name': row[7],
-                'design_category': row[8],
-                'permission': row[10]
-            })
-        return jsonify(users)
+        return rows_response(queries.EMPLOYEE_LIST.columns, results)
 
     except Exception as e:
         if connection:
@@ -75,76 +84,34 @@ def add_employee(decoded):
     logging.info("POST request received for /employees")
     data = request.get_json()
     logging.info(f"Received JSON data: {data}")
-    first_name = data.get('first_name')
-    last_name = data.get('last_name')
-    email = data.get('email')
-    address = data.get('address')
-    nic = data.get('nic')
-    birth_day = data.get('birth_day')
-    role = data.get('role')
-    workshop_name = data.get('workshop_name')
-    design_category = data.get('design_category')
-    permission = data.get('permission')
-    hashed_pw = hash_password(nic)  
-
-    if not first_name or not email or not nic:
-        return jsonify({'error': 'Name, email and NIC are required'}), 400
-    
-    # ===== Name Validation =====
-    name_pattern = r'^[A-Za-z\s\-]+$'
-    if not re.match(name_pattern, first_name):
-        return jsonify({'error': 'First name must contain only letters, spaces, or hyphens'}), 400
-    if last_name and not re.match(name_pattern, last_name):
-        return jsonify({'error': 'Last name must contain only letters, spaces, or hyphens'}), 400
-
-    # ===== Email Validation =====
-    email_pattern = r'^[\w\.-]+@[\w\.-]+\.\w{2,4}$'
-    if not re.match(email_pattern, email):
-        return jsonify({'error': 'Invalid email format'}), 400
-
-    # ===== NIC Validation =====
-    nic_pattern_12 = r'^\d{12}$'
-    nic_pattern_9v = r'^\d{9}V$'
-    if not (re.match(nic_pattern_12, nic) or re.match(nic_pattern_9v, nic)):
-        return jsonify({'error': 'NIC must be 12 digits or 9 digits followed by capital "V"'}), 400
-
-    # ===== Birthday Validation =====
-    try:
-        birth_date = datetime.strptime(birth_day, '%Y-%m-%d')
-        age = (datetime.now() - birth_date).days / 365.25
-        if age < 18:
-            return jsonify({'error': 'Employee must be at least 18 years old'}), 400
-    except (ValueError, TypeError):
-        return jsonify({'error': 'Invalid birth_day format. Use YYYY-MM-DD'}), 400
+    # ===== Field Validation =====
+    employee, error = EMPLOYEE_SCHEMA.validate(data)
+    if error:
+        return jsonify({'error': error}), 400
+    error = _own_workshop(decoded, employee)
+    if error:
+        return jsonify({'error': error}), 403
 
     connection = None
     cursor = None
 
     try:
-        connection = get_db_connection()
+        connection = get_db_connection(session=decoded['user_id'])
+        if connection is None:
+            return jsonify({'error': 'Failed to connect to the database'}), 500
         cursor = connection.cursor()
-        cursor.execute("""
-            INSERT INTO employee (first_name, last_name, email, address, nic, birth_day, role, workshop_name, design_category)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (first_name, last_name, email, address, nic, birth_day, role, workshop_name, design_category))
-        connection.commit()
-        
-        cursor.execute("SELECT emp_id FROM employee WHERE email = %s AND nic = %s", (email, nic))
-        connection.commit()
-
-        result = cursor.fetchone() 
-    
-        emp_id = None
-        if result:
-            emp_id = result[0]
 
-        cursor.execute(
-            "INSERT INTO login (emp_id, email, hashed_password, permission) VALUES (%s, %s, %s, %s)",
-            (emp_id, email, hashed_pw, permission) 
-        )
+        # bcrypt would hold this request thread for ~250 ms, so the initial
+        # password is hashed by a background job; login answers 503 until then
+        emp_id = create_employee(cursor, decoded['tenant'], employee, '')
+        password_job_id = jobs.enqueue(cursor, 'set_initial_password', {'emp_id': emp_id}, decoded['user_id'])
         connection.commit()
+        jobs.wake()
 
-        return jsonify({'message': 'Employee added successfully'}), 201
+        employee['emp_id'] = emp_id
+        logging.info(f"Employee with ID '{emp_id}' added successfully.")
+        return jsonify({'message': 'Employee added successfully', 'emp_id': emp_id, 'employee': employee,
+                        'password_job_id': password_job_id}), 201
 
     except Exception as e:
         if connection:
@@ -159,6 +126,12 @@ def add_employee(decoded):
             connection.close()
 
 #get single employee
+@emp.route('/employees/batch', methods=['GET'])
+@token_required
+def get_employees_batch(decoded):
+    return batch_lookup.lookup(decoded, '/employees/batch', queries.EMPLOYEE_BATCH)
+
+
 @emp.route('/employees/<int:emp_id>', methods=['GET'])
 @token_required
 def get_employee(decoded, emp_id):
@@ -166,17 +139,14 @@ def get_employee(decoded, emp_id):
     connection = None
     cursor = None
     try:
-        connection = get_db_connection()
+        connection = get_db_connection(read_only=True, session=decoded['user_id'])
+        if connection is None:
+            return jsonify({'error': 'Failed to connect to the database'}), 500
         cursor = connection.cursor()
-        cursor.execute("SELECT * FROM employee WHERE emp_id = %s", (emp_id,))
-        result = cursor.fetchone()
+        result = queries.fetchone(cursor, queries.EMPLOYEE_BY_ID, (decoded['tenant'], emp_id))
 
         if result:
-            employee = {
-                'emp_id': result[0], 'first_name': result[1], 'last_name': result[2], 'email': result[9],
-                'address': result[3], 'nic': result[4], 'birth_day': str(result[5]), 'role': result[6],
-                'workshop_name': result[7], 'design_category': result[8]
-            }
+            employee = queries.EMPLOYEE_BY_ID.to_dict(result)
             return jsonify(employee), 200
         else:
             return jsonify({'error': 'Employee not found'}), 404
@@ -198,70 +168,62 @@ def update_employee(decoded, emp_id):
     logging.info(f"PUT request for /employees/{emp_id}")
     data = request.get_json()
     logging.info(f"Received JSON: {data}")
-    first_name = data.get('first_name')
-    last_name = data.get('last_name')
-    email = data.get('email')
-    address = data.get('address')
-    nic = data.get('nic')
-    birth_day = data.get('birth_day')
-    role = data.get('role')
-    workshop_name = data.get('workshop_name')
-    design_category = data.get('design_category')
-    password = data.get('password')
-
+    # ===== Field Validation =====
+    employee, error = EMPLOYEE_UPDATE_SCHEMA.validate(data)
+    if error:
+        return jsonify({'error': error}), 400
+    error = _own_workshop(decoded, employee)
+    if error:
+        return jsonify({'error': error}), 403
+
+    first_name = employee['first_name']
+    last_name = employee['last_name']
+    email = employee['email']
+    address = employee['address']
+    nic = employee['nic']
+    birth_day = employee['birth_day']
+    role = employee['role']
+    workshop_name = employee['workshop_name']
+    design_category = employee['design_category']
+    password = employee['password']
+
+    # bcrypt costs ~0.25 s of CPU on this worker thread. It runs before a pooled
+    # connection is taken, so no connection or row lock waits on it. It stays in
+    # the request rather than going to a job like add_employee's NIC hash,
+    # because a job payload would persist the new password in plain text.
     hashed_pw = None
     if password:
         hashed_pw = hash_password(password)
 
-    # ===== Required Field Checks =====
-    if not first_name or not email or not nic:
-        return jsonify({'error': 'First name, email, and NIC are required'}), 400
-    
-    # ===== Name Validation =====
-    name_pattern = r'^[A-Za-z\s\-]+$'
-    if not re.match(name_pattern, first_name):
-        return jsonify({'error': 'First name must contain only letters, spaces, or hyphens'}), 400
-    if last_name and not re.match(name_pattern, last_name):
-        return jsonify({'error': 'Last name must contain only letters, spaces, or hyphens'}), 400
-
-    # ===== Email Validation =====
-    email_pattern = r'^[\w\.-]+@[\w\.-]+\.\w{2,4}$'
-    if not re.match(email_pattern, email):
-        return jsonify({'error': 'Invalid email format'}), 400
-
-    # ===== NIC Validation =====
-    nic_pattern_12 = r'^\d{12}$'
-    nic_pattern_9v = r'^\d{9}V$'
-    if not (re.match(nic_pattern_12, nic) or re.match(nic_pattern_9v, nic)):
-        return jsonify({'error': 'NIC must be 12 digits or 9 digits followed by capital "V"'}), 400
-
-    # ===== Birthday Validation =====
-    try:
-        birth_date = datetime.strptime(birth_day, '%Y-%m-%d')
-        age = (datetime.now() - birth_date).days / 365.25
-        if age < 18:
-            return jsonify({'error': 'Employee must be at least 18 years old'}), 400
-    except (ValueError, TypeError):
-        return jsonify({'error': 'Invalid birth_day format. Use YYYY-MM-DD'}), 400
-
     connection = None
     cursor = None
 
     try:
-        connection = get_db_connection()
+        connection = get_db_connection(session=decoded['user_id'])
+        if connection is None:
+            return jsonify({'error': 'Failed to connect to the database'}), 500
         cursor = connection.cursor()
-        cursor.execute("""
-            UPDATE employee SET first_name = %s, last_name = %s, email = %s, address = %s, nic = %s,
-            birth_day = %s, role = %s, workshop_name = %s, design_category = %s WHERE emp_id = %s
-        """, (first_name, last_name, email, address, nic, birth_day, role, workshop_name, design_category, emp_id))
-        connection.commit()
-
+        current = queries.fetchone(cursor, queries.EMPLOYEE_LOCK, (decoded['tenant'], emp_id))
+        if not current:
+            connection.rollback()
+            return jsonify({'error': 'Employee not found'}), 404
+        # Employee and login row commit together, under the EMPLOYEE_LOCK row lock
+        queries.execute(cursor, queries.EMPLOYEE_UPDATE,
+                        (first_name, last_name, email, address, nic, birth_day, role, workshop_name, design_category, emp_id))
         if hashed_pw:
-            cursor.execute("UPDATE login SET email = %s, hashed_password = %s WHERE emp_id = %s", (email, hashed_pw, emp_id))
+            queries.execute(cursor, queries.LOGIN_UPDATE_EMAIL_PASSWORD, (email, hashed_pw, emp_id))
         else:
-            cursor.execute("UPDATE login SET email = %s WHERE emp_id = %s", (email, emp_id))
+            queries.execute(cursor, queries.LOGIN_UPDATE_EMAIL, (email, emp_id))
         connection.commit()
 
+        changes = audit.diff(queries.EMPLOYEE_LOCK.to_dict(current), {
+            'first_name': first_name, 'last_name': last_name, 'email': email, 'address': address, 'nic': nic,
+            'birth_day': birth_day, 'role': role, 'workshop_name': workshop_name, 'design_category': design_category
+        })
+        if hashed_pw:
+            changes['password'] = [audit.REDACTED, audit.REDACTED]
+        audit.record(decoded['tenant'], 'employee', emp_id, 'update', decoded['user_id'], changes)
+
         return jsonify({'message': 'Employee updated successfully'}), 200
 
     except Exception as e:
@@ -304,10 +266,20 @@ def update_permission(decoded ,emp_id):
     connection = None
     cursor = None
     try:
-        connection = get_db_connection()
+        connection = get_db_connection(session=decoded['user_id'])
+        if connection is None:
+            return jsonify({'error': 'Failed to connect to the database'}), 500
         cursor = connection.cursor()
-        cursor.execute("UPDATE login SET permission = %s WHERE email IN (SELECT email FROM employee WHERE emp_id = %s)", (permission, emp_id))
+        if not queries.fetchone(cursor, queries.EMPLOYEE_IN_WORKSHOP, (decoded['tenant'], emp_id)):
+            return jsonify({'error': 'Employee not found'}), 404
+        previous = queries.fetchall(cursor, queries.LOGIN_LOCK_PERMISSION, (emp_id,))
+        queries.execute(cursor, queries.LOGIN_UPDATE_PERMISSION, (permission, emp_id))
+        for (old_permission,) in previous:
+            dashboard.permission_changed(cursor, decoded['tenant'], old_permission, permission)
         connection.commit()
+        for (old_permission,) in previous:
+            audit.record(decoded['tenant'], 'employee', emp_id, 'permission', decoded['user_id'],
+                         audit.diff({'permission': old_permission}, {'permission': permission}))
 
         return jsonify({'message': 'Employee permission updated successfully'}), 200
 
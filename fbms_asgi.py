@@ -0,0 +1,95 @@
+from quart import Quart, g, jsonify, request
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.exceptions import NotFound, MethodNotAllowed
+import logging
+
+import async_db
+import rate_limit
+from async_routes import ASYNC_BLUEPRINTS
+from json_provider import FastJSONProvider
+from fbms_main import app as wsgi_app
+
+# Optional async serving mode:
+#   pip install quart aiomysql asgiref uvicorn
+#   uvicorn fbms_asgi:application
+# Routes with a coroutine version in async_routes.py run on the event loop
+# against the aiomysql pool; every other route falls through to the regular
+# Flask app, which asgiref runs in a worker thread.
+# The coroutine routes talk to the primary through aiomysql directly, so they go
+# without what config.get_db_connection and the Flask app add: response
+# compression, read replicas, connection retries and the circuit breaker, and
+# single-flight coalescing. Leave fbms_asgi out where those matter.
+
+async_app = Quart(__name__)
+async_app.json = FastJSONProvider(async_app)
+
+for blueprint in ASYNC_BLUEPRINTS:
+    async_app.register_blueprint(blueprint)
+
+
+@async_app.before_serving
+async def startup():
+    await async_db.open_pool()
+
+
+@async_app.after_serving
+async def shutdown():
+    await async_db.close_pool()
+
+
+@async_app.before_request
+async def admit_request():
+    # Same buckets and concurrency caps as the Flask routes in this process
+    gate, rejection = rate_limit.admit(request.path, request.method, request.headers, request.remote_addr)
+    if rejection:
+        status, message, wait = rejection
+        return jsonify({'error': message}), status, {'Retry-After': rate_limit.retry_after(wait)}
+    if gate is not None:
+        g.admission_gate = gate
+
+
+@async_app.teardown_request
+async def release_request(exc=None):
+    gate = g.pop('admission_gate', None)
+    if gate is not None:
+        gate.leave()
+
+
+@async_app.after_request
+async def add_cors_headers(response):
+    # Same default policy as CORS(app) on the Flask side
+    response.headers.setdefault('Access-Control-Allow-Origin', '*')
+    return response
+
+
+wsgi_fallback = WsgiToAsgi(wsgi_app)
+async_urls = async_app.url_map.bind('localhost')
+wsgi_urls = wsgi_app.url_map.bind('localhost')
+
+
+def _has_async_route(scope):
+    # CORS preflight is answered by flask_cors on the Flask side
+    if scope['method'] == 'OPTIONS':
+        return False
+    try:
+        async_rule, _ = async_urls.match(scope['path'], method=scope['method'], return_rule=True)
+        wsgi_rule, _ = wsgi_urls.match(scope['path'], method=scope['method'], return_rule=True)
+    except (NotFound, MethodNotAllowed):
+        return False
+    # Both apps must pick the same rule, otherwise a static Flask-only route such as
+    # /inventory/low-stock would be swallowed by an async /inventory/<code>
+    return async_rule.rule == wsgi_rule.rule
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and not _has_async_route(scope):
+        await wsgi_fallback(scope, receive, send)
+    else:
+        # Lifespan events go to Quart so the pool opens and closes with the server
+        await async_app(scope, receive, send)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    logging.info("Starting FBMS in async (ASGI) mode")
+    uvicorn.run(application, host='127.0.0.1', port=5000)
@@ -1,24 +1,81 @@
 from flask import Flask
 from flask_cors import CORS
-from employee_management import emp
-from login import auth
-from project_management import prj
-from client_management import cli
-from inventory_management import inv
-from verify_jwt import tok
-from project_breakdown import breakdown
-
-app = Flask(__name__)
-CORS(app) # use for cross origin resource sharing
-
-app.register_blueprint(auth)
-app.register_blueprint(emp)
-app.register_blueprint(prj)
-app.register_blueprint(cli)
-app.register_blueprint(inv)
-app.register_blueprint(tok)
-app.register_blueprint(breakdown)
+import importlib
+import logging
+import os
+import time
+
+# Blueprints are imported by create_app, not at module import, so tools that only
+# need part of the code (migrate.py, the benchmarks) skip the handlers, and a
+# worker can serve a subset with fbms_blueprints=projects,clients,...
+# Within create_app every selected blueprint is still imported up front: Flask
+# routes only by rules already registered, so a module cannot wait for its first
+# request. What a full boot costs per blueprint is logged at debug level, and
+# bench_startup.py tracks the total.
+BLUEPRINTS = {
+    'auth': ('login', 'auth'),
+    'employees': ('employee_management', 'emp'),
+    'projects': ('project_management', 'prj'),
+    'clients': ('client_management', 'cli'),
+    'inventory': ('inventory_management', 'inv'),
+    'token': ('verify_jwt', 'tok'),
+    'breakdown': ('project_breakdown', 'breakdown'),
+    'export': ('project_export', 'exp'),
+    'dashboard': ('dashboard', 'dash'),
+    'jobs': ('jobs', 'job'),
+    'workload': ('workload', 'work'),
+    'audit': ('audit', 'aud'),
+    'health': ('health', 'hlt'),
+}
+
+
+def create_app(blueprints=None, background_jobs=True):
+    started = time.perf_counter()
+    from json_provider import FastJSONProvider
+    from compression import init_compression
+    from rate_limit import init_rate_limiting
+
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    CORS(app) # use for cross origin resource sharing
+    init_compression(app)
+    init_rate_limiting(app)
+
+    if blueprints is None:
+        selected = os.getenv('fbms_blueprints', '').strip()
+        blueprints = [name.strip() for name in selected.split(',') if name.strip()] if selected else list(BLUEPRINTS)
+    for name in blueprints:
+        module_name, attribute = BLUEPRINTS[name]
+        imported = time.perf_counter()
+        app.register_blueprint(getattr(importlib.import_module(module_name), attribute))
+        logging.debug(f"Blueprint {name} ({module_name}) loaded in {(time.perf_counter() - imported) * 1000:.1f} ms")
+
+    if background_jobs:
+        # The update handlers of several blueprints buffer audit records
+        from audit import start_flusher
+        start_flusher()
+        if 'dashboard' in blueprints:
+            from dashboard import start_reconciler
+            start_reconciler()
+        if 'inventory' in blueprints:
+            from low_stock import start_evaluator
+            start_evaluator()
+        if 'jobs' in blueprints:
+            from jobs import start_workers
+            start_workers()
+
+    logging.info(f"App created with {len(blueprints)} blueprint(s) in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return app
+
+
+def __getattr__(name):
+    # `gunicorn fbms_main:app` and fbms_asgi still find a module-level app;
+    # it is built the first time it is asked for.
+    if name == 'app':
+        globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
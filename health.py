@@ -0,0 +1,110 @@
+from flask import Blueprint, jsonify
+import config
+import logging
+import os
+import sys
+import threading
+import time
+import pymysql
+
+# Probes and saturation counters. None of these routes take a token: verifying
+# one costs a database round trip, which is exactly what a probe must not need.
+# rate_limit leaves them unmetered so shedding never fails a probe.
+#   /healthz     liveness: the process answers, no dependency is touched
+#   /readyz      readiness: a pooled connection answers a ping (cached briefly)
+#   /health/db   circuit breaker and pool state, without touching the database
+#   /debug/pool  pool occupancy and waits, cache sizes, in-flight requests
+
+READY_CACHE_SECONDS = float(os.getenv('readyz_cache_seconds', '2'))
+
+hlt = Blueprint('health', __name__)
+
+_started = time.time()
+_ready = {'ok': False, 'error': 'not checked yet', 'checked': None}
+_ready_lock = threading.Lock()
+
+
+def _check_database():
+    # (ok, error); goes through get_db_connection so the breaker sees the outcome
+    if config.breaker.state == 'open':
+        return False, 'circuit breaker open'
+    connection = config.get_db_connection()
+    if connection is None:
+        return False, 'no database connection'
+    try:
+        connection.ping(reconnect=False)
+        return True, None
+    except pymysql.Error as e:
+        if config.is_connection_error(e):
+            config.breaker.failure()
+        return False, str(e)
+    finally:
+        connection.close()
+
+
+def readiness():
+    # One ping per READY_CACHE_SECONDS per worker however often probes arrive;
+    # probes landing during a check get the previous answer
+    stale = _ready['checked'] is None or time.monotonic() - _ready['checked'] >= READY_CACHE_SECONDS
+    if stale and _ready_lock.acquire(blocking=False):
+        try:
+            ok, error = _check_database()
+            if ok and not _ready['ok']:
+                logging.info("Readiness check passed, worker is ready")
+            elif not ok and (_ready['ok'] or _ready['checked'] is None):
+                logging.warning(f"Readiness check failed: {error}")
+            _ready.update(ok=ok, error=error, checked=time.monotonic())
+        finally:
+            _ready_lock.release()
+    return dict(_ready)
+
+
+def _module_stats(module_name, attribute='stats'):
+    # Only what this worker has loaded (fbms_blueprints may serve a subset)
+    module = sys.modules.get(module_name)
+    return getattr(module, attribute)() if module is not None else None
+
+
+@hlt.route('/healthz', methods=['GET'])
+def get_liveness():
+    return jsonify({'status': 'ok'}), 200
+
+
+@hlt.route('/readyz', methods=['GET'])
+def get_readiness():
+    ready = readiness()
+    body = {'status': 'ready' if ready['ok'] else 'unavailable',
+            'checked_ago': round(time.monotonic() - ready['checked'], 1) if ready['checked'] is not None else None}
+    if not ready['ok']:
+        body['error'] = ready['error']
+    return jsonify(body), 200 if ready['ok'] else 503
+
+
+@hlt.route('/health/db', methods=['GET'])
+def get_db_health():
+    # 503 while the breaker is open, i.e. while requests are failing fast
+    stats = config.stats()
+    status = 503 if stats['breaker']['state'] == 'open' else 200
+    return jsonify(stats), status
+
+
+@hlt.route('/debug/pool', methods=['GET'])
+def get_pool_status():
+    # Per worker process; sum across workers to see the whole service
+    compression = sys.modules.get('compression')
+    return jsonify({
+        'pid': os.getpid(),
+        'uptime': round(time.time() - _started),
+        'threads': threading.active_count(),
+        'database': config.stats(),
+        'requests': _module_stats('rate_limit'),
+        'single_flight': _module_stats('single_flight'),
+        'caches': {
+            'compressed_responses': compression.compressed_cache.stats() if compression is not None else None,
+            'low_stock_watches': _module_stats('low_stock')
+        },
+        'background': {
+            'jobs': _module_stats('jobs'),
+            'audit': _module_stats('audit')
+        }
+    }), 200
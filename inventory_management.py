@@ -3,9 +3,13 @@ from config import get_db_connection
 import logging
 from datetime import datetime
 from verify_jwt import token_required
-
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from validation import INVENTORY_SCHEMA
+from json_provider import rows_response
+import audit
+import batch_lookup
+import dashboard
+import low_stock
+import queries
 
 inv = Blueprint('inventory', __name__)
 
@@ -16,31 +20,17 @@ def get_inventory(decoded):
     connection = None
     cursor = None
     try:
-        connection = get_db_connection()
+        connection = get_db_connection(read_only=True, session=decoded['user_id'])
         if connection is None:
             logging.error("Failed to establish database connection for GET /inventory")
             return jsonify({'error': 'Failed to connect to the database'}), 500
         cursor = connection.cursor()
 
-        cursor.execute("SELECT inventory_code, name, shop, buying_date, price, quantity, available_quantity, location FROM inventory")
-        results = cursor.fetchall()
+        results = queries.fetchall(cursor, queries.INVENTORY_LIST, (decoded['tenant'],))
         logging.info(f"Retrieved {len(results)} inventory items from the database")
 
-        inventory_list = []
-        for row in results:
-            inventory_item = {
-                'item_code': row[0],
-                'item_name': row[1],
-                'shop': row[2],
-                'purchase_date': row[3],
-                'price': row[4],
-                'quantity': row[5],
-                'available_quantity': row[6],
-                'location': row[7],
-            }
-            inventory_list.append(inventory_item)
         logging.info("Successfully processed inventory data for GET response")
-        return jsonify(inventory_list), 200
+        return rows_response(queries.INVENTORY_LIST.columns, results)
     except Exception as e:
         if connection:
             connection.rollback()
@@ -63,53 +53,39 @@ def add_inventory(decoded):
         data = request.get_json()
         logging.info(f"Received data for new inventory: {data}")
 
-        name = data.get('name')
-        shop = data.get('shop') 
-        buying_date = data.get('buying_date')
-        price = data.get('price')
-        quantity = data.get('quantity')
-        available_quantity = data.get('quantity')
-        location = data.get('location')
-
-         # =====  validation =====
-        if not all([name, buying_date, price, quantity, location]):
-            logging.warning("Missing required fields for new inventory item")
-            return jsonify({'error': 'Missing one or more required fields: name, buying_date, price, quantity, location'}), 400
-
-        # ===== Type and value validations =====
-       
-        # Validate and convert types
-        price = float(price)
-        quantity = int(quantity)
-
-        # Validate buying_date
-        buying_date_obj = datetime.strptime(buying_date, '%Y-%m-%d').date()
-        if buying_date_obj > datetime.now().date():
-            return jsonify({'error': 'Buying date must not be in the future'}), 400
-
-        if price <= 0:
-            return jsonify({'error': 'Price must be greater than zero'}), 400
-
-        if quantity <= 0:
-            return jsonify({'error': 'Quantity must be a positive number'}), 400
-
-
-        connection = get_db_connection()
+        # ===== Field Validation =====
+        item, error = INVENTORY_SCHEMA.validate(data)
+        if error:
+            logging.warning(f"Inventory validation failed: {error}")
+            return jsonify({'error': error}), 400
+
+        name = item['name']
+        shop = item['shop']
+        buying_date = item['buying_date']
+        price = item['price']
+        quantity = item['quantity']
+        location = item['location']
+        reorder_threshold = item['reorder_threshold']
+        if reorder_threshold is None:
+            reorder_threshold = low_stock.DEFAULT_REORDER_THRESHOLD
+
+        connection = get_db_connection(session=decoded['user_id'])
         if connection is None:
             logging.error("Failed to establish database connection for POST /inventory")
             return jsonify({'error': 'Failed to connect to the database'}), 500
         cursor = connection.cursor()
 
-        # SQL INSERT query
-        insert_query = """
-        INSERT INTO inventory (name, shop, buying_date, price, quantity, location)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """
-        cursor.execute(insert_query, (name, shop, buying_date, price, quantity, location))
+        # New stock starts fully available
+        queries.execute(cursor, queries.INVENTORY_INSERT,
+                        (decoded['tenant'], name, shop, buying_date, price, quantity, quantity, location, reorder_threshold))
+        inventory_code = cursor.lastrowid
+        queries.execute(cursor, queries.PRICE_HISTORY_INSERT, (inventory_code, price, datetime.now(), decoded['user_id']))
+        dashboard.low_stock_changed(cursor, decoded['tenant'], False, low_stock.is_low_stock(quantity, reorder_threshold))
         connection.commit()
+        low_stock.watch(decoded['tenant']).update(low_stock.stock_item(inventory_code, name, quantity, quantity, reorder_threshold))
         logging.info(f"Successfully added new inventory item: {name}")
 
-        return jsonify({'message': 'Inventory item added successfully', 'inventory_code': cursor.lastrowid}), 201
+        return jsonify({'message': 'Inventory item added successfully', 'inventory_code': inventory_code}), 201
 
     except Exception as e:
         if connection:
@@ -125,6 +101,41 @@ def add_inventory(decoded):
 
 
 
+# Items at or below their reorder threshold, largest shortfall first
+@inv.route('/inventory/low-stock', methods=['GET'])
+@token_required
+def get_low_stock(decoded):
+    logging.info("GET request received for /inventory/low-stock")
+    limit = request.args.get('limit', 50, type=int)
+    limit = max(1, min(limit, low_stock.MAX_ITEMS))
+    # fresh=1 reads the stock_headroom index instead of this process's heap
+    watch = low_stock.watch(decoded['tenant'])
+    if watch.loaded and request.args.get('fresh') != '1':
+        items = watch.top(limit)
+        return jsonify({'items': items, 'count': len(items), 'source': 'memory'}), 200
+
+    connection = None
+    try:
+        connection = get_db_connection(read_only=True, session=decoded['user_id'])
+        if connection is None:
+            logging.error("Failed to establish database connection for GET /inventory/low-stock")
+            return jsonify({'error': 'Failed to connect to the database'}), 500
+        items = low_stock.fetch_low_stock(connection, decoded['tenant'], limit)
+        return jsonify({'items': items, 'count': len(items), 'source': 'database'}), 200
+    except Exception as e:
+        logging.error(f"Error processing GET request for /inventory/low-stock: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if connection:
+            connection.close()
+
+
+@inv.route('/inventory/batch', methods=['GET'])
+@token_required
+def get_inventory_batch(decoded):
+    return batch_lookup.lookup(decoded, '/inventory/batch', queries.INVENTORY_BATCH)
+
+
 @inv.route('/inventory/<string:inventory_code>', methods=['GET'])
 @token_required
 def get_inventory_item(decoded, inventory_code):
@@ -132,32 +143,17 @@ def get_inventory_item(decoded, inventory_code):
     connection = None
     cursor = None
     try:
-        connection = get_db_connection()
+        connection = get_db_connection(read_only=True, session=decoded['user_id'])
         if connection is None:
             logging.error("Failed to establish database connection for GET /inventory/<item_code>")
             return jsonify({'error': 'Failed to connect to the database'}), 500
         cursor = connection.cursor()
 
-        cursor.execute("""
-            SELECT inventory_code, name, shop, buying_date, price, quantity, available_quantity, location
-            FROM inventory
-            WHERE inventory_code = %s
-        """, (inventory_code,))
+        result = queries.fetchone(cursor, queries.INVENTORY_BY_CODE, (decoded['tenant'], inventory_code))
 
-        result = cursor.fetchone() 
-        
         if result:
             logging.info(f"Retrieved inventory item with code: {inventory_code}")
-            inventory_item = {
-                'item_code': result[0],
-                'item_name': result[1], 
-                'shop': result[2],
-                'buying_date': str(result[3]),
-                'price': result[4],
-                'quantity': result[5],
-                'available_quantity': result[6],
-                'location': result[7],
-            }
+            inventory_item = queries.INVENTORY_BY_CODE.to_dict(result)
             logging.info(f"Successfully processed inventory data for item {inventory_code}")
             return jsonify(inventory_item), 200
         else:
@@ -189,45 +185,62 @@ def update_inventory(decoded, inventory_code):
         data = request.get_json()
         logging.info(f"Received data for inventory update (code {inventory_code}): {data}")
 
-        # Extract data with validation for required fields
-        name = data.get('name')
-        shop = data.get('shop')
-        buying_date = data.get('buying_date')
-        price = data.get('price')
-        quantity = data.get('quantity')
-        location = data.get('location')
-
-  # ===== Server-side field validation =====
-        if not all([name, buying_date, price, quantity, location]):
-            logging.warning("Missing required fields for new inventory item")
-            return jsonify({'error': 'Missing one or more required fields: name, buying_date, price, quantity, location'}), 400
-
-        # ===== validations =====
-       
-        # Validate and convert types
-        price = float(price)
-        quantity = int(quantity)
-
-        # Validate buying_date
-        buying_date_obj = datetime.strptime(buying_date, '%Y-%m-%d').date()
-        if buying_date_obj > datetime.now().date():
-            return jsonify({'error': 'Buying date must not be in the future'}), 400
-
-        if price <= 0:
-            return jsonify({'error': 'Price must be greater than zero'}), 400
-
-        if quantity <= 0:
-            return jsonify({'error': 'Quantity must be a positive number'}), 400
-
-        connection = get_db_connection()
+        # ===== Field Validation =====
+        item, error = INVENTORY_SCHEMA.validate(data)
+        if error:
+            logging.warning(f"Inventory validation failed: {error}")
+            return jsonify({'error': error}), 400
+
+        name = item['name']
+        shop = item['shop']
+        buying_date = item['buying_date']
+        price = item['price']
+        quantity = item['quantity']
+        location = item['location']
+
+        connection = get_db_connection(session=decoded['user_id'])
         if connection is None:
             logging.error(f"Failed to establish database connection for PUT /inventory/{inventory_code}")
             return jsonify({'error': 'Failed to connect to the database'}), 500
         cursor = connection.cursor()
 
-        cursor.execute("""UPDATE inventory SET name = %s, shop = %s, buying_date = %s, price = %s, quantity = %s, location = %s
-        WHERE inventory_code = %s """, (name, shop, buying_date, price, quantity, location, inventory_code))
+        current = queries.fetchone(cursor, queries.INVENTORY_LOCK_AVAILABLE, (decoded['tenant'], inventory_code))
+        if not current:
+            connection.rollback()
+            logging.warning(f"Inventory item with code '{inventory_code}' not found.")
+            return jsonify({'error': 'Inventory item not found'}), 404
+
+        columns = queries.INVENTORY_LOCK_AVAILABLE.index
+        old_available = current[columns['available_quantity']]
+        old_threshold = current[columns['reorder_threshold']]
+        reorder_threshold = old_threshold if item['reorder_threshold'] is None else item['reorder_threshold']
+
+        # Units already assigned to projects stay assigned; a new total moves
+        # only the unassigned part
+        assigned = current[columns['quantity']] - old_available
+        if quantity < assigned:
+            connection.rollback()
+            logging.warning(f"Quantity {quantity} for inventory item {inventory_code} is below the {assigned} assigned")
+            return jsonify({'error': f"Quantity cannot be less than the {assigned} unit(s) already assigned to projects"}), 400
+        available_quantity = quantity - assigned
+
+        queries.execute(cursor, queries.INVENTORY_UPDATE,
+                        (name, shop, buying_date, price, quantity, available_quantity, location,
+                         item['reorder_threshold'], inventory_code))
+        # Existing cost lines keep their snapshot price; only new assignments see the change
+        if round(float(current[columns['price']]), 2) != round(price, 2):
+            queries.execute(cursor, queries.PRICE_HISTORY_INSERT, (inventory_code, price, datetime.now(), decoded['user_id']))
+            logging.info(f"Price of inventory item {inventory_code} changed from {current[columns['price']]} to {price}")
+        dashboard.low_stock_changed(cursor, decoded['tenant'], low_stock.is_low_stock(old_available, old_threshold),
+                                    low_stock.is_low_stock(available_quantity, reorder_threshold))
         connection.commit()
+        low_stock.watch(decoded['tenant']).update(low_stock.stock_item(inventory_code, name, quantity, available_quantity, reorder_threshold))
+        audit.record(decoded['tenant'], 'inventory', inventory_code, 'update', decoded['user_id'],
+                     audit.diff(queries.INVENTORY_LOCK_AVAILABLE.to_dict(current), {
+                         'name': name, 'shop': shop, 'buying_date': buying_date, 'price': price,
+                         'quantity': quantity, 'available_quantity': available_quantity, 'location': location,
+                         'reorder_threshold': reorder_threshold
+                     }))
 
         logging.info(f"Successfully updated inventory item: {name} (Code: {inventory_code})")
         return jsonify({'message': 'Inventory item updated successfully'}), 200
@@ -245,6 +258,33 @@ def update_inventory(decoded, inventory_code):
         logging.info(f"Database connection closed after PUT /inventory/{inventory_code}")
 
 
+@inv.route('/inventory/<int:inventory_code>/price-history', methods=['GET'])
+@token_required
+def get_price_history(decoded, inventory_code):
+    logging.info(f"GET request received for /inventory/{inventory_code}/price-history")
+    connection = None
+    cursor = None
+    try:
+        connection = get_db_connection(read_only=True, session=decoded['user_id'])
+        if connection is None:
+            logging.error(f"Failed to establish database connection for GET /inventory/{inventory_code}/price-history")
+            return jsonify({'error': 'Failed to connect to the database'}), 500
+        cursor = connection.cursor()
+        results = queries.fetchall(cursor, queries.PRICE_HISTORY_LIST, (decoded['tenant'], inventory_code))
+        if not results:
+            return jsonify({'error': 'Inventory item not found'}), 404
+        return rows_response(queries.PRICE_HISTORY_LIST.columns, results)
+
+    except Exception as e:
+        logging.error(f"Error processing GET request for /inventory/{inventory_code}/price-history: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            connection.close()
+
+
 # Assign Inventory To Project
 @inv.route('/inventory/assign/<int:inventory_code>', methods=['PUT'])
 @token_required
@@ -267,7 +307,7 @@ def assign_inventory(decoded, inventory_code):
 
 
     try:
-        connection = get_db_connection()
+        connection = get_db_connection(session=decoded['user_id'])
         if connection is None:
             logging.error("Failed to establish database connection in assign_inventory.")
             return jsonify({'error': 'Failed to connect to the database'}), 500
@@ -275,19 +315,19 @@ def assign_inventory(decoded, inventory_code):
         connection.begin()
 
         # Check available quantity and get inventory name
-        cursor.execute(
-            "SELECT available_quantity, name FROM inventory WHERE inventory_code = %s FOR UPDATE",
-            (inventory_code,)
-        )
-        inventory_item = cursor.fetchone()
+        inventory_item = queries.fetchone(cursor, queries.INVENTORY_LOCK_AVAILABLE, (decoded['tenant'], inventory_code))
 
         if not inventory_item:
             connection.rollback()
             logging.warning(f"Inventory item with code '{inventory_code}' not found.")
             return jsonify({'error': f"Inventory item with code '{inventory_code}' not found."}), 404
 
-        current_available_quantity = inventory_item[0]
-        inventory_name = inventory_item[1]
+        columns = queries.INVENTORY_LOCK_AVAILABLE.index
+        current_available_quantity = inventory_item[columns['available_quantity']]
+        inventory_name = inventory_item[columns['name']]
+        inventory_price = inventory_item[columns['price']]
+        inventory_quantity = inventory_item[columns['quantity']]
+        reorder_threshold = inventory_item[columns['reorder_threshold']]
 
         if current_available_quantity < request_quantity:
             connection.rollback()
@@ -296,34 +336,36 @@ def assign_inventory(decoded, inventory_code):
                 'error': f"Insufficient quantity. Only {current_available_quantity} units of '{inventory_name}' available."
             }), 400
 
+        if not queries.fetchone(cursor, queries.PROJECT_DATES, (decoded['tenant'], proj_id)):
+            connection.rollback()
+            logging.warning(f"Project '{proj_id}' not found for inventory assignment.")
+            return jsonify({'error': f"Project with ID '{proj_id}' not found."}), 404
+
         # Update the inventory table
         new_available_quantity = current_available_quantity - request_quantity
-        cursor.execute(
-            "UPDATE inventory SET available_quantity = %s WHERE inventory_code = %s",
-            (new_available_quantity, inventory_code)
-        )
+        queries.execute(cursor, queries.INVENTORY_SET_AVAILABLE, (new_available_quantity, inventory_code))
+        dashboard.low_stock_changed(cursor, decoded['tenant'], low_stock.is_low_stock(current_available_quantity, reorder_threshold),
+                                    low_stock.is_low_stock(new_available_quantity, reorder_threshold))
         logging.info(f"Inventory '{inventory_code}' updated. New available quantity: {new_available_quantity}")
 
         # Get current date and time for insertions
         current_datetime = datetime.now()
 
         # Insert into proj_cost table
-        cursor.execute(
-            "INSERT INTO proj_cost (proj_id, inventory_code, date_time, description, quantity) VALUES (%s, %s, %s, %s, %s)",
-            (proj_id, inventory_code, current_datetime, description, request_quantity)
-        )
+        queries.execute(cursor, queries.PROJ_COST_INSERT, (proj_id, inventory_code, current_datetime, description, request_quantity,
+                                                           inventory_name, inventory_price))
+        dashboard.cost_added(cursor, decoded['tenant'], current_datetime, inventory_price * request_quantity)
         logging.info(f"Cost entry added to proj_cost for project '{proj_id}' with inventory '{inventory_code}'.")
 
         # Insert into proj_breakdown table
         breakdown_description = f"Assigned {inventory_name} ({request_quantity} units) to project {proj_id}"
-        cursor.execute(
-            "INSERT INTO proj_breakdown (proj_id, date_time, description) VALUES (%s, %s, %s)",
-            (proj_id, current_datetime, breakdown_description)
-        )
+        queries.execute(cursor, queries.BREAKDOWN_INSERT, (proj_id, current_datetime, breakdown_description))
         logging.info(f"Breakdown entry added to proj_breakdown for project '{proj_id}'.")
 
         # Commit the transaction if all operations are successful
         connection.commit()
+        low_stock.watch(decoded['tenant']).update(low_stock.stock_item(inventory_code, inventory_name, inventory_quantity,
+                                                    new_available_quantity, reorder_threshold))
         logging.info(f"Inventory assignment for '{inventory_code}' to project '{proj_id}' completed successfully.")
         return jsonify({'message': 'Inventory assigned successfully', 'inventory_code': inventory_code, 'proj_id': proj_id}), 200
 
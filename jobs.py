@@ -0,0 +1,310 @@
+from flask import Blueprint, jsonify, request
+from config import get_db_connection
+from verify_jwt import token_required
+from json_provider import dumps
+import importlib
+import json
+import logging
+import math
+import os
+import random
+import socket
+import sys
+import threading
+import time
+import queries
+
+# Persistent background jobs. A job row is inserted in the caller's transaction,
+# so it exists only if the request's own writes commit. Worker threads claim
+# queued rows with SELECT ... FOR UPDATE SKIP LOCKED. Each handler runs on the
+# worker's cursor, and its writes commit together with the 'succeeded' status.
+# Failures are retried with exponential backoff until max_attempts.
+#   python jobs.py worker [threads]        run workers outside the web processes
+#   python jobs.py enqueue <kind> [json]   queue a job, e.g. a maintenance job from cron
+
+JOB_WORKERS = int(os.getenv('job_workers', '2'))  # per web process; 0 leaves the work to `python jobs.py worker`
+JOB_POLL_INTERVAL = float(os.getenv('job_poll_interval', '2'))
+JOB_LEASE_SECONDS = int(os.getenv('job_lease_seconds', '600'))
+JOB_BACKOFF_BASE = float(os.getenv('job_backoff_base', '5'))
+JOB_BACKOFF_MAX = float(os.getenv('job_backoff_max', '600'))
+
+# kind -> (module, handler, may be queued through POST /jobs). Handler modules are
+# imported when a job of that kind first runs. handler(cursor, payload) -> result
+# Only kinds that stay inside the caller's workshop may be public; POST /jobs
+# overwrites payload['tenant'] with the caller's workshop for them. The
+# maintenance jobs act on every workshop, so they are queued by the application
+# itself or by an operator with `python jobs.py enqueue`, never by a tenant user.
+HANDLERS = {
+    'project_cost_report': ('project_export', 'cost_report_job', True),
+    'set_initial_password': ('employee_management', 'set_initial_password', False),
+    'reconcile_dashboard': ('dashboard', 'reconcile_job', False),
+    'rebuild_workload': ('workload', 'rebuild_daily_load', False),
+    'archive_projects': ('archive', 'archive_job', False),
+}
+
+job = Blueprint('jobs', __name__)
+
+
+class JobRejected(Exception):
+    # Raised by a handler for a payload it can never run; the job fails at once
+    pass
+
+_wakeup = threading.Event()
+_workers = []
+
+
+def enqueue(cursor, kind, payload, created_by=None, max_attempts=3):
+    queries.execute(cursor, queries.JOB_INSERT, (kind, dumps(payload), max_attempts, created_by))
+    return cursor.lastrowid
+
+
+def wake():
+    # Call after committing an enqueue so an idle worker in this process starts now
+    _wakeup.set()
+
+
+def backoff(attempts):
+    delay = min(JOB_BACKOFF_MAX, JOB_BACKOFF_BASE * 2 ** (attempts - 1))
+    return math.ceil(delay * random.uniform(0.5, 1.0))  # jitter keeps retries from lining up
+
+
+def _handler(kind):
+    module_name, function_name, _ = HANDLERS[kind]
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def run_next(worker_id):
+    # Runs at most one job; returns True when one was claimed
+    connection = get_db_connection()
+    if connection is None:
+        return False
+    cursor = connection.cursor()
+    try:
+        connection.begin()
+        row = queries.fetchone(cursor, queries.JOB_CLAIM)
+        if not row:
+            connection.rollback()
+            return False
+        claimed = queries.JOB_CLAIM.to_dict(row)
+        job_id = claimed['job_id']
+        attempts = claimed['attempts'] + 1
+        queries.execute(cursor, queries.JOB_MARK_RUNNING, (worker_id, job_id))
+        connection.commit()
+
+        if claimed['kind'] not in HANDLERS:
+            queries.execute(cursor, queries.JOB_FAILED, (f"Unknown job kind '{claimed['kind']}'", job_id))
+            connection.commit()
+            logging.error(f"Job {job_id} has unknown kind '{claimed['kind']}'")
+            return True
+
+        started = time.perf_counter()
+        try:
+            result = _handler(claimed['kind'])(cursor, json.loads(claimed['payload']))
+            queries.execute(cursor, queries.JOB_SUCCEEDED, (dumps(result), job_id))
+            connection.commit()
+            logging.info(f"Job {job_id} ({claimed['kind']}) succeeded in {(time.perf_counter() - started) * 1000:.0f} ms")
+        except Exception as e:
+            connection.rollback()
+            error = f"{type(e).__name__}: {e}"
+            if attempts < claimed['max_attempts'] and not isinstance(e, JobRejected):
+                delay = backoff(attempts)
+                queries.execute(cursor, queries.JOB_RETRY, (error, delay, job_id))
+                logging.warning(f"Job {job_id} ({claimed['kind']}) failed on attempt {attempts}, retrying in {delay}s: {error}")
+            else:
+                queries.execute(cursor, queries.JOB_FAILED, (error, job_id))
+                logging.error(f"Job {job_id} ({claimed['kind']}) failed after {attempts} attempt(s): {error}")
+            connection.commit()
+        return True
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def requeue_stale():
+    connection = get_db_connection()
+    if connection is None:
+        return
+    cursor = connection.cursor()
+    try:
+        queries.execute(cursor, queries.JOB_REQUEUE_STALE, (JOB_LEASE_SECONDS,))
+        connection.commit()
+        if cursor.rowcount:
+            logging.warning(f"Released {cursor.rowcount} job(s) whose worker stopped responding")
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def _run_worker(worker_id):
+    last_sweep = 0.0
+    while True:
+        try:
+            if time.monotonic() - last_sweep > JOB_LEASE_SECONDS / 4:
+                requeue_stale()
+                last_sweep = time.monotonic()
+            if run_next(worker_id):
+                continue
+        except Exception as e:
+            logging.error(f"Job worker {worker_id} error: {e}", exc_info=True)
+        _wakeup.wait(JOB_POLL_INTERVAL)
+        _wakeup.clear()
+
+
+def start_workers(count=JOB_WORKERS):
+    if _workers or count <= 0:
+        return
+    for n in range(count):
+        worker_id = f"{socket.gethostname()}:{os.getpid()}:{n}"
+        thread = threading.Thread(target=_run_worker, args=(worker_id,), name=f'job-worker-{n}', daemon=True)
+        thread.start()
+        _workers.append(thread)
+    logging.info(f"Started {count} background job worker(s)")
+
+
+def stats():
+    return {'workers': len(_workers), 'alive': sum(thread.is_alive() for thread in _workers)}
+
+
+def _load_job(decoded, job_id, cursor):
+    # Jobs are private to the user that queued them
+    row = queries.fetchone(cursor, queries.JOB_BY_ID, (job_id,))
+    if not row:
+        return None
+    found = queries.JOB_BY_ID.to_dict(row)
+    if found['created_by'] != decoded['user_id']:
+        return None
+    return found
+
+
+@job.route('/jobs', methods=['POST'])
+@token_required
+def create_job(decoded):
+    logging.info("POST request received for /jobs")
+    data = request.get_json() or {}
+    kind = data.get('kind')
+    if kind not in HANDLERS or not HANDLERS[kind][2]:
+        logging.warning(f"Rejected job of unknown kind '{kind}'")
+        return jsonify({'error': f"Unknown job kind '{kind}'"}), 400
+    payload = data.get('payload') or {}
+    if not isinstance(payload, dict):
+        return jsonify({'error': "'payload' must be an object"}), 400
+    payload['tenant'] = decoded['tenant']
+
+    connection = None
+    cursor = None
+    try:
+        connection = get_db_connection(session=decoded['user_id'])
+        if connection is None:
+            logging.error("Failed to establish database connection for POST /jobs")
+            return jsonify({'error': 'Failed to connect to the database'}), 500
+        cursor = connection.cursor()
+        job_id = enqueue(cursor, kind, payload, decoded['user_id'])
+        connection.commit()
+        wake()
+        logging.info(f"Job {job_id} ({kind}) queued by user {decoded['user_id']}")
+        return jsonify({'message': 'Job queued', 'job_id': job_id, 'status_url': f"/jobs/{job_id}"}), 202
+
+    except Exception as e:
+        if connection:
+            connection.rollback()
+        logging.error(f"Error processing POST request for /jobs: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            connection.close()
+
+
+# Status reads stay on the primary; a lagging replica would report finished jobs as queued
+@job.route('/jobs/<int:job_id>', methods=['GET'])
+@token_required
+def get_job(decoded, job_id):
+    logging.info(f"GET request received for /jobs/{job_id}")
+    connection = None
+    cursor = None
+    try:
+        connection = get_db_connection()
+        if connection is None:
+            logging.error(f"Failed to establish database connection for GET /jobs/{job_id}")
+            return jsonify({'error': 'Failed to connect to the database'}), 500
+        cursor = connection.cursor()
+
+        found = _load_job(decoded, job_id, cursor)
+        if not found:
+            return jsonify({'error': 'Job not found'}), 404
+        found.pop('result')
+        found['result_url'] = f"/jobs/{job_id}/result"
+        return jsonify(found), 200
+
+    except Exception as e:
+        logging.error(f"Error processing GET request for /jobs/{job_id}: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            connection.close()
+
+
+@job.route('/jobs/<int:job_id>/result', methods=['GET'])
+@token_required
+def get_job_result(decoded, job_id):
+    logging.info(f"GET request received for /jobs/{job_id}/result")
+    connection = None
+    cursor = None
+    try:
+        connection = get_db_connection()
+        if connection is None:
+            logging.error(f"Failed to establish database connection for GET /jobs/{job_id}/result")
+            return jsonify({'error': 'Failed to connect to the database'}), 500
+        cursor = connection.cursor()
+
+        found = _load_job(decoded, job_id, cursor)
+        if not found:
+            return jsonify({'error': 'Job not found'}), 404
+        if found['status'] == 'succeeded':
+            return jsonify({'job_id': job_id, 'result': json.loads(found['result'])}), 200
+        if found['status'] == 'failed':
+            return jsonify({'job_id': job_id, 'status': 'failed', 'error': found['error']}), 409
+        return jsonify({'job_id': job_id, 'status': found['status']}), 202, {'Retry-After': str(math.ceil(JOB_POLL_INTERVAL))}
+
+    except Exception as e:
+        logging.error(f"Error processing GET request for /jobs/{job_id}/result: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            connection.close()
+
+
+def _enqueue_command(kind, payload):
+    if kind not in HANDLERS:
+        sys.exit(f"Unknown job kind '{kind}'. Use one of: {', '.join(HANDLERS)}")
+    connection = get_db_connection()
+    if connection is None:
+        sys.exit("Failed to establish database connection.")
+    cursor = connection.cursor()
+    try:
+        job_id = enqueue(cursor, kind, payload)
+        connection.commit()
+        print(f"Job {job_id} ({kind}) queued")
+    finally:
+        cursor.close()
+        connection.close()
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == 'enqueue' and len(sys.argv) > 2:
+        _enqueue_command(sys.argv[2], json.loads(sys.argv[3]) if len(sys.argv) > 3 else {})
+        sys.exit()
+    if command != 'worker':
+        sys.exit("Usage: python jobs.py worker [threads] | enqueue <kind> [payload-json]")
+    start_workers(int(sys.argv[2]) if len(sys.argv) > 2 else max(JOB_WORKERS, 1))
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        logging.info("Job workers stopped")
@@ -0,0 +1,102 @@
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+from decimal import Decimal
+import datetime
+import json
+import logging
+import os
+import config  # noqa: F401  loads .env before the settings below are read
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the stdlib encoder is used without it
+    orjson = None
+
+
+# 'orjson' (default when installed) or 'json' to force the stdlib encoder
+JSON_BACKEND = os.getenv('json_backend', 'orjson').lower()
+USE_ORJSON = orjson is not None and JSON_BACKEND == 'orjson'
+
+if USE_ORJSON:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(value):
+    # pymysql hands back Decimal for DECIMAL columns and timedelta for TIME columns
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8')
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj):
+    if USE_ORJSON:
+        return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def dumps(obj):
+    return dumps_bytes(obj).decode('utf-8')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    # Serializes dates as ISO 8601 and Decimal as float for every response,
+    # so routes no longer need str()/isoformat() on each column.
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            kwargs.setdefault('default', _default)
+            return json.dumps(obj, **kwargs)
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        if USE_ORJSON and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
+
+
+def rows_response(keys, rows, status=200):
+    # Builds a JSON array response straight from cursor tuples using a fixed key order
+    body = dumps_bytes([dict(zip(keys, row)) for row in rows])
+    return current_app.response_class(body, status=status, mimetype='application/json')
+
+
+if __name__ == '__main__':
+    # Benchmark large /projects and /inventory style responses
+    import timeit
+
+    today = datetime.date.today()
+    project_keys = ('proj_id', 'proj_name', 'start_date', 'end_date', 'status', 'remarks', 'url',
+                    'client_id', 'client_first_name', 'client_company', 'client_country')
+    project_rows = [
+        (i, f"Project {i}", today, today + datetime.timedelta(days=30), 'In Progress', 'Remarks',
+         'https://example.com', i % 50, 'Nimal', 'Acme', 'Sri Lanka')
+        for i in range(10000)
+    ]
+    inventory_keys = ('item_code', 'item_name', 'shop', 'purchase_date', 'price', 'quantity',
+                      'available_quantity', 'location')
+    inventory_rows = [
+        (i, f"Item {i}", 'Hardware Co', today, Decimal('2500.50'), 40, 12, 'Store A')
+        for i in range(10000)
+    ]
+
+    def stdlib(keys, rows):
+        return json.dumps([dict(zip(keys, row)) for row in rows], default=str).encode('utf-8')
+
+    def fast(keys, rows):
+        return dumps_bytes([dict(zip(keys, row)) for row in rows])
+
+    print(f"backend: {'orjson' if USE_ORJSON else 'json'}")
+    for label, keys, rows in (('projects', project_keys, project_rows), ('inventory', inventory_keys, inventory_rows)):
+        for name, encoder in (('stdlib', stdlib), ('provider', fast)):
+            seconds = timeit.timeit(lambda: encoder(keys, rows), number=20) / 20
+            print(f"{label:<10} {name:<9} {seconds * 1e3:8.2f} ms / {len(rows)} rows")
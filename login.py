@@ -1,21 +1,19 @@
 from flask import Blueprint, request, jsonify
-from config import get_db_connection
-import jwt, datetime, os, logging, bcrypt
-from dotenv import load_dotenv
+from config import get_db_connection, SECRET_KEY
+from compression import no_compression
+import queries
+import jwt, datetime, logging, bcrypt
 
 
 auth = Blueprint('login', __name__)
-load_dotenv()
 
-# Logging setup
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-SECRET_KEY = os.getenv('jwt_secret_key')
-
-def generate_jwt(user_id, email, role):
+def generate_jwt(user_id, email, role, tenant):
+    # tenant is the user's workshop; every query the token authorises is scoped to it
     token = jwt.encode({
         'user_id': user_id,
         'email': email,
         'role': role,
+        'tenant': tenant,
         'exp': datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=300)
     }, SECRET_KEY, algorithm='HS256')
     logging.info(f"JWT generated for user ID: {user_id} and email: {email}")
@@ -23,6 +21,7 @@ def generate_jwt(user_id, email, role):
 
 # user login
 @auth.route('/login', methods=['POST'])
+@no_compression  # keep the JWT out of compressed bodies (BREACH)
 def login():
 
     logging.info("POST request received for /login")
@@ -44,19 +43,27 @@ def login():
             return jsonify({"error": "Database connection failed"}), 500
 
         cursor = connection.cursor()
-        cursor.execute("SELECT login.emp_id, login.email, login.hashed_password, login.permission, employee.role FROM login INNER JOIN employee ON login.emp_id = employee.emp_id WHERE login.email = %s", (email,))
-        user = cursor.fetchone()
+        user = queries.fetchone(cursor, queries.LOGIN_BY_EMAIL, (email,))
 
         if user:
-            emp_id, email, db_hashed_password, permission, role = user
+            emp_id, email, db_hashed_password, permission, role, workshop_name = user
             logging.info(f"User  found: {email} with permission: {permission}")
+
+            if not db_hashed_password:
+                # New account whose initial password job has not finished yet. Answered
+                # like an unknown email, so the response does not reveal the account.
+                logging.warning(f"Login attempt for user ID: {emp_id} before the password was set")
+                return jsonify({"error": "Invalid email or password"}), 401
             
             if bcrypt.checkpw(password.encode('utf-8'), db_hashed_password.encode('utf-8')):
                 if permission == "TRUE":
-                    token = generate_jwt(emp_id, email, role)
+                    if not workshop_name:
+                        logging.warning(f"Login refused for user ID: {emp_id} - no workshop assigned")
+                        return jsonify({"error": "Your account is not assigned to a workshop."}), 403
+                    token = generate_jwt(emp_id, email, role, workshop_name)
 
                     # Store token in DB
-                    cursor.execute("UPDATE login SET jwt_token = %s WHERE emp_id = %s", (token, emp_id))
+                    queries.execute(cursor, queries.LOGIN_STORE_TOKEN, (token, emp_id))
                     connection.commit()
                     logging.info(f"Token stored for user ID: {emp_id}")
                     logging.info(f"Successfully Login for user ID: {emp_id}")
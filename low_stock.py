@@ -0,0 +1,143 @@
+from config import get_db_connection
+import heapq
+import logging
+import os
+import threading
+import time
+import queries
+
+# Items at or below their reorder threshold, most urgent (largest shortfall)
+# first. The inventory handlers update the heap after each commit. A background
+# evaluator reloads it from the stock_headroom index, which also picks up writes
+# made by other worker processes. There is one heap per workshop, created on the
+# first request from that workshop, so memory follows the workshops in use.
+
+DEFAULT_REORDER_THRESHOLD = int(os.getenv('low_stock_threshold', '5'))
+REFRESH_INTERVAL = float(os.getenv('low_stock_refresh_interval', '60'))  # 0 disables the background evaluator
+MAX_ITEMS = int(os.getenv('low_stock_max_items', '500'))
+
+
+def is_low_stock(available_quantity, reorder_threshold):
+    return available_quantity <= reorder_threshold
+
+
+def stock_item(inventory_code, name, quantity, available_quantity, reorder_threshold):
+    # Same keys as queries.LOW_STOCK_LIST
+    return {
+        'item_code': inventory_code, 'item_name': name, 'quantity': quantity,
+        'available_quantity': available_quantity, 'reorder_threshold': reorder_threshold,
+        'shortfall': reorder_threshold - available_quantity
+    }
+
+
+class LowStockHeap:
+
+    def __init__(self):
+        self.items = {}  # inventory_code -> stock_item
+        self.heap = []   # (-shortfall, inventory_code); entries go stale when an item changes
+        self.stale = 0
+        self.pending = None  # writes seen while a reload is running
+        self.loaded = False
+        self.lock = threading.Lock()
+
+    def update(self, item):
+        code = item['item_code']
+        with self.lock:
+            if self.pending is not None:
+                self.pending[code] = item
+            if item['shortfall'] >= 0:
+                if code in self.items:
+                    self.stale += 1
+                self.items[code] = item
+                heapq.heappush(self.heap, (-item['shortfall'], code))
+            elif self.items.pop(code, None) is not None:
+                self.stale += 1
+
+    def top(self, limit):
+        with self.lock:
+            if self.stale:
+                self._rebuild()
+            return [self.items[code] for _, code in heapq.nsmallest(limit, self.heap)]
+
+    def _rebuild(self):
+        self.heap = [(-item['shortfall'], code) for code, item in self.items.items()]
+        heapq.heapify(self.heap)
+        self.stale = 0
+
+    def begin_reload(self):
+        with self.lock:
+            self.pending = {}
+
+    def reload(self, rows):
+        with self.lock:
+            items = {row['item_code']: row for row in rows}
+            # Local writes that raced the reload query are newer than its snapshot
+            for code, item in self.pending.items():
+                if item['shortfall'] >= 0:
+                    items[code] = item
+                else:
+                    items.pop(code, None)
+            self.pending = None
+            self.items = items
+            self._rebuild()
+            self.loaded = True
+
+
+watches = {}  # workshop -> LowStockHeap
+_watches_lock = threading.Lock()
+
+
+def watch(tenant):
+    heap = watches.get(tenant)
+    if heap is None:
+        with _watches_lock:
+            heap = watches.setdefault(tenant, LowStockHeap())
+    return heap
+
+
+def fetch_low_stock(connection, tenant, limit):
+    cursor = connection.cursor()
+    try:
+        return queries.LOW_STOCK_LIST.to_dicts(queries.fetchall(cursor, queries.LOW_STOCK_LIST, (tenant, limit)))
+    finally:
+        cursor.close()
+
+
+def refresh():
+    connection = get_db_connection(read_only=True)
+    if connection is None:
+        logging.error("Low-stock refresh skipped, no database connection")
+        return
+    try:
+        for tenant, heap in list(watches.items()):
+            try:
+                heap.begin_reload()
+                heap.reload(fetch_low_stock(connection, tenant, MAX_ITEMS))
+                logging.debug(f"Low-stock heap for {tenant} reloaded with {len(heap.items)} item(s)")
+            except Exception as e:
+                with heap.lock:
+                    heap.pending = None
+                logging.error(f"Low-stock refresh failed for {tenant}: {e}", exc_info=True)
+    finally:
+        connection.close()
+
+
+def stats():
+    return {'workshops': len(watches), 'items': sum(len(heap.items) for heap in list(watches.values()))}
+
+
+def _run_evaluator(interval):
+    while True:
+        refresh()
+        time.sleep(interval)
+
+
+_evaluator = None
+
+
+def start_evaluator(interval=REFRESH_INTERVAL):
+    global _evaluator
+    if interval <= 0 or _evaluator is not None:
+        return
+    _evaluator = threading.Thread(target=_run_evaluator, args=(interval,), name='low-stock-evaluator', daemon=True)
+    _evaluator.start()
@@ -0,0 +1,483 @@
+from config import get_db_connection
+import queries
+import logging
+import sys
+
+# Versioned schema migrations and index coverage checks.
+#   python migrate.py upgrade          apply pending migrations
+#   python migrate.py status           list applied / pending migrations
+#   python migrate.py check-indexes    verify each registry query's declared leading index columns
+# Migrations only ever get appended; an applied version is never edited.
+
+
+class Column:
+    # Same idea as Index: ALTER TABLE ADD COLUMN runs only when the column is missing
+
+    def __init__(self, table, name, definition):
+        self.table = table
+        self.name = name
+        self.definition = definition
+
+    def apply(self, cursor):
+        cursor.execute(
+            "SELECT 1 FROM information_schema.columns WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s LIMIT 1",
+            (self.table, self.name)
+        )
+        if cursor.fetchone():
+            logging.info(f"Column {self.table}.{self.name} already exists")
+            return
+        cursor.execute(f"ALTER TABLE {self.table} ADD COLUMN {self.name} {self.definition}")
+        logging.info(f"Added column {self.table}.{self.name}")
+
+
+class Index:
+    # MySQL has no CREATE INDEX IF NOT EXISTS, so indexes are created only when
+    # no index with that name exists yet. This keeps migrations safe to run on
+    # databases that were created by hand before migrations existed.
+
+    def __init__(self, table, name, columns, unique=False):
+        self.table = table
+        self.name = name
+        self.columns = columns
+        self.unique = unique
+
+    def apply(self, cursor):
+        cursor.execute(
+            "SELECT 1 FROM information_schema.statistics WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s LIMIT 1",
+            (self.table, self.name)
+        )
+        if cursor.fetchone():
+            logging.info(f"Index {self.table}.{self.name} already exists")
+            return
+        kind = 'UNIQUE INDEX' if self.unique else 'INDEX'
+        cursor.execute(f"CREATE {kind} {self.name} ON {self.table} ({', '.join(self.columns)})")
+        logging.info(f"Created index {self.table}.{self.name} ({', '.join(self.columns)})")
+
+
+MIGRATIONS = [
+    (1, 'initial_schema', [
+        """
+        CREATE TABLE IF NOT EXISTS employee (
+            emp_id INT AUTO_INCREMENT PRIMARY KEY,
+            first_name VARCHAR(100) NOT NULL,
+            last_name VARCHAR(100),
+            address VARCHAR(255),
+            nic VARCHAR(12) NOT NULL,
+            birth_day DATE,
+            role VARCHAR(50),
+            workshop_name VARCHAR(100),
+            design_category VARCHAR(100),
+            email VARCHAR(255) NOT NULL
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS login (
+            emp_id INT PRIMARY KEY,
+            email VARCHAR(255) NOT NULL,
+            hashed_password VARCHAR(255) NOT NULL,
+            permission VARCHAR(10) NOT NULL DEFAULT 'TRUE',
+            jwt_token TEXT,
+            CONSTRAINT fk_login_employee FOREIGN KEY (emp_id) REFERENCES employee (emp_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS path_permission (
+            role VARCHAR(50) NOT NULL,
+            path VARCHAR(255) NOT NULL
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS clients (
+            client_id INT AUTO_INCREMENT PRIMARY KEY,
+            first_name VARCHAR(100) NOT NULL,
+            last_name VARCHAR(100),
+            country VARCHAR(100),
+            company VARCHAR(255),
+            email VARCHAR(255) NOT NULL,
+            contact_nu VARCHAR(16)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS projects (
+            proj_id INT AUTO_INCREMENT PRIMARY KEY,
+            proj_name VARCHAR(255) NOT NULL,
+            start_date DATE NOT NULL,
+            end_date DATE NOT NULL,
+            status VARCHAR(50) NOT NULL,
+            url VARCHAR(512),
+            remarks TEXT,
+            client_id INT,
+            CONSTRAINT fk_projects_client FOREIGN KEY (client_id) REFERENCES clients (client_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS inventory (
+            inventory_code INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            shop VARCHAR(255),
+            buying_date DATE NOT NULL,
+            price DECIMAL(12, 2) NOT NULL,
+            quantity INT NOT NULL,
+            available_quantity INT NOT NULL,
+            location VARCHAR(255) NOT NULL
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS proj_breakdown (
+            breakdown_id INT AUTO_INCREMENT PRIMARY KEY,
+            proj_id INT NOT NULL,
+            date_time DATETIME NOT NULL,
+            description TEXT,
+            CONSTRAINT fk_breakdown_project FOREIGN KEY (proj_id) REFERENCES projects (proj_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS proj_cost (
+            cost_id INT AUTO_INCREMENT PRIMARY KEY,
+            proj_id INT NOT NULL,
+            inventory_code INT NOT NULL,
+            date_time DATETIME NOT NULL,
+            description TEXT,
+            quantity INT NOT NULL,
+            CONSTRAINT fk_cost_project FOREIGN KEY (proj_id) REFERENCES projects (proj_id),
+            CONSTRAINT fk_cost_inventory FOREIGN KEY (inventory_code) REFERENCES inventory (inventory_code)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """,
+    ]),
+    (2, 'hot_path_indexes', [
+        Index('login', 'idx_login_email', ('email',)),
+        Index('path_permission', 'idx_path_permission_role_path', ('role', 'path')),
+        Index('projects', 'idx_projects_start_date', ('start_date',)),
+        Index('projects', 'idx_projects_client', ('client_id',)),
+        Index('proj_breakdown', 'idx_proj_breakdown_proj_time', ('proj_id', 'date_time')),
+        Index('proj_cost', 'idx_proj_cost_proj_time', ('proj_id', 'date_time')),
+        Index('proj_cost', 'idx_proj_cost_inventory', ('inventory_code',)),
+    ]),
+    (3, 'dashboard_counters', [
+        """
+        CREATE TABLE IF NOT EXISTS dashboard_counters (
+            name VARCHAR(100) PRIMARY KEY,
+            value DECIMAL(16, 2) NOT NULL DEFAULT 0
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """,
+        Index('projects', 'idx_projects_status', ('status',)),
+        Index('proj_cost', 'idx_proj_cost_date_time', ('date_time',)),
+    ]),
+    (4, 'inventory_reorder_threshold', [
+        # Existing items get the default threshold; new ones get low_stock_threshold from the app
+        Column('inventory', 'reorder_threshold', 'INT NOT NULL DEFAULT 5'),
+        # "available <= threshold" compares two columns, so the difference is stored to make it indexable
+        Column('inventory', 'stock_headroom', 'INT AS (available_quantity - reorder_threshold) STORED'),
+        Index('inventory', 'idx_inventory_stock_headroom', ('stock_headroom',)),
+    ]),
+    (5, 'background_jobs', [
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            kind VARCHAR(50) NOT NULL,
+            payload TEXT NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            attempts INT NOT NULL DEFAULT 0,
+            max_attempts INT NOT NULL DEFAULT 3,
+            run_after DATETIME NOT NULL,
+            locked_by VARCHAR(100),
+            locked_at DATETIME,
+            result MEDIUMTEXT,
+            error TEXT,
+            created_by INT,
+            created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            finished_at DATETIME
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """,
+        Index('jobs', 'idx_jobs_status_run_after', ('status', 'run_after')),
+    ]),
+    (6, 'project_schedule_indexes', [
+        Index('projects', 'idx_projects_end_start', ('end_date', 'start_date')),
+    ]),
+    (7, 'project_assignments', [
+        """
+        CREATE TABLE IF NOT EXISTS project_assignments (
+            assignment_id INT AUTO_INCREMENT PRIMARY KEY,
+            proj_id INT NOT NULL,
+            emp_id INT NOT NULL,
+            start_date DATE NOT NULL,
+            end_date DATE NOT NULL,
+            allocation_pct INT NOT NULL DEFAULT 100,
+            created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            CONSTRAINT fk_assignment_project FOREIGN KEY (proj_id) REFERENCES projects (proj_id),
+            CONSTRAINT fk_assignment_employee FOREIGN KEY (emp_id) REFERENCES employee (emp_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS employee_daily_load (
+            emp_id INT NOT NULL,
+            day DATE NOT NULL,
+            allocation_pct INT NOT NULL DEFAULT 0,
+            assignments INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (emp_id, day)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS daily_capacity (
+            day DATE PRIMARY KEY,
+            allocation_pct INT NOT NULL DEFAULT 0,
+            assignments INT NOT NULL DEFAULT 0
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """,
+        Index('project_assignments', 'idx_assignments_emp_dates', ('emp_id', 'end_date', 'start_date')),
+        Index('project_assignments', 'idx_assignments_proj', ('proj_id',)),
+    ]),
+    (8, 'cost_price_snapshot', [
+        # Cost lines keep the name and unit price they were assigned at, so price
+        # edits no longer rewrite history and cost reads need no inventory join
+        Column('proj_cost', 'inventory_name', 'VARCHAR(255)'),
+        Column('proj_cost', 'unit_price', 'DECIMAL(12, 2)'),
+        """
+        UPDATE proj_cost pc JOIN inventory i ON pc.inventory_code = i.inventory_code
+        SET pc.inventory_name = i.name, pc.unit_price = i.price
+        WHERE pc.unit_price IS NULL
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS inventory_price_history (
+            history_id INT AUTO_INCREMENT PRIMARY KEY,
+            inventory_code INT NOT NULL,
+            price DECIMAL(12, 2) NOT NULL,
+            effective_from DATETIME NOT NULL,
+            changed_by INT,
+            CONSTRAINT fk_price_history_inventory FOREIGN KEY (inventory_code) REFERENCES inventory (inventory_code)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """,
+        # Current prices become each item's first history entry
+        """
+        INSERT INTO inventory_price_history (inventory_code, price, effective_from)
+        SELECT i.inventory_code, i.price, i.buying_date FROM inventory i
+        WHERE NOT EXISTS (SELECT 1 FROM inventory_price_history h WHERE h.inventory_code = i.inventory_code)
+        """,
+        Index('inventory_price_history', 'idx_price_history_item_time', ('inventory_code', 'effective_from')),
+    ]),
+    (9, 'workshop_tenants', [
+        # Projects, clients and inventory belong to one workshop (employee.workshop_name);
+        # cost, timeline and assignment rows are scoped through their project
+        Column('projects', 'workshop_name', "VARCHAR(100) NOT NULL DEFAULT ''"),
+        Column('clients', 'workshop_name', "VARCHAR(100) NOT NULL DEFAULT ''"),
+        Column('inventory', 'workshop_name', "VARCHAR(100) NOT NULL DEFAULT ''"),
+        # A single-workshop install hands its existing rows to that workshop. With
+        # several, rows left at '' are hidden until assigned with an UPDATE.
+        """
+        UPDATE projects SET workshop_name = (SELECT MIN(workshop_name) FROM employee)
+        WHERE workshop_name = '' AND (SELECT COUNT(DISTINCT workshop_name) FROM employee) = 1
+        """,
+        """
+        UPDATE clients SET workshop_name = (SELECT MIN(workshop_name) FROM employee)
+        WHERE workshop_name = '' AND (SELECT COUNT(DISTINCT workshop_name) FROM employee) = 1
+        """,
+        """
+        UPDATE inventory SET workshop_name = (SELECT MIN(workshop_name) FROM employee)
+        WHERE workshop_name = '' AND (SELECT COUNT(DISTINCT workshop_name) FROM employee) = 1
+        """,
+        Index('projects', 'idx_projects_workshop_start', ('workshop_name', 'start_date')),
+        Index('projects', 'idx_projects_workshop_end_start', ('workshop_name', 'end_date', 'start_date')),
+        Index('projects', 'idx_projects_workshop_status', ('workshop_name', 'status')),
+        Index('clients', 'idx_clients_workshop_first_name', ('workshop_name', 'first_name')),
+        Index('inventory', 'idx_inventory_workshop_headroom', ('workshop_name', 'stock_headroom')),
+        Index('employee', 'idx_employee_workshop', ('workshop_name',)),
+        # Capacity is per workshop; rebuilt here from the per-employee daily load
+        Column('daily_capacity', 'workshop_name', "VARCHAR(100) NOT NULL DEFAULT ''"),
+        "ALTER TABLE daily_capacity DROP PRIMARY KEY, ADD PRIMARY KEY (workshop_name, day)",
+        "DELETE FROM daily_capacity",
+        """
+        INSERT INTO daily_capacity (workshop_name, day, allocation_pct, assignments)
+        SELECT COALESCE(e.workshop_name, ''), dl.day, SUM(dl.allocation_pct), SUM(dl.assignments)
+        FROM employee_daily_load dl JOIN employee e ON e.emp_id = dl.emp_id
+        GROUP BY COALESCE(e.workshop_name, ''), dl.day
+        """,
+        # Counter names now carry the workshop; the reconciler rebuilds them on start
+        "DELETE FROM dashboard_counters",
+    ]),
+    (10, 'project_archive', [
+        # Cold copies of closed projects (archive.py). Compressed pages and only the
+        # indexes the archive reads use; no foreign keys, so archived rows never
+        # hold back deletes elsewhere.
+        """
+        CREATE TABLE IF NOT EXISTS projects_archive (
+            proj_id INT PRIMARY KEY,
+            workshop_name VARCHAR(100) NOT NULL DEFAULT '',
+            proj_name VARCHAR(255) NOT NULL,
+            start_date DATE NOT NULL,
+            end_date DATE NOT NULL,
+            status VARCHAR(50) NOT NULL,
+            url VARCHAR(512),
+            remarks TEXT,
+            client_id INT,
+            archived_at DATETIME NOT NULL
+        ) ENGINE=InnoDB ROW_FORMAT=COMPRESSED DEFAULT CHARSET=utf8mb4
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS proj_breakdown_archive (
+            breakdown_id INT PRIMARY KEY,
+            proj_id INT NOT NULL,
+            date_time DATETIME NOT NULL,
+            description TEXT,
+            archived_at DATETIME NOT NULL
+        ) ENGINE=InnoDB ROW_FORMAT=COMPRESSED DEFAULT CHARSET=utf8mb4
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS proj_cost_archive (
+            cost_id INT PRIMARY KEY,
+            proj_id INT NOT NULL,
+            inventory_code INT NOT NULL,
+            date_time DATETIME NOT NULL,
+            description TEXT,
+            quantity INT NOT NULL,
+            inventory_name VARCHAR(255),
+            unit_price DECIMAL(12, 2),
+            archived_at DATETIME NOT NULL
+        ) ENGINE=InnoDB ROW_FORMAT=COMPRESSED DEFAULT CHARSET=utf8mb4
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS project_assignments_archive (
+            assignment_id INT PRIMARY KEY,
+            proj_id INT NOT NULL,
+            emp_id INT NOT NULL,
+            start_date DATE NOT NULL,
+            end_date DATE NOT NULL,
+            allocation_pct INT NOT NULL,
+            created_at DATETIME NOT NULL,
+            archived_at DATETIME NOT NULL
+        ) ENGINE=InnoDB ROW_FORMAT=COMPRESSED DEFAULT CHARSET=utf8mb4
+        """,
+        Index('projects_archive', 'idx_projects_archive_workshop_end', ('workshop_name', 'end_date')),
+        Index('proj_breakdown_archive', 'idx_breakdown_archive_proj_time', ('proj_id', 'date_time')),
+        Index('proj_cost_archive', 'idx_cost_archive_proj_time', ('proj_id', 'date_time')),
+        Index('project_assignments_archive', 'idx_assignments_archive_proj', ('proj_id',)),
+    ]),
+    (11, 'audit_log', [
+        # Append-only change log (audit.py). Partitioned by month on changed_at; it
+        # starts with the catch-all partition and audit.ensure_partitions() splits
+        # the upcoming months off it. The primary key has to include changed_at.
+        """
+        CREATE TABLE IF NOT EXISTS audit_log (
+            audit_id BIGINT NOT NULL AUTO_INCREMENT,
+            changed_at DATETIME NOT NULL,
+            workshop_name VARCHAR(100) NOT NULL DEFAULT '',
+            entity VARCHAR(20) NOT NULL,
+            entity_id INT NOT NULL,
+            action VARCHAR(20) NOT NULL,
+            changed_by INT,
+            changes JSON NOT NULL,
+            PRIMARY KEY (audit_id, changed_at),
+            INDEX idx_audit_entity_time (workshop_name, entity, entity_id, changed_at),
+            INDEX idx_audit_type_time (workshop_name, entity, changed_at)
+        ) ENGINE=InnoDB ROW_FORMAT=COMPRESSED DEFAULT CHARSET=utf8mb4
+        PARTITION BY RANGE COLUMNS (changed_at) (
+            PARTITION p_future VALUES LESS THAN (MAXVALUE)
+        )
+        """,
+    ]),
+]
+
+
+def _ensure_migrations_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB
+    """)
+
+
+def applied_versions(cursor):
+    _ensure_migrations_table(cursor)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def upgrade(connection):
+    cursor = connection.cursor()
+    try:
+        done = applied_versions(cursor)
+        for version, name, steps in MIGRATIONS:
+            if version in done:
+                continue
+            logging.info(f"Applying migration {version:04d}_{name}")
+            # MySQL commits DDL implicitly, so each step must be idempotent on its own
+            for step in steps:
+                if isinstance(step, (Column, Index)):
+                    step.apply(cursor)
+                else:
+                    cursor.execute(step)
+            cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            connection.commit()
+        logging.info("Schema is up to date")
+    finally:
+        cursor.close()
+
+
+def status(connection):
+    cursor = connection.cursor()
+    try:
+        done = applied_versions(cursor)
+        for version, name, _ in MIGRATIONS:
+            print(f"{'applied' if version in done else 'pending':<8} {version:04d}_{name}")
+    finally:
+        cursor.close()
+
+
+def live_indexes(cursor):
+    # {table: [column tuple of each index, in seq order]}
+    cursor.execute("""
+        SELECT table_name, index_name, column_name
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE()
+        ORDER BY table_name, index_name, seq_in_index
+    """)
+    indexes = {}
+    for table, index_name, column in cursor.fetchall():
+        indexes.setdefault(table, {}).setdefault(index_name, []).append(column)
+    return {table: [tuple(columns) for columns in by_name.values()] for table, by_name in indexes.items()}
+
+
+def check_indexes(connection):
+    # A requirement is met when its columns are the leading columns of some live
+    # index. Only the (table, columns) pairs declared on each Query are checked:
+    # whether the index also covers every selected and filtered column (no row
+    # lookups) is not verified here; EXPLAIN the query for that.
+    cursor = connection.cursor()
+    try:
+        indexes = live_indexes(cursor)
+    finally:
+        cursor.close()
+
+    missing = 0
+    for name, query in sorted(queries.REGISTRY.items()):
+        for table, columns in query.indexes:
+            covered = any(index[:len(columns)] == tuple(columns) for index in indexes.get(table, []))
+            if not covered:
+                missing += 1
+                print(f"MISSING  {name}: {table}({', '.join(columns)})")
+    unchecked = sorted(name for name, query in queries.REGISTRY.items()
+                       if not query.indexes and not query.sql.startswith('INSERT'))
+    if unchecked:
+        print(f"no index requirement declared: {', '.join(unchecked)}")
+    print(f"{len(queries.REGISTRY)} queries checked (declared leading columns only), {missing} missing index(es)")
+    return missing == 0
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+    connection = get_db_connection()
+    if connection is None:
+        sys.exit("Failed to establish database connection.")
+    try:
+        if command == 'upgrade':
+            upgrade(connection)
+        elif command == 'status':
+            status(connection)
+        elif command == 'check-indexes':
+            if not check_indexes(connection):
+                sys.exit(1)
+        else:
+            sys.exit(f"Unknown command '{command}'. Use upgrade, status or check-indexes.")
+    finally:
+        connection.close()
@@ -2,105 +2,63 @@ from flask import Blueprint, jsonify, request
 from config import get_db_connection 
 import logging
 from verify_jwt import token_required
-from datetime import datetime
+from validation import include_archived
+import queries
+import single_flight
 
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
 
 breakdown = Blueprint('get_project_breakdown', __name__)
 
+# Project pages open both endpoints for the same project at once, often for
+# several users, so identical concurrent requests share one load.
+breakdown_flights = single_flight.group('projectbreakdown')
+cost_flights = single_flight.group('costbreakdown')
+view_flights = single_flight.group('projectview')
 
-@breakdown.route('/projectbreakdown/<int:proj_id>', methods=['GET'])
-@token_required
-def get_project_breakdown(decoded, proj_id):
+# Sections of GET /projects/<id>/view; the project itself is always returned.
+# section -> query, each run with the project id
+VIEW_SECTIONS = {
+    'timeline': queries.BREAKDOWN_HISTORY,
+    'costs': queries.COST_BREAKDOWN,
+    'assignments': queries.ASSIGNMENT_LIST_PROJECT,
+}
+VIEW_DEFAULT = ('client', 'timeline', 'costs')
 
-    logging.info(f"GET request received for /projectbreakdown/{proj_id}")
+
+def _load_project_breakdown(tenant, proj_id, session, archived=False):
     connection = None
     cursor = None
 
     try:
-        connection = get_db_connection()
+        connection = get_db_connection(read_only=True, session=session)
         if connection is None:
             logging.error("Failed to establish database connection in get_project_breakdown.")
-            return jsonify({'error': 'Failed to connect to the database'}), 500
+            return {'error': 'Failed to connect to the database'}, 500
         cursor = connection.cursor() 
 
 
-        # Join projects and clients tables to get combined information
-        project_query = """
-            SELECT
-                p.proj_id,
-                p.proj_name,
-                p.start_date,
-                p.end_date,
-                p.status,
-                p.remarks,
-                c.first_name,
-                c.company
-            FROM
-                projects p
-            JOIN
-                clients c ON p.client_id = c.client_id
-            WHERE
-                p.proj_id = %s;
-        """
-        cursor.execute(project_query, (proj_id,))
-        project_details = cursor.fetchone()
+        project_query, history_query = queries.BREAKDOWN_PROJECT, queries.BREAKDOWN_HISTORY
+        project_details = queries.fetchone(cursor, project_query, (tenant, proj_id))
+        if not project_details and archived:
+            project_query, history_query = queries.ARCHIVED_BREAKDOWN_PROJECT, queries.ARCHIVED_BREAKDOWN_HISTORY
+            project_details = queries.fetchone(cursor, project_query, (tenant, proj_id))
 
         if not project_details:
             logging.warning(f"Project with ID '{proj_id}' not found.")
-            return jsonify({'error': f"Project with ID '{proj_id}' not found."}), 404
+            return {'error': f"Project with ID '{proj_id}' not found."}, 404
 
         # Get project breakdown entries
-        breakdown_query = """
-            SELECT
-                date_time,
-                description
-            FROM
-                proj_breakdown
-            WHERE
-                proj_id = %s
-            ORDER BY
-                date_time ASC; -- Order by date for chronological display
-        """
-        cursor.execute(breakdown_query, (proj_id,))
-        breakdown_entries = cursor.fetchall()
-
-        # Date and Time Format
-        # DATE_FORMAT = "%Y-%m-%d"
-        # DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
-
-        # Format breakdown entries 
-        formatted_breakdown = []
-        for entry in breakdown_entries:
-            formatted_breakdown.append({
-                'date_time': entry[0].isoformat() if entry[0] else None,
-                # 'date_time': entry[0].strftime(DATETIME_FORMAT) if entry[0] else None,
-                'description': entry[1]
-            })
+        breakdown_entries = queries.fetchall(cursor, history_query, (tenant, proj_id))
 
         # Combine all information into a single response dictionary
         response_data = {
-            'project_details': {
-                'proj_id': project_details[0],
-                'proj_name': project_details[1],
-                'start_date': project_details[2].isoformat() if project_details[2] else None,
-                'end_date': project_details[3].isoformat() if project_details[3] else None,
-                'status': project_details[4],
-                'remarks': project_details[5],
-                'client_name': project_details[6],
-                'company': project_details[7]
-            },
-            'breakdown_history': formatted_breakdown
+            'project_details': project_query.to_dict(project_details),
+            'breakdown_history': history_query.to_dicts(breakdown_entries)
         }
 
         logging.info(f"Successfully retrieved breakdown for project ID '{proj_id}'.")
-        return jsonify(response_data), 200
-
-    except Exception as e:
-        logging.error(f"Error processing GET request for /projectbreakdown/{proj_id}: {e}")
-        return jsonify({'error': f"An internal server error occurred: {str(e)}"}), 500
+        return response_data, 200
 
     finally:
         if cursor:
@@ -110,80 +68,156 @@ def get_project_breakdown(decoded, proj_id):
         logging.info("Database connection closed after GET /projectbreakdown.")
 
 
-@breakdown.route('/costbreakdown/<string:proj_id>', methods=['GET'])
+@breakdown.route('/projectbreakdown/<int:proj_id>', methods=['GET'])
 @token_required
-def get_cost_breakdown(decoded, proj_id):
-    logging.info(f"GET request received for /costbreakdown/{proj_id}")
+def get_project_breakdown(decoded, proj_id):
+
+    logging.info(f"GET request received for /projectbreakdown/{proj_id}")
+    archived = include_archived(request.args)
+    try:
+        response_data, status = single_flight.shared_read(
+            breakdown_flights, (proj_id, archived), decoded,
+            lambda: _load_project_breakdown(decoded['tenant'], proj_id, decoded['user_id'], archived))
+        return jsonify(response_data), status
+
+    except Exception as e:
+        logging.error(f"Error processing GET request for /projectbreakdown/{proj_id}: {e}")
+        return jsonify({'error': f"An internal server error occurred: {str(e)}"}), 500
+
+
+def _format_costs(cost_entries):
+    formatted_cost_entries = []
+    total_project_cost = 0.0 # Initialize total cost
+
+    for entry in queries.COST_BREAKDOWN.to_dicts(cost_entries):
+        inventory_price = float(entry['inventory_price']) if entry['inventory_price'] is not None else 0.0
+        quantity = entry['quantity'] if entry['quantity'] is not None else 0
+
+        # Calculate cost for current entry and add to total
+        item_cost = inventory_price * quantity
+        total_project_cost += item_cost
+
+        entry['quantity'] = quantity
+        entry['inventory_price'] = inventory_price
+        entry['item_total_cost'] = item_cost
+        formatted_cost_entries.append(entry)
+    return formatted_cost_entries, total_project_cost
+
+
+def _load_cost_breakdown(tenant, proj_id, session, archived=False):
     connection = None
     cursor = None
 
     try:
-        connection = get_db_connection()
+        connection = get_db_connection(read_only=True, session=session)
         if connection is None:
             logging.error("Failed to establish database connection in get_cost_breakdown.")
-            return jsonify({'error': 'Failed to connect to the database'}), 500
+            return {'error': 'Failed to connect to the database'}, 500
         cursor = connection.cursor()
 
-        cost_breakdown_query = """
-            SELECT
-                pc.cost_id,
-                pc.inventory_code,
-                pc.quantity,
-                pc.date_time,
-                pc.description,
-                i.name AS inventory_name,
-                i.price AS inventory_price
-            FROM
-                proj_cost pc
-            JOIN
-                inventory i ON pc.inventory_code = i.inventory_code
-            WHERE
-                pc.proj_id = %s
-            ORDER BY
-                pc.date_time ASC; -- Order by date for chronological display
-        """
-        cursor.execute(cost_breakdown_query, (proj_id,))
-        cost_entries = cursor.fetchall()
+        cost_entries = queries.fetchall(cursor, queries.COST_BREAKDOWN, (tenant, proj_id))
+        if not cost_entries and archived:
+            cost_entries = queries.fetchall(cursor, queries.ARCHIVED_COST_BREAKDOWN, (tenant, proj_id))
 
         if not cost_entries:
             logging.info(f"No cost breakdown entries found for project ID '{proj_id}'.")
-            return jsonify({'message': f"No cost breakdown entries found for project ID '{proj_id}'."}), 200 # Return 200 with empty list or message
-
-        formatted_cost_entries = []
-        total_project_cost = 0.0 # Initialize total cost
-
-        for entry in cost_entries:
-            inventory_price = float(entry[6]) if entry[6] is not None else 0.0
-            quantity = entry[2] if entry[2] is not None else 0
-
-            # Calculate cost for current entry and add to total
-            item_cost = inventory_price * quantity
-            total_project_cost += item_cost
-
-            formatted_cost_entries.append({
-                'cost_id':entry[0],
-                'inventory_code': entry[1],
-                'quantity': quantity,
-                'date_time': entry[3].isoformat() if entry[3] else None,
-                'description': entry[4],
-                'inventory_name': entry[5],
-                'inventory_price': inventory_price,
-                'item_total_cost': item_cost 
-            })
+            return {'message': f"No cost breakdown entries found for project ID '{proj_id}'."}, 200 # Return 200 with empty list or message
+
+        formatted_cost_entries, total_project_cost = _format_costs(cost_entries)
 
         logging.info(f"Successfully retrieved cost breakdown for project ID '{proj_id}'. Total cost: {total_project_cost}")
-        return jsonify({
+        return {
             'cost_breakdown': formatted_cost_entries,
             'total_project_cost': total_project_cost
-        }), 200
+        }, 200
+
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            connection.close()
+        logging.info("Database connection closed after GET /costbreakdown.")
+
+
+@breakdown.route('/costbreakdown/<string:proj_id>', methods=['GET'])
+@token_required
+def get_cost_breakdown(decoded, proj_id):
+    logging.info(f"GET request received for /costbreakdown/{proj_id}")
+    archived = include_archived(request.args)
+    try:
+        response_data, status = single_flight.shared_read(
+            cost_flights, (proj_id, archived), decoded,
+            lambda: _load_cost_breakdown(decoded['tenant'], proj_id, decoded['user_id'], archived))
+        return jsonify(response_data), status
 
     except Exception as e:
         logging.error(f"Error processing GET request for /costbreakdown/{proj_id}: {e}")
         return jsonify({'error': f"An internal server error occurred: {str(e)}"}), 500
 
+
+def _load_project_view(tenant, proj_id, sections, session):
+    # One connection and one round trip: the project query and every requested
+    # section go to the server together through queries.fetch_pipeline
+    connection = None
+    cursor = None
+
+    try:
+        connection = get_db_connection(read_only=True, session=session, pipeline=True)
+        if connection is None:
+            logging.error("Failed to establish database connection in get_project_view.")
+            return {'error': 'Failed to connect to the database'}, 500
+        cursor = connection.cursor()
+
+        listed = [section for section in sections if section in VIEW_SECTIONS]
+        results = queries.fetch_pipeline(cursor, [(queries.PROJECT_VIEW, (tenant, proj_id))] +
+                                         [(VIEW_SECTIONS[section], (tenant, proj_id)) for section in listed])
+        if not results[0]:
+            logging.warning(f"Project with ID '{proj_id}' not found.")
+            return {'error': f"Project with ID '{proj_id}' not found."}, 404
+
+        row = queries.PROJECT_VIEW.to_dict(results[0][0])
+        client = {key: row.pop(key) for key in ('first_name', 'last_name', 'country', 'company', 'email', 'contact_nu')}
+        row['client_name'] = f"{client['first_name']} ({client['company']})" if client['first_name'] else ''
+        response_data = {'project': row}
+        if 'client' in sections:
+            response_data['client'] = dict(client, client_id=row['client_id']) if row['client_id'] is not None else None
+
+        for section, rows in zip(listed, results[1:]):
+            if section == 'costs':
+                entries, total_project_cost = _format_costs(rows)
+                response_data['costs'] = {'cost_breakdown': entries, 'total_project_cost': total_project_cost}
+            else:
+                response_data[section] = VIEW_SECTIONS[section].to_dicts(rows)
+
+        logging.info(f"Successfully retrieved view of project ID '{proj_id}' with sections {sections}.")
+        return response_data, 200
+
     finally:
         if cursor:
             cursor.close()
         if connection:
             connection.close()
-        logging.info("Database connection closed after GET /costbreakdown.")
\ No newline at end of file
+        logging.info("Database connection closed after GET /projects/<id>/view.")
+
+
+@breakdown.route('/projects/<int:proj_id>/view', methods=['GET'])
+@token_required
+def get_project_view(decoded, proj_id):
+    # ?include=client,timeline,costs,assignments (default: client,timeline,costs)
+    logging.info(f"GET request received for /projects/{proj_id}/view with args: {dict(request.args)}")
+    requested = request.args.get('include')
+    sections = VIEW_DEFAULT if requested is None else \
+        tuple(dict.fromkeys(section.strip() for section in requested.split(',') if section.strip()))
+    unknown = [section for section in sections if section != 'client' and section not in VIEW_SECTIONS]
+    if unknown:
+        return jsonify({'error': f"Unknown include section(s): {', '.join(unknown)}",
+                        'sections': ['client'] + list(VIEW_SECTIONS)}), 400
+
+    try:
+        response_data, status = single_flight.shared_read(
+            view_flights, (proj_id, sections), decoded, lambda: _load_project_view(decoded['tenant'], proj_id, sections, decoded['user_id']))
+        return jsonify(response_data), status
+
+    except Exception as e:
+        logging.error(f"Error processing GET request for /projects/{proj_id}/view: {e}")
+        return jsonify({'error': f"An internal server error occurred: {str(e)}"}), 500
@@ -0,0 +1,246 @@
+from flask import Blueprint, jsonify, request, Response, stream_with_context
+from config import get_db_connection
+import logging
+from verify_jwt import token_required
+from json_provider import dumps
+from collections import Counter
+import jobs
+import queries
+import pymysql
+import csv
+import io
+import zlib
+
+
+
+exp = Blueprint('project_export', __name__)
+
+
+CSV_COLUMNS = [
+    'record_type', 'proj_id', 'proj_name', 'start_date', 'end_date', 'status', 'remarks', 'url',
+    'client_id', 'client_first_name', 'client_company', 'client_country',
+    'cost_id', 'inventory_code', 'inventory_name', 'inventory_price', 'quantity', 'item_total_cost',
+    'date_time', 'description'
+]
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+
+def _format_project(row):
+    return queries.EXPORT_PROJECTS.to_dict(row)
+
+
+def _format_cost(row):
+    cost = queries.EXPORT_COSTS.to_dict(row)
+    del cost['proj_id']
+    inventory_price = float(cost['inventory_price']) if cost['inventory_price'] is not None else 0.0
+    quantity = cost['quantity'] if cost['quantity'] is not None else 0
+    cost['quantity'] = quantity
+    cost['inventory_price'] = inventory_price
+    cost['item_total_cost'] = inventory_price * quantity
+    return cost
+
+
+def _format_breakdown(row):
+    entry = queries.EXPORT_BREAKDOWN.to_dict(row)
+    del entry['proj_id']
+    return entry
+
+
+class _GroupedStream:
+    # Wraps an unbuffered cursor whose rows are ordered by proj_id (column 0)
+    # and hands out the rows belonging to one project at a time.
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.pending = cursor.fetchone()
+
+    def take(self, proj_id):
+        rows = []
+        # Skip orphan rows whose project no longer exists
+        while self.pending is not None and self.pending[0] < proj_id:
+            self.pending = self.cursor.fetchone()
+        while self.pending is not None and self.pending[0] == proj_id:
+            rows.append(self.pending)
+            self.pending = self.cursor.fetchone()
+        return rows
+
+
+def iter_project_exports(connections, tenant):
+    # Each streaming cursor needs its own connection: an unbuffered result set
+    # blocks the connection until it has been read to the end.
+    project_cursor = connections[0].cursor(pymysql.cursors.SSCursor)
+    cost_cursor = connections[1].cursor(pymysql.cursors.SSCursor)
+    breakdown_cursor = connections[2].cursor(pymysql.cursors.SSCursor)
+    try:
+        # All three result sets are ordered by proj_id so they can be merge-joined
+        # while streaming, instead of running the per-project routes 3 x N times.
+        project_cursor.execute(queries.EXPORT_PROJECTS.sql, (tenant,))
+        cost_cursor.execute(queries.EXPORT_COSTS.sql, (tenant,))
+        breakdown_cursor.execute(queries.EXPORT_BREAKDOWN.sql, (tenant,))
+
+        costs = _GroupedStream(cost_cursor)
+        breakdowns = _GroupedStream(breakdown_cursor)
+
+        for row in project_cursor.fetchall_unbuffered():
+            proj_id = row[0]
+            yield (
+                _format_project(row),
+                [_format_cost(cost) for cost in costs.take(proj_id)],
+                [_format_breakdown(entry) for entry in breakdowns.take(proj_id)]
+            )
+    finally:
+        for cursor in (project_cursor, cost_cursor, breakdown_cursor):
+            cursor.close()
+
+
+def _ndjson_lines(records):
+    for project, costs, breakdown_history in records:
+        total_project_cost = sum(cost['item_total_cost'] for cost in costs)
+        project['cost_breakdown'] = costs
+        project['total_project_cost'] = total_project_cost
+        project['breakdown_history'] = breakdown_history
+        yield dumps(project) + '\n'
+
+
+def _csv_lines(records):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+
+    def flush():
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return line
+
+    writer.writeheader()
+    yield flush()
+
+    for project, costs, breakdown_history in records:
+        writer.writerow(dict(project, record_type='project'))
+        for cost in costs:
+            writer.writerow(dict(cost, record_type='cost', proj_id=project['proj_id']))
+        for entry in breakdown_history:
+            writer.writerow(dict(entry, record_type='breakdown', proj_id=project['proj_id']))
+        yield flush()
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def cost_report_job(cursor, payload):
+    # Background job 'project_cost_report': every project of one workshop with
+    # its cost lines summed, plus totals. POST /jobs stamps the caller's workshop
+    # into the payload, so the report never leaves it.
+    tenant = payload.get('tenant')
+    if not tenant:
+        raise jobs.JobRejected("Payload has no workshop")
+    projects = queries.PROJECT_COST_REPORT.to_dicts(queries.fetchall(cursor, queries.PROJECT_COST_REPORT, (tenant,)))
+    by_status = Counter()
+    for project in projects:
+        project['total_cost'] = float(project['total_cost'])
+        by_status[project['status']] += 1
+    return {
+        'projects': projects,
+        'project_count': len(projects),
+        'projects_by_status': dict(by_status),
+        'total_cost': sum(project['total_cost'] for project in projects)
+    }
+
+
+@exp.route('/projects/report', methods=['POST'])
+@token_required
+def queue_cost_report(decoded):
+    # The report aggregates every cost line of the workshop, so it runs on a job
+    # worker; poll status_url, then read the report from /jobs/<id>/result
+    logging.info("POST request received for /projects/report")
+    connection = None
+    cursor = None
+    try:
+        connection = get_db_connection(session=decoded['user_id'])
+        if connection is None:
+            logging.error("Failed to establish database connection for POST /projects/report")
+            return jsonify({'error': 'Failed to connect to the database'}), 500
+        cursor = connection.cursor()
+        job_id = jobs.enqueue(cursor, 'project_cost_report', {'tenant': decoded['tenant']}, decoded['user_id'])
+        connection.commit()
+        jobs.wake()
+        logging.info(f"Cost report job {job_id} queued by user {decoded['user_id']}")
+        return jsonify({'message': 'Report queued', 'job_id': job_id, 'status_url': f"/jobs/{job_id}"}), 202
+
+    except Exception as e:
+        if connection:
+            connection.rollback()
+        logging.error(f"Error processing POST request for /projects/report: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            connection.close()
+
+
+@exp.route('/projects/export', methods=['GET'])
+@token_required
+def export_projects(decoded):
+    logging.info("GET request received for /projects/export")
+
+    export_format = request.args.get('format', 'ndjson').lower()
+    use_gzip = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+
+    if export_format not in EXPORT_FORMATS:
+        logging.warning(f"Unsupported export format requested: {export_format}")
+        return jsonify({'error': 'Format must be one of: csv, ndjson'}), 400
+
+    # A long export would hold three primary connections for its whole run; it
+    # reads from a replica instead, or the primary while this user is pinned to it
+    # after a write (or when no replica is healthy).
+    connections = []
+    for _ in range(3):
+        connection = get_db_connection(read_only=True, session=decoded['user_id'])
+        if connection is None:
+            logging.error("Failed to establish database connection in export_projects.")
+            for opened in connections:
+                opened.close()
+            return jsonify({'error': 'Failed to connect to the database'}), 500
+        connections.append(connection)
+
+    def generate():
+        exported = 0
+        try:
+            records = iter_project_exports(connections, decoded['tenant'])
+            if export_format == 'csv':
+                lines = _csv_lines(records)
+            else:
+                lines = _ndjson_lines(records)
+
+            chunks = _gzip_chunks(lines) if use_gzip else lines
+            for chunk in chunks:
+                exported += 1
+                yield chunk
+        except Exception as e:
+            logging.error(f"Error streaming /projects/export: {e}", exc_info=True)
+            raise
+        finally:
+            for connection in connections:
+                connection.close()
+            logging.info(f"Database connections closed after GET /projects/export ({exported} chunks sent).")
+
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    filename = f"projects_export.{extension}"
+    if use_gzip:
+        mimetype = 'application/gzip'
+        filename += '.gz'
+
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
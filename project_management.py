@@ -2,14 +2,45 @@ from flask import Blueprint, jsonify, request
 from config import get_db_connection 
 import logging
 from verify_jwt import token_required
-from datetime import datetime
+from validation import PROJECT_SCHEMA, include_archived, iso_date
+from json_provider import rows_response
+import audit
+import batch_lookup
+import dashboard
+import queries
+from datetime import date, datetime, timedelta
+import os
 
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
 
 prj = Blueprint('projects', __name__)
 
+# Statuses that no longer count as running work (overdue and concurrency views)
+CLOSED_PROJECT_STATUSES = ','.join(
+    status.strip() for status in os.getenv('closed_project_statuses', 'Completed,Cancelled').split(',') if status.strip())
+SCHEDULE_WINDOW_DAYS = int(os.getenv('schedule_window_days', '90'))
+SCHEDULE_MAX_WINDOW_DAYS = int(os.getenv('schedule_max_window_days', '366'))  # longest ?from=&to= span accepted
+_window_date = iso_date('Invalid date format. Use YYYY-MM-DD')
+
+
+def _client_in_workshop(cursor, tenant, client_id):
+    # The foreign key would accept another workshop's client
+    return not client_id or queries.fetchone(cursor, queries.CLIENT_IN_WORKSHOP, (tenant, client_id)) is not None
+
+
+def create_project(cursor, tenant, project):
+    # Inserts the project and its first timeline entry; the caller owns the transaction
+    queries.execute(cursor, queries.PROJECT_INSERT, (
+        tenant, project['proj_name'], project['start_date'], project['end_date'], project['status'],
+        project['url'], project['remarks'], project['client_id']
+    ))
+    proj_id = cursor.lastrowid
+    dashboard.project_status_changed(cursor, tenant, None, project['status'])
+
+    breakdown_description = f"Project created with initial status: {project['status']}"
+    queries.execute(cursor, queries.BREAKDOWN_INSERT, (proj_id, datetime.now(), breakdown_description))
+    return proj_id
+
 
 @prj.route('/projects', methods=['POST'])
 @token_required
@@ -21,64 +52,28 @@ def add_project(decoded):
     data = request.get_json()
     logging.info(f"Received project data: {data}")
 
-    # proj_id = data.get('proj_id')
-    proj_name = data.get('proj_name')
-    start_date = data.get('start_date')
-    end_date = data.get('end_date')
-    status = data.get('status')
-    url = data.get('url')
-    remarks = data.get('remarks') 
-    client_id = data.get('client_id') 
-
-    # Required field validation
-    if not all([proj_name, start_date, end_date, status]):
-        logging.warning("Missing required fields")
-        return jsonify({'error': 'Project Name, Start Date, End Date, and Status are required.'}), 400
-
-    # === Parse and validate dates ===
-    start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-    end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-
-    # === Validate logical date order ===
-    if start_date_obj >= end_date_obj:
-        return jsonify({'error': 'Start Date must be before End Date'}), 400
-
-    # === Validate future end date ===
-    if end_date_obj <= datetime.now().date():
-        return jsonify({'error': 'End Date must be a future date'}), 400
+    # ===== Field Validation =====
+    project, error = PROJECT_SCHEMA.validate(data)
+    if error:
+        logging.warning(f"Project validation failed: {error}")
+        return jsonify({'error': error}), 400
 
     try:
-        connection = get_db_connection()
+        connection = get_db_connection(session=decoded['user_id'])
         if connection is None:
             logging.error("Failed to establish database connection in add_project.")
             return jsonify({'error': 'Failed to connect to the database'}), 500
         cursor = connection.cursor()
 
-        cursor.execute(
-            "INSERT INTO projects ( proj_name, start_date, end_date, status, url, remarks, client_id) VALUES (%s, %s, %s, %s, %s, %s, %s)",
-            ( proj_name, start_date, end_date, status, url, remarks, client_id)
-        )
+        if not _client_in_workshop(cursor, decoded['tenant'], project['client_id']):
+            return jsonify({'error': f"Client with ID '{project['client_id']}' not found."}), 400
 
-        current_datetime = datetime.now() # Get current date and time
-        breakdown_description = f"Project created with initial status: {status}" 
-
-        cursor.execute("SELECT proj_id FROM projects WHERE proj_name = %s AND client_id = %s", (proj_name, client_id))
+        proj_id = create_project(cursor, decoded['tenant'], project)
         connection.commit()
 
-        result = cursor.fetchone() 
-    
-        proj_id = None
-        if result:
-            proj_id = result[0]
-
-        cursor.execute(
-            "INSERT INTO proj_breakdown (proj_id, date_time, description) VALUES (%s, %s, %s)",
-            (proj_id, current_datetime, breakdown_description)
-        )
-
-        connection.commit() 
+        project['proj_id'] = proj_id
         logging.info(f"Project with ID '{proj_id}' added successfully.")
-        return jsonify({'message': 'Project added successfully', 'proj_id': proj_id}), 201 
+        return jsonify({'message': 'Project added successfully', 'proj_id': proj_id, 'project': project}), 201
 
     except Exception as e:
         if connection:
@@ -101,47 +96,22 @@ def get_projects(decoded):
     connection = None
     cursor = None
     try:
-        connection = get_db_connection()
+        connection = get_db_connection(read_only=True, session=decoded['user_id'])
         if connection is None:
             logging.error("Failed to establish database connection in get_projects.")
             return jsonify({'error': 'Failed to connect to the database'}), 500
         cursor = connection.cursor()
-        cursor.execute("""
-            SELECT
-                p.proj_id,
-                p.proj_name,
-                p.start_date,
-                p.end_date,
-                p.status,
-                p.remarks,
-                p.url,
-                c.client_id,
-                c.first_name AS client_first_name,
-                c.company AS client_company,
-                c.country AS client_country
-            FROM projects p LEFT JOIN clients c ON p.client_id = c.client_id ORDER BY p.start_date DESC;
-        """)
-        results = cursor.fetchall()
+        results = queries.fetchall(cursor, queries.PROJECT_LIST, (decoded['tenant'],))
         logging.info(f"Retrieved {len(results)} projects from the database.")
+        if include_archived(request.args):
+            # Archived projects follow the hot ones; archived_at is null for the hot rows
+            archived = queries.fetchall(cursor, queries.ARCHIVED_PROJECT_LIST, (decoded['tenant'],))
+            logging.info(f"Appended {len(archived)} archived projects.")
+            return rows_response(queries.ARCHIVED_PROJECT_LIST.columns,
+                                 [row + (None,) for row in results] + list(archived))
 
-        projects = []
-        for row in results:
-            project = {
-                'proj_id': row[0],
-                'proj_name': row[1],
-                'start_date': row[2],
-                'end_date': row[3],
-                'status': row[4],
-                'remarks': row[5], 
-                'url': row[6],
-                'client_id': row[7],
-                'client_first_name': row[8],
-                'client_company': row[9],
-                'client_country': row[10]
-            }
-            projects.append(project)
         logging.info("Successfully formatted project data for response.")
-        return jsonify(projects), 200 
+        return rows_response(queries.PROJECT_LIST.columns, results)
 
     except Exception as e:
         if connection:
@@ -157,6 +127,95 @@ def get_projects(decoded):
         logging.info("Database connection closed after GET /projects.")
 
 
+def date_window():
+    # ?from=&to= (inclusive), defaulting to today .. today + schedule_window_days.
+    # Also used by workload.py, whose capacity view builds one entry per day.
+    today = date.today()
+    try:
+        window_start = _window_date(request.args['from']) if request.args.get('from') else today
+        window_end = _window_date(request.args['to']) if request.args.get('to') else window_start + timedelta(days=SCHEDULE_WINDOW_DAYS)
+    except ValueError as e:
+        return None, None, str(e)
+    if window_start > window_end:
+        return None, None, "'from' must not be after 'to'"
+    if (window_end - window_start).days >= SCHEDULE_MAX_WINDOW_DAYS:
+        return None, None, f"The window from 'from' to 'to' must not exceed {SCHEDULE_MAX_WINDOW_DAYS} days"
+    return window_start, window_end, None
+
+
+def _schedule_query(decoded, label, query, args):
+    connection = None
+    cursor = None
+    try:
+        connection = get_db_connection(read_only=True, session=decoded['user_id'])
+        if connection is None:
+            logging.error(f"Failed to establish database connection for GET {label}.")
+            return jsonify({'error': 'Failed to connect to the database'}), 500
+        cursor = connection.cursor()
+        results = queries.fetchall(cursor, query, args)
+        logging.info(f"Retrieved {len(results)} rows for GET {label}.")
+        return rows_response(query.columns, results)
+
+    except Exception as e:
+        logging.error(f"Error processing GET request for {label}: {e}", exc_info=True)
+        return jsonify({'error': f"An internal server error occurred: {str(e)}"}), 500
+
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            connection.close()
+
+
+@prj.route('/projects/overdue', methods=['GET'])
+@token_required
+def get_overdue_projects(decoded):
+    # Past their end date and not in a closed status, most overdue first
+    logging.info("GET request received for /projects/overdue")
+    return _schedule_query(decoded, '/projects/overdue', queries.PROJECT_OVERDUE,
+                           (decoded['tenant'], date.today(), CLOSED_PROJECT_STATUSES))
+
+
+@prj.route('/projects/active', methods=['GET'])
+@token_required
+def get_active_projects(decoded):
+    # Projects whose start..end range overlaps the requested window
+    logging.info(f"GET request received for /projects/active with args: {dict(request.args)}")
+    window_start, window_end, error = date_window()
+    if error:
+        return jsonify({'error': error}), 400
+    return _schedule_query(decoded, '/projects/active', queries.PROJECT_ACTIVE_WINDOW,
+                           (decoded['tenant'], window_start, window_end))
+
+
+@prj.route('/projects/concurrency', methods=['GET'])
+@token_required
+def get_client_concurrency(decoded):
+    # Per client, within the window: projects, the most running at once, and
+    # how many are open today
+    logging.info(f"GET request received for /projects/concurrency with args: {dict(request.args)}")
+    window_start, window_end, error = date_window()
+    if error:
+        return jsonify({'error': error}), 400
+    today = date.today()
+    tenant = decoded['tenant']
+    return _schedule_query(decoded, '/projects/concurrency', queries.CLIENT_CONCURRENCY,
+                           (today, today, CLOSED_PROJECT_STATUSES, tenant, window_start, window_end,
+                            tenant, window_start, window_end))
+
+
+def _format_project(project):
+    # Formatted for frontend
+    project['client_name'] = f"{project['client_first_name']} ({project['client_company']})" if project['client_first_name'] else ''
+    return project
+
+
+@prj.route('/projects/batch', methods=['GET'])
+@token_required
+def get_projects_batch(decoded):
+    return batch_lookup.lookup(decoded, '/projects/batch', queries.PROJECT_BATCH, _format_project)
+
+
 @prj.route('/projects/<int:project_id>', methods=['GET'])
 @token_required
 def get_project_by_id(decoded, project_id):
@@ -164,44 +223,20 @@ def get_project_by_id(decoded, project_id):
     connection = None
     cursor = None
     try:
-        connection = get_db_connection()
+        connection = get_db_connection(read_only=True, session=decoded['user_id'])
         if connection is None:
             logging.error(f"Failed to establish database connection for project ID {project_id}.")
             return jsonify({'error': 'Failed to connect to the database'}), 500
         cursor = connection.cursor()
 
-        cursor.execute("""
-            SELECT
-                p.proj_id,
-                p.proj_name,
-                p.start_date,
-                p.end_date,
-                p.status,
-                p.remarks,
-                p.url,
-                c.client_id,
-                c.first_name AS client_first_name,
-                c.company AS client_company,
-                c.country AS client_country
-            FROM projects p LEFT JOIN clients c ON p.client_id = c.client_id WHERE p.proj_id = %s;
-        """, (project_id,))
-        result = cursor.fetchone()
+        result = queries.fetchone(cursor, queries.PROJECT_BY_ID, (decoded['tenant'], project_id))
+        query = queries.PROJECT_BY_ID
+        if not result and include_archived(request.args):
+            query = queries.ARCHIVED_PROJECT_BY_ID
+            result = queries.fetchone(cursor, query, (decoded['tenant'], project_id))
 
         if result:
-            project = {
-                'proj_id': result[0],
-                'proj_name': result[1],
-                'start_date': str(result[2]),
-                'end_date': str(result[3]),
-                'status': result[4],
-                'remarks': result[5],
-                'url':result[6],
-                'client_id': result[7],
-                'client_name': f"{result[8]} ({result[9]})" if result[8] else '', # Formatted for frontend
-                'client_first_name': result[8],
-                'client_company': result[9],
-                'client_country': result[10]
-            }
+            project = _format_project(query.to_dict(result))
             logging.info(f"Successfully retrieved project with ID '{project_id}'.")
             return jsonify(project), 200
         else:
@@ -229,62 +264,52 @@ def update_project(decoded, project_id):
     data = request.get_json()
     logging.info(f"Received update data for project '{project_id}': {data}")
 
-    proj_name = data.get('proj_name')
-    start_date = data.get('start_date')
-    end_date = data.get('end_date')
-    status = data.get('status')
-    url = data.get('url')
-    remarks = data.get('remarks')
-    client_id = data.get('client_id') 
-
-   # Required field validation
-    if not all([proj_name, start_date, end_date, status]):
-        logging.warning("Missing required fields")
-        return jsonify({'error': 'Project Name, Start Date, End Date, and Status are required.'}), 400
+    # ===== Field Validation =====
+    project, error = PROJECT_SCHEMA.validate(data)
+    if error:
+        logging.warning(f"Project validation failed: {error}")
+        return jsonify({'error': error}), 400
 
-    # === Parse and validate dates ===
-    start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-    end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-
-    # === Validate logical date order ===
-    if start_date_obj >= end_date_obj:
-        return jsonify({'error': 'Start Date must be before End Date'}), 400
-
-    # === Validate future end date ===
-    if end_date_obj <= datetime.now().date():
-        return jsonify({'error': 'End Date must be a future date'}), 400
+    proj_name = project['proj_name']
+    start_date = project['start_date']
+    end_date = project['end_date']
+    status = project['status']
+    url = project['url']
+    remarks = project['remarks']
+    client_id = project['client_id']
 
     try:
-        connection = get_db_connection()
+        connection = get_db_connection(session=decoded['user_id'])
         if connection is None:
             logging.error(f"Failed to establish database connection for updating project '{project_id}'.")
             return jsonify({'error': 'Failed to connect to the database'}), 500
         cursor = connection.cursor()
 
-        cursor.execute(
-            """
-            UPDATE projects
-            SET proj_name = %s, start_date = %s, end_date = %s, status = %s, url = %s, remarks = %s, client_id = %s
-            WHERE proj_id = %s
-            """,
-            (proj_name, start_date, end_date, status, url, remarks, client_id, project_id)
-        )
+        # The old row moves the dashboard counter and feeds the audit trail
+        current = queries.fetchone(cursor, queries.PROJECT_LOCK, (decoded['tenant'], project_id))
+        if not current:
+            connection.rollback()
+            logging.warning(f"Attempted to update non-existent project ID: {project_id}.")
+            return jsonify({'error': 'Project not found or no changes made'}), 404
+        if not _client_in_workshop(cursor, decoded['tenant'], client_id):
+            connection.rollback()
+            return jsonify({'error': f"Client with ID '{client_id}' not found."}), 400
+
+        queries.execute(cursor, queries.PROJECT_UPDATE, (proj_name, start_date, end_date, status, url, remarks, client_id, project_id))
+        before = queries.PROJECT_LOCK.to_dict(current)
+        dashboard.project_status_changed(cursor, decoded['tenant'], before['status'], status)
 
         current_datetime = datetime.now() # Get current date and time
         breakdown_description = f"Project updated: {status}" 
 
-        cursor.execute(
-            "INSERT INTO proj_breakdown (proj_id, date_time, description) VALUES (%s, %s, %s)",
-            (project_id, current_datetime, breakdown_description)
-        )
+        queries.execute(cursor, queries.BREAKDOWN_INSERT, (project_id, current_datetime, breakdown_description))
 
         connection.commit()
+        audit.record(decoded['tenant'], 'project', project_id, 'update', decoded['user_id'], audit.diff(before, {
+            'proj_name': proj_name, 'start_date': start_date, 'end_date': end_date, 'status': status,
+            'url': url, 'remarks': remarks, 'client_id': client_id
+        }))
 
-        if cursor.rowcount == 0:
-            # If no rows were affected, the project_id might not exist
-            logging.warning(f"Attempted to update non-existent project ID: {project_id}.")
-            return jsonify({'error': 'Project not found or no changes made'}), 404
-        
         logging.info(f"Project with ID '{project_id}' updated successfully.")
         return jsonify({'message': 'Project updated successfully'}), 200
 
@@ -0,0 +1,986 @@
+from config import PREPARED_STATEMENTS, READ_RETRIES, connection_lost, is_connection_error, multi_statements, retry_delay
+import pymysql
+import logging
+import time
+
+# Central registry of every SQL statement the blueprints run. Each statement is
+# defined once together with the keys its result columns map to, so handlers
+# build response dicts through the column map instead of row[9]-style indexes.
+
+ER_UNKNOWN_STMT_HANDLER = 1243
+
+
+REGISTRY = {}
+
+
+class Query:
+    __slots__ = ('name', 'sql', 'columns', 'index', 'prepared_sql', 'indexes', 'retryable')
+
+    # indexes lists the (table, leading columns) each statement relies on;
+    # `python migrate.py check-indexes` verifies that a live index starts with
+    # those columns. It does not check that the index covers the whole query.
+    def __init__(self, name, sql, columns=(), indexes=()):
+        self.name = name
+        self.sql = ' '.join(sql.split())
+        self.columns = tuple(columns)
+        self.index = {column: position for position, column in enumerate(self.columns)}
+        self.prepared_sql = self.sql.replace('%s', '?')
+        self.indexes = tuple(indexes)
+        # A plain SELECT can be repeated on a fresh connection after a drop
+        upper = self.sql.upper()
+        self.retryable = upper.startswith('SELECT') and 'FOR UPDATE' not in upper
+        REGISTRY[name] = self
+
+    def to_dict(self, row):
+        return dict(zip(self.columns, row))
+
+    def to_dicts(self, rows):
+        columns = self.columns
+        return [dict(zip(columns, row)) for row in rows]
+
+
+def _prepare(cursor, query):
+    connection = cursor.connection
+    prepared = getattr(connection, 'prepared_statements', None)
+    if prepared is None:
+        prepared = connection.prepared_statements = set()
+
+    if query.name not in prepared:
+        cursor.execute(f"PREPARE {query.name} FROM %s", (query.prepared_sql,))
+        prepared.add(query.name)
+
+
+def _execute_prepared(cursor, query, args):
+    # pymysql only speaks the text protocol, so statements are prepared with SQL
+    # PREPARE once per pooled connection and run with SET + EXECUTE: one
+    # round trip on a pipeline connection, two on a regular one.
+    _prepare(cursor, query)
+
+    if not args:
+        cursor.execute(f"EXECUTE {query.name}")
+        return
+
+    variables = [f"@{query.name}_{position}" for position in range(len(args))]
+    assignments = ', '.join(f"{variable} = %s" for variable in variables)
+    execute_sql = f"EXECUTE {query.name} USING {', '.join(variables)}"
+    if multi_statements(cursor.connection):
+        cursor.execute(f"SET {assignments}; {execute_sql}", args)
+        cursor.nextset()
+    else:
+        cursor.execute(f"SET {assignments}", args)
+        cursor.execute(execute_sql)
+
+
+def _execute(cursor, query, args):
+    if not PREPARED_STATEMENTS:
+        cursor.execute(query.sql, args or None)
+        return
+    try:
+        _execute_prepared(cursor, query, args)
+    except pymysql.MySQLError as e:
+        # The server forgot our statements (e.g. after a reconnect), prepare again
+        if e.args[0] != ER_UNKNOWN_STMT_HANDLER:
+            raise
+        logging.warning(f"Prepared statement '{query.name}' missing on connection, re-preparing")
+        cursor.connection.prepared_statements = set()
+        _execute_prepared(cursor, query, args)
+
+
+def execute(cursor, query, args=()):
+    # Lost connections are reported to config.connection_lost. On read-only
+    # checkouts a plain SELECT is retried on a reconnected connection; writes and
+    # locking reads are not, since the transaction they belonged to is gone.
+    attempt = 0
+    while True:
+        try:
+            _execute(cursor, query, args)
+            return
+        except pymysql.OperationalError as e:
+            if not is_connection_error(e):
+                raise
+            connection = cursor.connection
+            connection_lost(connection)
+            if attempt >= READ_RETRIES or not query.retryable or not getattr(connection, 'retry_reads', False):
+                raise
+            delay = retry_delay(attempt)
+            attempt += 1
+            logging.warning(f"Connection lost running '{query.name}', retrying in {delay * 1000:.0f} ms: {e}")
+            time.sleep(delay)
+            try:
+                connection.ping(reconnect=True)
+            except pymysql.Error:
+                raise e
+            connection.prepared_statements = set()
+
+
+def fetchone(cursor, query, args=()):
+    execute(cursor, query, args)
+    return cursor.fetchone()
+
+
+def fetchall(cursor, query, args=()):
+    execute(cursor, query, args)
+    return cursor.fetchall()
+
+
+def executemany(cursor, query, rows):
+    # pymysql folds INSERT ... VALUES batches into one multi-row statement
+    if not PREPARED_STATEMENTS:
+        cursor.executemany(query.sql, rows)
+        return
+    for args in rows:
+        execute(cursor, query, args)
+
+
+def _pipeline_prepared(cursor, steps):
+    statements = []
+    variables = []
+    values = []
+    for step, (query, args) in enumerate(steps):
+        _prepare(cursor, query)
+        names = [f"@{query.name}_{step}_{position}" for position in range(len(args))]
+        statements.append(f"EXECUTE {query.name} USING {', '.join(names)}" if names else f"EXECUTE {query.name}")
+        variables.extend(names)
+        values.extend(args)
+
+    if values:
+        assignments = ', '.join(f"{variable} = %s" for variable in variables)
+        cursor.execute(f"SET {assignments}; " + '; '.join(statements), values)
+        cursor.nextset()
+    else:
+        cursor.execute('; '.join(statements))
+
+
+def fetch_pipeline(cursor, steps):
+    # Sends several reads, [(query, args), ...], as one multi-statement round trip
+    # and returns each one's fetchall() in order. That needs a connection from
+    # get_db_connection(pipeline=True); on any other the reads run one by one.
+    if not multi_statements(cursor.connection):
+        return [fetchall(cursor, query, args) for query, args in steps]
+    if not PREPARED_STATEMENTS:
+        values = [value for _, args in steps for value in args]
+        cursor.execute('; '.join(query.sql for query, _ in steps), values or None)
+    else:
+        try:
+            _pipeline_prepared(cursor, steps)
+        except pymysql.MySQLError as e:
+            if e.args[0] != ER_UNKNOWN_STMT_HANDLER:
+                raise
+            logging.warning("Prepared statement missing on connection, re-preparing pipeline")
+            cursor.connection.prepared_statements = set()
+            _pipeline_prepared(cursor, steps)
+
+    results = [cursor.fetchall()]
+    while len(results) < len(steps):
+        cursor.nextset()
+        results.append(cursor.fetchall())
+    return results
+
+
+class BatchQuery:
+    # `... IN ({ids})` lookups. The id list is padded to the next power of two by
+    # repeating its last id, so a 100 id limit needs at most eight statement shapes
+    # (each a registered Query, prepared once per connection like any other).
+
+    def __init__(self, name, sql, columns, indexes=()):
+        self.name = name
+        self.sql = sql
+        self.columns = tuple(columns)
+        self.indexes = tuple(indexes)
+        self.shapes = {}
+        self.shape(1)  # registers the index requirement for check-indexes
+
+    def shape(self, count):
+        size = 1
+        while size < count:
+            size *= 2
+        query = self.shapes.get(size)
+        if query is None:
+            query = self.shapes[size] = Query(f"{self.name}_{size}", self.sql.format(ids=', '.join(['%s'] * size)),
+                                              self.columns, self.indexes)
+        return query, size
+
+
+def _batch_args(batch, ids, scope):
+    query, size = batch.shape(len(ids))
+    return query, tuple(scope) + tuple(ids) + (ids[-1],) * (size - len(ids))
+
+
+def fetch_by_ids(cursor, batch, ids, scope=()):
+    # Returns {first column: row} for the ids that exist. scope holds the
+    # parameters that come before the IN list (the workshop).
+    query, args = _batch_args(batch, ids, scope)
+    return {row[0]: row for row in fetchall(cursor, query, args)}
+
+
+def execute_by_ids(cursor, batch, ids, scope=()):
+    # Same padding for INSERT ... SELECT / DELETE statements; repeated ids are
+    # harmless inside IN (...). Returns the affected row count.
+    query, args = _batch_args(batch, ids, scope)
+    execute(cursor, query, args)
+    return cursor.rowcount
+
+
+# ===== Auth =====
+
+LOGIN_BY_EMAIL = Query('login_by_email', """
+    SELECT login.emp_id, login.email, login.hashed_password, login.permission, employee.role, employee.workshop_name
+    FROM login INNER JOIN employee ON login.emp_id = employee.emp_id
+    WHERE login.email = %s
+""", ('emp_id', 'email', 'hashed_password', 'permission', 'role', 'workshop_name'),
+    indexes=(('login', ('email',)), ('employee', ('emp_id',))))
+
+LOGIN_STORE_TOKEN = Query('login_store_token', "UPDATE login SET jwt_token = %s WHERE emp_id = %s",
+    indexes=(('login', ('emp_id',)),))
+
+LOGIN_TOKEN = Query('login_token', "SELECT jwt_token FROM login WHERE emp_id = %s AND email = %s", ('jwt_token',),
+    indexes=(('login', ('emp_id',)),))
+
+PATH_PERMISSIONS = Query('path_permissions', "SELECT path FROM path_permission WHERE role = %s", ('path',),
+    indexes=(('path_permission', ('role', 'path')),))
+
+
+# ===== Projects =====
+# Every project, client and inventory query is scoped to one workshop (the JWT
+# tenant claim), passed as the first parameter and matched by the leading
+# column of a (workshop_name, ...) index.
+
+_PROJECT_SELECT = """
+    SELECT
+        p.proj_id, p.proj_name, p.start_date, p.end_date, p.status, p.remarks, p.url,
+        c.client_id, c.first_name AS client_first_name, c.company AS client_company, c.country AS client_country
+    FROM projects p LEFT JOIN clients c ON p.client_id = c.client_id
+"""
+_PROJECT_COLUMNS = ('proj_id', 'proj_name', 'start_date', 'end_date', 'status', 'remarks', 'url',
+                    'client_id', 'client_first_name', 'client_company', 'client_country')
+
+PROJECT_LIST = Query('project_list', _PROJECT_SELECT + " WHERE p.workshop_name = %s ORDER BY p.start_date DESC",
+                     _PROJECT_COLUMNS,
+    indexes=(('projects', ('workshop_name', 'start_date')), ('clients', ('client_id',))))
+
+PROJECT_BY_ID = Query('project_by_id', _PROJECT_SELECT + " WHERE p.workshop_name = %s AND p.proj_id = %s",
+                      _PROJECT_COLUMNS,
+    indexes=(('projects', ('proj_id',)), ('clients', ('client_id',))))
+
+PROJECT_BATCH = BatchQuery('project_batch', _PROJECT_SELECT + " WHERE p.workshop_name = %s AND p.proj_id IN ({ids})",
+                           _PROJECT_COLUMNS,
+    indexes=(('projects', ('proj_id',)), ('clients', ('client_id',))))
+
+# ===== Project schedule analytics =====
+# Closed statuses are passed as one comma separated string for FIND_IN_SET, so the
+# statement text stays fixed however many statuses are configured.
+
+PROJECT_OVERDUE = Query('project_overdue', _PROJECT_SELECT + """
+    WHERE p.workshop_name = %s AND p.end_date < %s AND FIND_IN_SET(p.status, %s) = 0
+    ORDER BY p.end_date ASC
+""", _PROJECT_COLUMNS,
+    indexes=(('projects', ('workshop_name', 'end_date')), ('clients', ('client_id',))))
+
+# Overlap with [from, to]: the end_date range is scanned on the index and
+# start_date is checked from the same index entry
+PROJECT_ACTIVE_WINDOW = Query('project_active_window', _PROJECT_SELECT + """
+    WHERE p.workshop_name = %s AND p.end_date >= %s AND p.start_date <= %s
+    ORDER BY p.start_date ASC
+""", _PROJECT_COLUMNS,
+    indexes=(('projects', ('workshop_name', 'end_date', 'start_date')), ('clients', ('client_id',))))
+
+# Sweep line per client: +1 on each start day, -1 the day after each end day; the
+# running sum peaks at the most projects that client had open at once. Ends sort
+# before starts on the same day, so back-to-back projects do not count as overlapping.
+CLIENT_CONCURRENCY = Query('client_concurrency', """
+    SELECT c.client_id, c.first_name, c.company, sweep.projects, sweep.peak_concurrent, sweep.active_now
+    FROM (
+        -- SUM() yields DECIMAL in MySQL; cast so the counts serialise as integers
+        SELECT client_id, CAST(SUM(delta > 0) AS SIGNED) AS projects, CAST(MAX(running) AS SIGNED) AS peak_concurrent,
+            CAST(SUM(active) AS SIGNED) AS active_now
+        FROM (
+            SELECT client_id, delta, active,
+                SUM(delta) OVER (PARTITION BY client_id ORDER BY day, delta) AS running
+            FROM (
+                SELECT client_id, start_date AS day, 1 AS delta,
+                    (start_date <= %s AND end_date >= %s AND FIND_IN_SET(status, %s) = 0) AS active
+                FROM projects
+                WHERE workshop_name = %s AND client_id IS NOT NULL AND end_date >= %s AND start_date <= %s
+                UNION ALL
+                SELECT client_id, DATE_ADD(end_date, INTERVAL 1 DAY), -1, 0
+                FROM projects
+                WHERE workshop_name = %s AND client_id IS NOT NULL AND end_date >= %s AND start_date <= %s
+            ) events
+        ) sweep_rows
+        GROUP BY client_id
+    ) sweep JOIN clients c ON c.client_id = sweep.client_id
+    ORDER BY sweep.peak_concurrent DESC, sweep.projects DESC
+""", ('client_id', 'client_first_name', 'client_company', 'projects', 'peak_concurrent', 'active_now'),
+    indexes=(('projects', ('workshop_name', 'end_date', 'start_date')), ('clients', ('client_id',))))
+
+PROJECT_INSERT = Query('project_insert', """
+    INSERT INTO projects (workshop_name, proj_name, start_date, end_date, status, url, remarks, client_id)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+""")
+
+# The whole editable row: the old status moves the dashboard counter and the
+# rest is the audit trail's "before"
+PROJECT_LOCK = Query('project_lock', """
+    SELECT proj_name, start_date, end_date, status, url, remarks, client_id
+    FROM projects WHERE workshop_name = %s AND proj_id = %s FOR UPDATE
+""", ('proj_name', 'start_date', 'end_date', 'status', 'url', 'remarks', 'client_id'),
+    indexes=(('projects', ('proj_id',)),))
+
+PROJECT_UPDATE = Query('project_update', """
+    UPDATE projects
+    SET proj_name = %s, start_date = %s, end_date = %s, status = %s, url = %s, remarks = %s, client_id = %s
+    WHERE proj_id = %s
+""",
+    indexes=(('projects', ('proj_id',)),))
+
+
+# ===== Project breakdown and costs =====
+
+BREAKDOWN_INSERT = Query('breakdown_insert',
+                         "INSERT INTO proj_breakdown (proj_id, date_time, description) VALUES (%s, %s, %s)")
+
+BREAKDOWN_PROJECT = Query('breakdown_project', """
+    SELECT p.proj_id, p.proj_name, p.start_date, p.end_date, p.status, p.remarks, c.first_name, c.company
+    FROM projects p JOIN clients c ON p.client_id = c.client_id
+    WHERE p.workshop_name = %s AND p.proj_id = %s
+""", ('proj_id', 'proj_name', 'start_date', 'end_date', 'status', 'remarks', 'client_name', 'company'),
+    indexes=(('projects', ('proj_id',)), ('clients', ('client_id',))))
+
+# Child rows are scoped through their project: the primary key lookup on
+# projects matches at most one row, so the join costs one index probe.
+BREAKDOWN_HISTORY = Query('breakdown_history', """
+    SELECT b.date_time, b.description
+    FROM projects p JOIN proj_breakdown b ON b.proj_id = p.proj_id
+    WHERE p.workshop_name = %s AND p.proj_id = %s
+    ORDER BY b.date_time ASC
+""", ('date_time', 'description'),
+    indexes=(('projects', ('proj_id',)), ('proj_breakdown', ('proj_id', 'date_time'))))
+
+# Name and unit price are the snapshot taken at assignment, not today's inventory row
+COST_BREAKDOWN = Query('cost_breakdown', """
+    SELECT pc.cost_id, pc.inventory_code, pc.quantity, pc.date_time, pc.description, pc.inventory_name, pc.unit_price
+    FROM projects p JOIN proj_cost pc ON pc.proj_id = p.proj_id
+    WHERE p.workshop_name = %s AND p.proj_id = %s
+    ORDER BY pc.date_time ASC
+""", ('cost_id', 'inventory_code', 'quantity', 'date_time', 'description', 'inventory_name', 'inventory_price'),
+    indexes=(('projects', ('proj_id',)), ('proj_cost', ('proj_id', 'date_time'))))
+
+# Project page header: the project and its full client record in one row
+PROJECT_VIEW = Query('project_view', """
+    SELECT p.proj_id, p.proj_name, p.start_date, p.end_date, p.status, p.remarks, p.url,
+        c.client_id, c.first_name, c.last_name, c.country, c.company, c.email, c.contact_nu
+    FROM projects p LEFT JOIN clients c ON p.client_id = c.client_id
+    WHERE p.workshop_name = %s AND p.proj_id = %s
+""", ('proj_id', 'proj_name', 'start_date', 'end_date', 'status', 'remarks', 'url',
+      'client_id', 'first_name', 'last_name', 'country', 'company', 'email', 'contact_nu'),
+    indexes=(('projects', ('proj_id',)), ('clients', ('client_id',))))
+
+PROJ_COST_INSERT = Query('proj_cost_insert', """
+    INSERT INTO proj_cost (proj_id, inventory_code, date_time, description, quantity, inventory_name, unit_price)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+""")
+
+PRICE_HISTORY_INSERT = Query('price_history_insert', """
+    INSERT INTO inventory_price_history (inventory_code, price, effective_from, changed_by)
+    VALUES (%s, %s, %s, %s)
+""")
+
+PRICE_HISTORY_LIST = Query('price_history_list', """
+    SELECT h.price, h.effective_from, h.changed_by
+    FROM inventory i JOIN inventory_price_history h ON h.inventory_code = i.inventory_code
+    WHERE i.workshop_name = %s AND i.inventory_code = %s
+    ORDER BY h.effective_from DESC
+""", ('price', 'effective_from', 'changed_by'),
+    indexes=(('inventory', ('inventory_code',)), ('inventory_price_history', ('inventory_code', 'effective_from'))))
+
+
+# ===== Export (streamed, merge-joined on proj_id) =====
+
+# The workshop index holds the primary key after workshop_name, so each
+# workshop's projects come off it already in proj_id order
+EXPORT_PROJECTS = Query('export_projects', _PROJECT_SELECT + " WHERE p.workshop_name = %s ORDER BY p.proj_id ASC",
+                        _PROJECT_COLUMNS,
+    indexes=(('projects', ('workshop_name',)), ('clients', ('client_id',))))
+
+EXPORT_COSTS = Query('export_costs', """
+    SELECT pc.proj_id, pc.cost_id, pc.inventory_code, pc.quantity, pc.date_time, pc.description,
+        pc.inventory_name, pc.unit_price
+    FROM projects p JOIN proj_cost pc ON pc.proj_id = p.proj_id
+    WHERE p.workshop_name = %s
+    ORDER BY pc.proj_id ASC, pc.date_time ASC
+""", ('proj_id',) + COST_BREAKDOWN.columns,
+    indexes=(('projects', ('workshop_name',)), ('proj_cost', ('proj_id', 'date_time'))))
+
+EXPORT_BREAKDOWN = Query('export_breakdown', """
+    SELECT b.proj_id, b.date_time, b.description
+    FROM projects p JOIN proj_breakdown b ON b.proj_id = p.proj_id
+    WHERE p.workshop_name = %s
+    ORDER BY b.proj_id ASC, b.date_time ASC
+""", ('proj_id',) + BREAKDOWN_HISTORY.columns,
+    indexes=(('projects', ('workshop_name',)), ('proj_breakdown', ('proj_id', 'date_time'))))
+
+# Cost report job: one row per project with its cost lines summed
+PROJECT_COST_REPORT = Query('project_cost_report', """
+    SELECT p.proj_id, p.proj_name, p.status, p.start_date, p.end_date, c.company,
+        COUNT(pc.cost_id), COALESCE(SUM(pc.unit_price * pc.quantity), 0)
+    FROM projects p
+    LEFT JOIN clients c ON p.client_id = c.client_id
+    LEFT JOIN proj_cost pc ON pc.proj_id = p.proj_id
+    WHERE p.workshop_name = %s
+    GROUP BY p.proj_id, p.proj_name, p.status, p.start_date, p.end_date, c.company
+    ORDER BY p.proj_id ASC
+""", ('proj_id', 'proj_name', 'status', 'start_date', 'end_date', 'client_company', 'cost_lines', 'total_cost'),
+    indexes=(('projects', ('workshop_name',)), ('clients', ('client_id',)), ('proj_cost', ('proj_id',))))
+
+
+# ===== Archive =====
+# Closed projects past archive_after_days move, with their timeline, cost and
+# assignment rows, into the *_archive tables (see archive.py). The copies keep
+# their primary keys, so an archived project is read by the same id.
+
+ARCHIVE_CANDIDATES = Query('archive_candidates', """
+    SELECT proj_id, workshop_name, status FROM projects
+    WHERE end_date < %s AND FIND_IN_SET(status, %s) > 0
+    ORDER BY end_date ASC
+    LIMIT %s
+    FOR UPDATE
+""", ('proj_id', 'workshop_name', 'status'),
+    indexes=(('projects', ('end_date',)),))
+
+# Copies run before the deletes, parent last on copy and child first on delete
+ARCHIVE_COPY = (
+    ('proj_cost', BatchQuery('archive_copy_costs', """
+        INSERT INTO proj_cost_archive (cost_id, proj_id, inventory_code, date_time, description, quantity,
+            inventory_name, unit_price, archived_at)
+        SELECT cost_id, proj_id, inventory_code, date_time, description, quantity, inventory_name, unit_price, %s
+        FROM proj_cost WHERE proj_id IN ({ids})
+    """, (), indexes=(('proj_cost', ('proj_id',)),))),
+    ('proj_breakdown', BatchQuery('archive_copy_breakdown', """
+        INSERT INTO proj_breakdown_archive (breakdown_id, proj_id, date_time, description, archived_at)
+        SELECT breakdown_id, proj_id, date_time, description, %s
+        FROM proj_breakdown WHERE proj_id IN ({ids})
+    """, (), indexes=(('proj_breakdown', ('proj_id',)),))),
+    ('project_assignments', BatchQuery('archive_copy_assignments', """
+        INSERT INTO project_assignments_archive (assignment_id, proj_id, emp_id, start_date, end_date,
+            allocation_pct, created_at, archived_at)
+        SELECT assignment_id, proj_id, emp_id, start_date, end_date, allocation_pct, created_at, %s
+        FROM project_assignments WHERE proj_id IN ({ids})
+    """, (), indexes=(('project_assignments', ('proj_id',)),))),
+    ('projects', BatchQuery('archive_copy_projects', """
+        INSERT INTO projects_archive (proj_id, workshop_name, proj_name, start_date, end_date, status, url,
+            remarks, client_id, archived_at)
+        SELECT proj_id, workshop_name, proj_name, start_date, end_date, status, url, remarks, client_id, %s
+        FROM projects WHERE proj_id IN ({ids})
+    """, (), indexes=(('projects', ('proj_id',)),))),
+)
+
+ARCHIVE_DELETE = (
+    ('proj_cost', BatchQuery('archive_delete_costs', "DELETE FROM proj_cost WHERE proj_id IN ({ids})", (),
+                             indexes=(('proj_cost', ('proj_id',)),))),
+    ('proj_breakdown', BatchQuery('archive_delete_breakdown', "DELETE FROM proj_breakdown WHERE proj_id IN ({ids})", (),
+                                  indexes=(('proj_breakdown', ('proj_id',)),))),
+    ('project_assignments', BatchQuery('archive_delete_assignments',
+                                       "DELETE FROM project_assignments WHERE proj_id IN ({ids})", (),
+                                       indexes=(('project_assignments', ('proj_id',)),))),
+    ('projects', BatchQuery('archive_delete_projects', "DELETE FROM projects WHERE proj_id IN ({ids})", (),
+                            indexes=(('projects', ('proj_id',)),))),
+)
+
+# The join every timeline and cost read pays for; archive.py times it before and after a run
+ARCHIVE_PROBE = Query('archive_probe', """
+    SELECT
+        (SELECT COUNT(*) FROM projects p JOIN proj_breakdown b ON b.proj_id = p.proj_id),
+        (SELECT COUNT(*) FROM projects p JOIN proj_cost pc ON pc.proj_id = p.proj_id)
+""", ('timeline_rows', 'cost_rows'),
+    indexes=(('proj_breakdown', ('proj_id',)), ('proj_cost', ('proj_id',))))
+
+# Sizes are InnoDB estimates; archive.py runs ANALYZE TABLE first
+TABLE_SIZES = Query('table_sizes', """
+    SELECT table_name, table_rows, data_length + index_length
+    FROM information_schema.tables
+    WHERE table_schema = DATABASE() AND FIND_IN_SET(table_name, %s) > 0
+""", ('table', 'rows', 'bytes'))
+
+# Read side: same columns as the hot queries they stand in for, plus archived_at
+# on the project itself
+_ARCHIVED_PROJECT_SELECT = """
+    SELECT
+        p.proj_id, p.proj_name, p.start_date, p.end_date, p.status, p.remarks, p.url,
+        c.client_id, c.first_name AS client_first_name, c.company AS client_company, c.country AS client_country,
+        p.archived_at
+    FROM projects_archive p LEFT JOIN clients c ON p.client_id = c.client_id
+"""
+
+ARCHIVED_PROJECT_LIST = Query('archived_project_list',
+                              _ARCHIVED_PROJECT_SELECT + " WHERE p.workshop_name = %s ORDER BY p.end_date DESC",
+                              _PROJECT_COLUMNS + ('archived_at',),
+    indexes=(('projects_archive', ('workshop_name', 'end_date')), ('clients', ('client_id',))))
+
+ARCHIVED_PROJECT_BY_ID = Query('archived_project_by_id',
+                               _ARCHIVED_PROJECT_SELECT + " WHERE p.workshop_name = %s AND p.proj_id = %s",
+                               _PROJECT_COLUMNS + ('archived_at',),
+    indexes=(('projects_archive', ('proj_id',)), ('clients', ('client_id',))))
+
+ARCHIVED_BREAKDOWN_PROJECT = Query('archived_breakdown_project', """
+    SELECT p.proj_id, p.proj_name, p.start_date, p.end_date, p.status, p.remarks, c.first_name, c.company
+    FROM projects_archive p JOIN clients c ON p.client_id = c.client_id
+    WHERE p.workshop_name = %s AND p.proj_id = %s
+""", BREAKDOWN_PROJECT.columns,
+    indexes=(('projects_archive', ('proj_id',)), ('clients', ('client_id',))))
+
+ARCHIVED_BREAKDOWN_HISTORY = Query('archived_breakdown_history', """
+    SELECT b.date_time, b.description
+    FROM projects_archive p JOIN proj_breakdown_archive b ON b.proj_id = p.proj_id
+    WHERE p.workshop_name = %s AND p.proj_id = %s
+    ORDER BY b.date_time ASC
+""", BREAKDOWN_HISTORY.columns,
+    indexes=(('projects_archive', ('proj_id',)), ('proj_breakdown_archive', ('proj_id', 'date_time'))))
+
+ARCHIVED_COST_BREAKDOWN = Query('archived_cost_breakdown', """
+    SELECT pc.cost_id, pc.inventory_code, pc.quantity, pc.date_time, pc.description, pc.inventory_name, pc.unit_price
+    FROM projects_archive p JOIN proj_cost_archive pc ON pc.proj_id = p.proj_id
+    WHERE p.workshop_name = %s AND p.proj_id = %s
+    ORDER BY pc.date_time ASC
+""", COST_BREAKDOWN.columns,
+    indexes=(('projects_archive', ('proj_id',)), ('proj_cost_archive', ('proj_id', 'date_time'))))
+
+
+# ===== Clients =====
+
+_CLIENT_COLUMNS = ('client_id', 'first_name', 'last_name', 'country', 'company', 'email', 'contact_nu')
+
+CLIENT_INSERT = Query('client_insert', """
+    INSERT INTO clients (workshop_name, first_name, last_name, country, company, email, contact_nu)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+""")
+
+CLIENT_LIST = Query('client_list', """
+    SELECT client_id, first_name, last_name, country, company, email, contact_nu
+    FROM clients WHERE workshop_name = %s
+""", _CLIENT_COLUMNS,
+    indexes=(('clients', ('workshop_name',)),))
+
+CLIENT_BY_ID = Query('client_by_id', """
+    SELECT client_id, first_name, last_name, country, company, email, contact_nu
+    FROM clients WHERE workshop_name = %s AND client_id = %s
+""", _CLIENT_COLUMNS,
+    indexes=(('clients', ('client_id',)),))
+
+CLIENT_BATCH = BatchQuery('client_batch', """
+    SELECT client_id, first_name, last_name, country, company, email, contact_nu
+    FROM clients WHERE workshop_name = %s AND client_id IN ({ids})
+""", _CLIENT_COLUMNS,
+    indexes=(('clients', ('client_id',)),))
+
+CLIENT_IN_WORKSHOP = Query('client_in_workshop', "SELECT client_id FROM clients WHERE workshop_name = %s AND client_id = %s",
+                           ('client_id',),
+    indexes=(('clients', ('client_id',)),))
+
+# The LIKE patterns cannot use an index, but the (workshop_name, first_name) index
+# limits the scan to one workshop and returns it already sorted
+CLIENT_SUGGESTIONS = Query('client_suggestions', """
+    SELECT client_id, first_name, company, country
+    FROM clients
+    WHERE workshop_name = %s AND (first_name LIKE %s OR company LIKE %s)
+    ORDER BY first_name ASC
+    LIMIT 10
+""", ('client_id', 'first_name', 'company', 'country'),
+    indexes=(('clients', ('workshop_name', 'first_name')),))
+
+
+# ===== Employees =====
+
+_EMPLOYEE_COLUMNS = ('emp_id', 'first_name', 'last_name', 'email', 'address', 'nic', 'birth_day',
+                     'role', 'workshop_name', 'design_category')
+
+EMPLOYEE_LIST = Query('employee_list', """
+    SELECT employee.emp_id, employee.first_name, employee.last_name, employee.email, employee.address,
+        employee.nic, employee.birth_day, employee.role, employee.workshop_name, employee.design_category,
+        login.permission
+    FROM employee INNER JOIN login ON employee.emp_id = login.emp_id
+    WHERE employee.workshop_name = %s
+""", _EMPLOYEE_COLUMNS + ('permission',),
+    indexes=(('employee', ('workshop_name',)), ('login', ('emp_id',))))
+
+EMPLOYEE_BY_ID = Query('employee_by_id', """
+    SELECT emp_id, first_name, last_name, email, address, nic, birth_day, role, workshop_name, design_category
+    FROM employee WHERE workshop_name = %s AND emp_id = %s
+""", _EMPLOYEE_COLUMNS,
+    indexes=(('employee', ('emp_id',)),))
+
+EMPLOYEE_BATCH = BatchQuery('employee_batch', """
+    SELECT emp_id, first_name, last_name, email, address, nic, birth_day, role, workshop_name, design_category
+    FROM employee WHERE workshop_name = %s AND emp_id IN ({ids})
+""", _EMPLOYEE_COLUMNS,
+    indexes=(('employee', ('emp_id',)),))
+
+EMPLOYEE_IN_WORKSHOP = Query('employee_in_workshop',
+                             "SELECT emp_id FROM employee WHERE workshop_name = %s AND emp_id = %s", ('emp_id',),
+    indexes=(('employee', ('emp_id',)),))
+
+EMPLOYEE_LOCK = Query('employee_lock', """
+    SELECT first_name, last_name, email, address, nic, birth_day, role, workshop_name, design_category
+    FROM employee WHERE workshop_name = %s AND emp_id = %s FOR UPDATE
+""", ('first_name', 'last_name', 'email', 'address', 'nic', 'birth_day', 'role', 'workshop_name', 'design_category'),
+    indexes=(('employee', ('emp_id',)),))
+
+EMPLOYEE_INSERT = Query('employee_insert', """
+    INSERT INTO employee (first_name, last_name, email, address, nic, birth_day, role, workshop_name, design_category)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+""")
+
+EMPLOYEE_UPDATE = Query('employee_update', """
+    UPDATE employee SET first_name = %s, last_name = %s, email = %s, address = %s, nic = %s,
+    birth_day = %s, role = %s, workshop_name = %s, design_category = %s WHERE emp_id = %s
+""",
+    indexes=(('employee', ('emp_id',)),))
+
+LOGIN_INSERT = Query('login_insert',
+                     "INSERT INTO login (emp_id, email, hashed_password, permission) VALUES (%s, %s, %s, %s)")
+
+LOGIN_UPDATE_EMAIL_PASSWORD = Query('login_update_email_password',
+                                    "UPDATE login SET email = %s, hashed_password = %s WHERE emp_id = %s",
+    indexes=(('login', ('emp_id',)),))
+
+LOGIN_UPDATE_EMAIL = Query('login_update_email', "UPDATE login SET email = %s WHERE emp_id = %s",
+    indexes=(('login', ('emp_id',)),))
+
+LOGIN_LOCK_PERMISSION = Query('login_lock_permission',
+                              "SELECT permission FROM login WHERE email IN (SELECT email FROM employee WHERE emp_id = %s) FOR UPDATE",
+                              ('permission',),
+    indexes=(('login', ('email',)), ('employee', ('emp_id',))))
+
+LOGIN_UPDATE_PERMISSION = Query('login_update_permission',
+                                "UPDATE login SET permission = %s WHERE email IN (SELECT email FROM employee WHERE emp_id = %s)",
+    indexes=(('login', ('email',)), ('employee', ('emp_id',))))
+
+
+# ===== Inventory =====
+
+INVENTORY_LIST = Query('inventory_list', """
+    SELECT inventory_code, name, shop, buying_date, price, quantity, available_quantity, location, reorder_threshold
+    FROM inventory WHERE workshop_name = %s
+""", ('item_code', 'item_name', 'shop', 'purchase_date', 'price', 'quantity', 'available_quantity', 'location',
+      'reorder_threshold'),
+    indexes=(('inventory', ('workshop_name',)),))
+
+INVENTORY_BY_CODE = Query('inventory_by_code', """
+    SELECT inventory_code, name, shop, buying_date, price, quantity, available_quantity, location, reorder_threshold
+    FROM inventory WHERE workshop_name = %s AND inventory_code = %s
+""", ('item_code', 'item_name', 'shop', 'buying_date', 'price', 'quantity', 'available_quantity', 'location',
+      'reorder_threshold'),
+    indexes=(('inventory', ('inventory_code',)),))
+
+INVENTORY_BATCH = BatchQuery('inventory_batch', """
+    SELECT inventory_code, name, shop, buying_date, price, quantity, available_quantity, location, reorder_threshold
+    FROM inventory WHERE workshop_name = %s AND inventory_code IN ({ids})
+""", INVENTORY_BY_CODE.columns,
+    indexes=(('inventory', ('inventory_code',)),))
+
+INVENTORY_INSERT = Query('inventory_insert', """
+    INSERT INTO inventory (workshop_name, name, shop, buying_date, price, quantity, available_quantity, location,
+        reorder_threshold)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+""")
+
+INVENTORY_UPDATE = Query('inventory_update', """
+    UPDATE inventory SET name = %s, shop = %s, buying_date = %s, price = %s, quantity = %s,
+        available_quantity = %s, location = %s, reorder_threshold = COALESCE(%s, reorder_threshold)
+    WHERE inventory_code = %s
+""",
+    indexes=(('inventory', ('inventory_code',)),))
+
+INVENTORY_LOCK_AVAILABLE = Query('inventory_lock_available', """
+    SELECT available_quantity, name, shop, buying_date, price, quantity, location, reorder_threshold
+    FROM inventory WHERE workshop_name = %s AND inventory_code = %s FOR UPDATE
+""", ('available_quantity', 'name', 'shop', 'buying_date', 'price', 'quantity', 'location', 'reorder_threshold'),
+    indexes=(('inventory', ('inventory_code',)),))
+
+INVENTORY_SET_AVAILABLE = Query('inventory_set_available',
+                                "UPDATE inventory SET available_quantity = %s WHERE inventory_code = %s",
+    indexes=(('inventory', ('inventory_code',)),))
+
+# stock_headroom is the stored generated column available_quantity - reorder_threshold
+LOW_STOCK_LIST = Query('low_stock_list', """
+    SELECT inventory_code, name, quantity, available_quantity, reorder_threshold, -stock_headroom
+    FROM inventory WHERE workshop_name = %s AND stock_headroom <= 0
+    ORDER BY stock_headroom ASC, inventory_code ASC
+    LIMIT %s
+""", ('item_code', 'item_name', 'quantity', 'available_quantity', 'reorder_threshold', 'shortfall'),
+    indexes=(('inventory', ('workshop_name', 'stock_headroom')),))
+
+
+# ===== Dashboard counters =====
+
+COUNTER_BUMP = Query('counter_bump', """
+    INSERT INTO dashboard_counters (name, value) VALUES (%s, %s)
+    ON DUPLICATE KEY UPDATE value = value + VALUES(value)
+""")
+
+COUNTER_SET = Query('counter_set', """
+    INSERT INTO dashboard_counters (name, value) VALUES (%s, %s)
+    ON DUPLICATE KEY UPDATE value = VALUES(value)
+""")
+
+COUNTER_SUMMARY = Query('counter_summary', """
+    SELECT name, value FROM dashboard_counters
+    WHERE name IN (%s, %s, %s) OR name LIKE %s
+""", ('name', 'value'),
+    indexes=(('dashboard_counters', ('name',)),))
+
+COUNTER_ALL = Query('counter_all', "SELECT name, value FROM dashboard_counters", ('name', 'value'))
+
+# Reconciliation reads the counters and the base tables from one snapshot, and
+# only one session in the deployment runs it at a time (see dashboard.reconcile)
+RECONCILE_SNAPSHOT = Query('reconcile_snapshot', "START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY")
+
+RECONCILE_GET_LOCK = Query('reconcile_get_lock', "SELECT GET_LOCK(%s, 0)", ('locked',))
+
+RECONCILE_RELEASE_LOCK = Query('reconcile_release_lock', "SELECT RELEASE_LOCK(%s)", ('released',))
+
+# Counters are kept per workshop; reconciliation recomputes every workshop at once
+RECONCILE_PROJECT_STATUS = Query('reconcile_project_status', """
+    SELECT workshop_name, status, COUNT(*) FROM projects GROUP BY workshop_name, status
+""", ('workshop_name', 'status', 'count'),
+    indexes=(('projects', ('workshop_name', 'status')),))
+
+RECONCILE_ACTIVE_EMPLOYEES = Query('reconcile_active_employees', """
+    SELECT e.workshop_name, COUNT(*)
+    FROM login l JOIN employee e ON e.emp_id = l.emp_id
+    WHERE l.permission = 'TRUE' AND e.workshop_name IS NOT NULL
+    GROUP BY e.workshop_name
+""", ('workshop_name', 'count'),
+    indexes=(('employee', ('emp_id',)),))
+
+RECONCILE_LOW_STOCK = Query('reconcile_low_stock', """
+    SELECT workshop_name, COUNT(*) FROM inventory WHERE stock_headroom <= 0 GROUP BY workshop_name
+""", ('workshop_name', 'count'),
+    indexes=(('inventory', ('stock_headroom',)),))
+
+RECONCILE_MONTH_COST = Query('reconcile_month_cost', """
+    SELECT p.workshop_name, SUM(pc.unit_price * pc.quantity)
+    FROM proj_cost pc JOIN projects p ON p.proj_id = pc.proj_id
+    WHERE pc.date_time >= %s AND pc.date_time < %s
+    GROUP BY p.workshop_name
+""", ('workshop_name', 'cost'),
+    indexes=(('proj_cost', ('date_time',)), ('projects', ('proj_id',))))
+
+
+# ===== Background jobs =====
+
+JOB_INSERT = Query('job_insert', """
+    INSERT INTO jobs (kind, payload, status, attempts, max_attempts, run_after, created_by)
+    VALUES (%s, %s, 'queued', 0, %s, NOW(), %s)
+""")
+
+# SKIP LOCKED lets several workers claim different jobs without queueing on each other
+JOB_CLAIM = Query('job_claim', """
+    SELECT job_id, kind, payload, attempts, max_attempts FROM jobs
+    WHERE status = 'queued' AND run_after <= NOW()
+    ORDER BY run_after ASC
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED
+""", ('job_id', 'kind', 'payload', 'attempts', 'max_attempts'),
+    indexes=(('jobs', ('status', 'run_after')),))
+
+JOB_MARK_RUNNING = Query('job_mark_running', """
+    UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_by = %s, locked_at = NOW()
+    WHERE job_id = %s
+""",
+    indexes=(('jobs', ('job_id',)),))
+
+JOB_SUCCEEDED = Query('job_succeeded', """
+    UPDATE jobs SET status = 'succeeded', result = %s, error = NULL, locked_by = NULL, finished_at = NOW()
+    WHERE job_id = %s
+""",
+    indexes=(('jobs', ('job_id',)),))
+
+JOB_RETRY = Query('job_retry', """
+    UPDATE jobs SET status = 'queued', error = %s, locked_by = NULL, run_after = NOW() + INTERVAL %s SECOND
+    WHERE job_id = %s
+""",
+    indexes=(('jobs', ('job_id',)),))
+
+JOB_FAILED = Query('job_failed', """
+    UPDATE jobs SET status = 'failed', error = %s, locked_by = NULL, finished_at = NOW()
+    WHERE job_id = %s
+""",
+    indexes=(('jobs', ('job_id',)),))
+
+# Jobs whose worker died mid-run go back to the queue once their lease runs out
+JOB_REQUEUE_STALE = Query('job_requeue_stale', """
+    UPDATE jobs SET status = IF(attempts >= max_attempts, 'failed', 'queued'), error = 'Worker lease expired',
+        locked_by = NULL, run_after = NOW()
+    WHERE status = 'running' AND locked_at < NOW() - INTERVAL %s SECOND
+""",
+    indexes=(('jobs', ('status', 'run_after')),))
+
+JOB_BY_ID = Query('job_by_id', """
+    SELECT job_id, kind, status, attempts, max_attempts, error, result, created_by, created_at, run_after, finished_at
+    FROM jobs WHERE job_id = %s
+""", ('job_id', 'kind', 'status', 'attempts', 'max_attempts', 'error', 'result', 'created_by', 'created_at',
+      'run_after', 'finished_at'),
+    indexes=(('jobs', ('job_id',)),))
+
+EMPLOYEE_NIC = Query('employee_nic', "SELECT nic FROM employee WHERE emp_id = %s", ('nic',),
+    indexes=(('employee', ('emp_id',)),))
+
+# Only fills a pending password, so a retried job never overwrites one the user has set since
+LOGIN_SET_INITIAL_PASSWORD = Query('login_set_initial_password',
+                                   "UPDATE login SET hashed_password = %s WHERE emp_id = %s AND hashed_password = ''",
+    indexes=(('login', ('emp_id',)),))
+
+
+# ===== Audit trail =====
+# audit_log is append-only and range-partitioned by month on changed_at, so a
+# time-bounded read only opens the partitions it covers. Pages are keyset: the
+# (changed_at, audit_id) pair of the last row seen is the exclusive upper bound
+# of the next page, which the index serves in order without an offset scan.
+
+AUDIT_INSERT = Query('audit_insert', """
+    INSERT INTO audit_log (changed_at, workshop_name, entity, entity_id, action, changed_by, changes)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+""")
+
+_AUDIT_COLUMNS = ('audit_id', 'changed_at', 'entity', 'entity_id', 'action', 'changed_by', 'changes')
+
+AUDIT_BY_ENTITY = Query('audit_by_entity', """
+    SELECT audit_id, changed_at, entity, entity_id, action, changed_by, changes
+    FROM audit_log
+    WHERE workshop_name = %s AND entity = %s AND entity_id = %s
+        AND changed_at >= %s AND (changed_at, audit_id) < (%s, %s)
+    ORDER BY changed_at DESC, audit_id DESC
+    LIMIT %s
+""", _AUDIT_COLUMNS,
+    indexes=(('audit_log', ('workshop_name', 'entity', 'entity_id', 'changed_at')),))
+
+AUDIT_BY_TYPE = Query('audit_by_type', """
+    SELECT audit_id, changed_at, entity, entity_id, action, changed_by, changes
+    FROM audit_log
+    WHERE workshop_name = %s AND entity = %s
+        AND changed_at >= %s AND (changed_at, audit_id) < (%s, %s)
+    ORDER BY changed_at DESC, audit_id DESC
+    LIMIT %s
+""", _AUDIT_COLUMNS,
+    indexes=(('audit_log', ('workshop_name', 'entity', 'changed_at')),))
+
+AUDIT_PARTITIONS = Query('audit_partitions', """
+    SELECT partition_name FROM information_schema.partitions
+    WHERE table_schema = DATABASE() AND table_name = 'audit_log' AND partition_name IS NOT NULL
+""", ('partition_name',))
+
+
+# ===== Assignments and workload =====
+
+PROJECT_DATES = Query('project_dates',
+                      "SELECT start_date, end_date FROM projects WHERE workshop_name = %s AND proj_id = %s",
+                      ('start_date', 'end_date'),
+    indexes=(('projects', ('proj_id',)),))
+
+ASSIGNMENT_INSERT = Query('assignment_insert', """
+    INSERT INTO project_assignments (proj_id, emp_id, start_date, end_date, allocation_pct)
+    VALUES (%s, %s, %s, %s, %s)
+""")
+
+ASSIGNMENT_LOCK = Query('assignment_lock', """
+    SELECT a.emp_id, a.start_date, a.end_date, a.allocation_pct
+    FROM project_assignments a JOIN projects p ON p.proj_id = a.proj_id
+    WHERE p.workshop_name = %s AND a.assignment_id = %s
+    FOR UPDATE OF a
+""", ('emp_id', 'start_date', 'end_date', 'allocation_pct'),
+    indexes=(('project_assignments', ('assignment_id',)), ('projects', ('proj_id',))))
+
+ASSIGNMENT_DELETE = Query('assignment_delete', "DELETE FROM project_assignments WHERE assignment_id = %s",
+    indexes=(('project_assignments', ('assignment_id',)),))
+
+ASSIGNMENT_LIST_PROJECT = Query('assignment_list_project', """
+    SELECT a.assignment_id, a.emp_id, e.first_name, e.last_name, e.role, a.start_date, a.end_date, a.allocation_pct
+    FROM projects p
+    JOIN project_assignments a ON a.proj_id = p.proj_id
+    JOIN employee e ON e.emp_id = a.emp_id
+    WHERE p.workshop_name = %s AND p.proj_id = %s
+    ORDER BY a.start_date ASC
+""", ('assignment_id', 'emp_id', 'first_name', 'last_name', 'role', 'start_date', 'end_date', 'allocation_pct'),
+    indexes=(('projects', ('proj_id',)), ('project_assignments', ('proj_id',)), ('employee', ('emp_id',))))
+
+# Locks every assignment (and the gaps between them) until the rebuild commits,
+# so an assignment added or removed meanwhile waits instead of losing its load rows
+ASSIGNMENT_ALL = Query('assignment_all', """
+    SELECT e.workshop_name, a.emp_id, a.start_date, a.end_date, a.allocation_pct
+    FROM project_assignments a JOIN employee e ON e.emp_id = a.emp_id
+    FOR UPDATE OF a
+""", ('workshop_name', 'emp_id', 'start_date', 'end_date', 'allocation_pct'),
+    indexes=(('employee', ('emp_id',)),))
+
+# Per-day load, maintained by adding (or subtracting) one row per assignment day
+DAILY_LOAD_BUMP = Query('daily_load_bump', """
+    INSERT INTO employee_daily_load (emp_id, day, allocation_pct, assignments) VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE allocation_pct = allocation_pct + VALUES(allocation_pct),
+        assignments = assignments + VALUES(assignments)
+""")
+
+DAILY_CAPACITY_BUMP = Query('daily_capacity_bump', """
+    INSERT INTO daily_capacity (workshop_name, day, allocation_pct, assignments) VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE allocation_pct = allocation_pct + VALUES(allocation_pct),
+        assignments = assignments + VALUES(assignments)
+""")
+
+DAILY_LOAD_CLEAR = Query('daily_load_clear', "DELETE FROM employee_daily_load")
+
+DAILY_CAPACITY_CLEAR = Query('daily_capacity_clear', "DELETE FROM daily_capacity")
+
+COUNTER_VALUE = Query('counter_value', "SELECT value FROM dashboard_counters WHERE name = %s", ('value',),
+    indexes=(('dashboard_counters', ('name',)),))
+
+CAPACITY_RANGE = Query('capacity_range', """
+    SELECT day, allocation_pct, assignments FROM daily_capacity
+    WHERE workshop_name = %s AND day BETWEEN %s AND %s
+    ORDER BY day ASC
+""", ('day', 'allocation_pct', 'assignments'),
+    indexes=(('daily_capacity', ('workshop_name', 'day')),))
+
+# One pass per employee over the window: distinct projects, overlapping assignment
+# pairs (self-join), and peak / overloaded days from the precomputed daily load.
+# Each derived table starts from the workshop's employees, so only their rows are
+# aggregated. Optional filters are passed twice: (NULL, NULL) disables one.
+EMPLOYEE_WORKLOAD = Query('employee_workload', """
+    SELECT e.emp_id, e.first_name, e.last_name, e.role, e.workshop_name, e.design_category,
+        COALESCE(a.active_projects, 0), COALESCE(o.overlaps, 0),
+        COALESCE(l.peak_allocation, 0), COALESCE(l.overloaded_days, 0),
+        CASE
+            WHEN COALESCE(l.peak_allocation, 0) > 100 THEN 'overloaded'
+            WHEN COALESCE(l.peak_allocation, 0) = 0 THEN 'free'
+            ELSE 'partial'
+        END
+    FROM employee e
+    JOIN login lg ON lg.emp_id = e.emp_id AND lg.permission = 'TRUE'
+    LEFT JOIN (
+        SELECT pa.emp_id, COUNT(DISTINCT pa.proj_id) AS active_projects
+        FROM employee we JOIN project_assignments pa ON pa.emp_id = we.emp_id
+        WHERE we.workshop_name = %s AND pa.end_date >= %s AND pa.start_date <= %s
+        GROUP BY pa.emp_id
+    ) a ON a.emp_id = e.emp_id
+    LEFT JOIN (
+        SELECT x.emp_id, COUNT(*) AS overlaps
+        FROM employee we
+        JOIN project_assignments x ON x.emp_id = we.emp_id
+        JOIN project_assignments y ON y.emp_id = x.emp_id AND y.assignment_id > x.assignment_id
+            AND y.start_date <= x.end_date AND y.end_date >= x.start_date
+        WHERE we.workshop_name = %s AND x.end_date >= %s AND x.start_date <= %s AND y.end_date >= %s AND y.start_date <= %s
+        GROUP BY x.emp_id
+    ) o ON o.emp_id = e.emp_id
+    LEFT JOIN (
+        SELECT dl.emp_id, MAX(dl.allocation_pct) AS peak_allocation,
+            CAST(SUM(dl.allocation_pct > 100) AS SIGNED) AS overloaded_days
+        FROM employee we JOIN employee_daily_load dl ON dl.emp_id = we.emp_id
+        WHERE we.workshop_name = %s AND dl.day BETWEEN %s AND %s
+        GROUP BY dl.emp_id
+    ) l ON l.emp_id = e.emp_id
+    WHERE e.workshop_name = %s
+        AND (%s IS NULL OR e.role = %s)
+        AND (%s IS NULL OR e.design_category = %s)
+    ORDER BY COALESCE(l.peak_allocation, 0) DESC, e.first_name ASC
+""", ('emp_id', 'first_name', 'last_name', 'role', 'workshop_name', 'design_category',
+      'active_projects', 'overlapping_assignments', 'peak_allocation_pct', 'overloaded_days', 'availability'),
+    indexes=(('employee', ('workshop_name',)), ('project_assignments', ('emp_id', 'end_date')),
+             ('employee_daily_load', ('emp_id', 'day')), ('login', ('emp_id',))))
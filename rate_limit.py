@@ -0,0 +1,237 @@
+from flask import request, jsonify, g
+from config import SECRET_KEY
+from collections import OrderedDict
+import jwt
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+
+# Admission control, run in before_request so rejected requests never verify
+# their token against the database or take a pooled connection.
+#  - Token bucket per client: user_id from the JWT (signature checked locally),
+#    or the remote IP for /login and requests without a valid token. 429 when empty.
+#  - Concurrency cap per route class in each worker process. 503 when full.
+# rate_limit_store=sqlite:/path/to/file shares buckets between the workers of one
+# host; the default keeps them in process memory.
+# admit() holds the framework-independent part, so fbms_asgi applies the same
+# buckets and caps to its coroutine routes.
+
+RATE_LIMIT_STORE = os.getenv('rate_limit_store', 'memory')
+RATE_LIMIT_MAX_KEYS = int(os.getenv('rate_limit_max_keys', '10000'))
+
+# Probes and status views (health.py) must answer while the service is saturated
+UNMETERED_PATHS = frozenset(('/healthz', '/readyz', '/health/db', '/debug/pool'))
+
+
+def _setting(route_class, rate, burst, concurrency):
+    # Overridable per class, e.g. rate_limit_login_rate=0.5, max_concurrent_login=2
+    return (
+        float(os.getenv(f'rate_limit_{route_class}_rate', rate)),    # tokens refilled per second
+        float(os.getenv(f'rate_limit_{route_class}_burst', burst)),  # bucket size
+        int(os.getenv(f'max_concurrent_{route_class}', concurrency))  # 0 = no cap
+    )
+
+
+LIMITS = {
+    'login': _setting('login', 0.2, 5, 4),      # bcrypt is CPU bound
+    'search': _setting('search', 5, 20, 8),     # /clients/suggestions, polled while typing
+    'export': _setting('export', 0.05, 3, 2),   # holds three connections while streaming
+    'read': _setting('read', 10, 50, 32),
+    'write': _setting('write', 2, 20, 16),
+}
+
+
+def route_class(path, method):
+    if path == '/login':
+        return 'login'
+    if path == '/clients/suggestions':
+        return 'search'
+    if path == '/projects/export':
+        return 'export'
+    return 'read' if method in ('GET', 'HEAD') else 'write'
+
+
+# ===== Bucket stores =====
+# take() returns 0 when a token was taken, otherwise the seconds until one is available.
+
+class MemoryStore:
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()  # key -> [tokens, updated, rate, burst], least recently used first
+        self.lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                # A flood from many addresses must not grow the dict without
+                # bound; the least recently seen client starts over with a full bucket
+                while len(self.buckets) >= self.max_keys:
+                    self.buckets.popitem(last=False)
+                bucket = self.buckets[key] = [burst, now, rate, burst]
+            else:
+                self.buckets.move_to_end(key)
+            tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if tokens >= 1:
+                bucket[0] = tokens - 1
+                return 0
+            bucket[0] = tokens
+            return (1 - tokens) / rate
+
+
+class SQLiteStore:
+    # One small file per host; BEGIN IMMEDIATE serialises the read-modify-write
+    # between worker processes.
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        connection = self._connection()
+        connection.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+
+    def _connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def take(self, key, rate, burst):
+        now = time.time()  # shared between processes, so wall clock rather than monotonic
+        connection = self._connection()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + max(0.0, now - row[1]) * rate)
+            wait = 0 if tokens >= 1 else (1 - tokens) / rate
+            if tokens >= 1:
+                tokens -= 1
+            connection.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now))
+            self.local.writes = getattr(self.local, 'writes', 0) + 1
+            if self.local.writes % 1000 == 0:
+                # An hour idle refills every configured bucket
+                connection.execute("DELETE FROM buckets WHERE updated < ?", (now - 3600,))
+            connection.execute("COMMIT")
+            return wait
+        except sqlite3.Error as e:
+            # Fail open: a broken limiter must not take the API down with it
+            logging.warning(f"Rate limit store unavailable, allowing request: {e}")
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            return 0
+
+
+if RATE_LIMIT_STORE.startswith('sqlite:'):
+    store = SQLiteStore(RATE_LIMIT_STORE[len('sqlite:'):])
+else:
+    store = MemoryStore(RATE_LIMIT_MAX_KEYS)
+
+
+# ===== Concurrency caps =====
+
+class Gate:
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def enter(self):
+        with self.lock:
+            if self.limit and self.in_flight >= self.limit:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+
+gates = {name: Gate(concurrency) for name, (_, _, concurrency) in LIMITS.items()}
+throttled = {name: 0 for name in LIMITS}
+throttled_lock = threading.Lock()
+
+
+def client_key(route, headers, remote_addr):
+    if route != 'login':
+        token = headers.get('Authorization', '')
+        if token.startswith("Bearer "):
+            token = token[7:]
+        if token:
+            try:
+                return f"user:{jwt.decode(token, SECRET_KEY, algorithms=['HS256'])['user_id']}"
+            except (jwt.InvalidTokenError, KeyError):
+                pass  # token_required rejects it later; meanwhile count it against the address
+    # Behind a reverse proxy, wrap the app in werkzeug's ProxyFix so this is the client address
+    return f"ip:{remote_addr}"
+
+
+def retry_after(seconds):
+    return str(max(1, math.ceil(seconds)))
+
+
+def admit(path, method, headers, remote_addr):
+    # (gate, None) when admitted, where gate (or None) must be left afterwards;
+    # (None, (status, message, retry_after seconds)) when rejected
+    # CORS preflight carries no credentials and is answered without touching the database
+    if method == 'OPTIONS' or path in UNMETERED_PATHS:
+        return None, None
+    route = route_class(path, method)
+    rate, burst, _ = LIMITS[route]
+
+    key = client_key(route, headers, remote_addr)
+    wait = store.take(f"{route}:{key}", rate, burst) if rate > 0 else 0
+    if wait:
+        with throttled_lock:
+            throttled[route] += 1
+        logging.warning(f"Rate limit exceeded for {key} on {route} ({path})")
+        return None, (429, 'Too many requests', wait)
+
+    gate = gates[route]
+    if not gate.enter():
+        logging.warning(f"Concurrency cap of {gate.limit} reached for {route}, shedding {path}")
+        return None, (503, 'Server busy, please retry shortly', 1)
+    return gate, None
+
+
+def admit_request():
+    gate, rejection = admit(request.path, request.method, request.headers, request.remote_addr)
+    if rejection:
+        status, message, wait = rejection
+        response = jsonify({'error': message})
+        response.status_code = status
+        response.headers['Retry-After'] = retry_after(wait)
+        return response
+    if gate is not None:
+        g.admission_gate = gate
+    return None
+
+
+def release_request(exc=None):
+    # teardown runs after a streamed body finishes, so exports hold their slot until done
+    gate = g.pop('admission_gate', None)
+    if gate is not None:
+        gate.leave()
+
+
+def stats():
+    with throttled_lock:
+        counts = dict(throttled)
+    return {name: {'in_flight': gate.in_flight, 'limit': gate.limit, 'rejected': gate.rejected,
+                   'throttled': counts[name]}
+            for name, gate in gates.items()}
+
+
+def init_rate_limiting(app):
+    app.before_request(admit_request)
+    app.teardown_request(release_request)
+    logging.info(f"Rate limiting enabled ({'shared sqlite' if isinstance(store, SQLiteStore) else 'in-process'} store)")
@@ -0,0 +1,89 @@
+from config import POOL_TIMEOUT, sessions
+import logging
+import threading
+
+# Request coalescing for hot reads. While one request (the leader) is running a
+# load, identical requests wait for its result instead of repeating the queries
+# and taking pooled connections of their own. Loads must return plain data that
+# is safe to share, never a Response.
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+
+    def __init__(self, name, wait_timeout=POOL_TIMEOUT * 2):
+        self.name = name
+        self.wait_timeout = wait_timeout
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def do(self, key, load):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+                self.leaders += 1
+
+        if not leader:
+            if call.done.wait(self.wait_timeout):
+                with self.lock:
+                    self.coalesced += 1
+                if call.error is not None:
+                    raise call.error
+                return call.result
+            # The leader is stuck; do not let every follower hang with it
+            with self.lock:
+                self.timeouts += 1
+            logging.warning(f"Single-flight wait timed out for {self.name} {key}, loading directly")
+            return load()
+
+        try:
+            call.result = load()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self.lock:
+            return {'leaders': self.leaders, 'coalesced': self.coalesced, 'timeouts': self.timeouts,
+                    'in_flight': len(self.calls)}
+
+
+groups = {}
+
+
+def group(name):
+    if name not in groups:
+        groups[name] = SingleFlight(name)
+    return groups[name]
+
+
+def shared_read(flight, key, decoded, load):
+    # The workshop and role are part of the key so results never cross tenants
+    # or permission scopes.
+    # Users inside their read-your-writes window skip coalescing, because an
+    # in-flight load may have started before their write committed.
+    if sessions.is_pinned(decoded['user_id']):
+        return load()
+    return flight.do((decoded.get('tenant'), decoded.get('role')) + key, load)
+
+
+def stats():
+    return {name: flight.stats() for name, flight in groups.items()}
@@ -0,0 +1,328 @@
+import re
+from datetime import date
+
+
+# ===== Precompiled patterns =====
+# Compiled once at import instead of rebuilding the pattern string per request.
+NAME_RE = re.compile(r'^[A-Za-z\s\-]+$')
+CLIENT_EMAIL_RE = re.compile(r'^[\w\.-]+@[\w\.-]+\.\w{2,}$')
+EMPLOYEE_EMAIL_RE = re.compile(r'^[\w\.-]+@[\w\.-]+\.\w{2,4}$')
+CONTACT_RE = re.compile(r'^\+?\d{10,15}$')
+NIC_RE = re.compile(r'^(?:\d{12}|\d{9}V)$')
+DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+# ===== Reusable field validators =====
+# A validator takes the raw value and returns the converted value, or raises
+# ValueError carrying the message that is sent back to the client.
+
+def matches(pattern, message):
+    match = pattern.match
+
+    def validator(value):
+        if not isinstance(value, str) or not match(value):
+            raise ValueError(message)
+        return value
+    return validator
+
+
+def iso_date(message):
+    def validator(value):
+        if isinstance(value, date):
+            return value
+        if not isinstance(value, str) or not DATE_RE.match(value):
+            raise ValueError(message)
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise ValueError(message)
+    return validator
+
+
+def not_future(message):
+    def validator(value):
+        if value > date.today():
+            raise ValueError(message)
+        return value
+    return validator
+
+
+def future(message):
+    def validator(value):
+        if value <= date.today():
+            raise ValueError(message)
+        return value
+    return validator
+
+
+def min_age(years, message):
+    def validator(value):
+        if (date.today() - value).days / 365.25 < years:
+            raise ValueError(message)
+        return value
+    return validator
+
+
+def as_float(message):
+    def validator(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            raise ValueError(message)
+    return validator
+
+
+def as_int(message):
+    def validator(value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise ValueError(message)
+    return validator
+
+
+def positive(message):
+    def validator(value):
+        if value <= 0:
+            raise ValueError(message)
+        return value
+    return validator
+
+
+def at_most(limit, message):
+    def validator(value):
+        if value > limit:
+            raise ValueError(message)
+        return value
+    return validator
+
+
+def non_negative(message):
+    def validator(value):
+        if value < 0:
+            raise ValueError(message)
+        return value
+    return validator
+
+
+# ===== Query string flags =====
+# args is request.args of either the Flask or the Quart request.
+
+def flag(args, name):
+    return args.get(name, '').lower() in ('1', 'true', 'yes')
+
+
+def include_archived(args):
+    # ?include_archived=1 adds archived projects to the list and lets single-project
+    # reads fall through to the archive tables (see archive.py)
+    return flag(args, 'include_archived')
+
+
+class Field:
+    __slots__ = ('name', 'validators', 'always')
+
+    # Validators only run for non-empty values unless always=True, which is how
+    # optional fields such as last_name or contact_nu behave in the handlers.
+    def __init__(self, name, *validators, always=False):
+        self.name = name
+        self.validators = validators
+        self.always = always
+
+
+class Schema:
+
+    def __init__(self, fields, required=(), required_message=None, checks=()):
+        self.fields = fields
+        self.required = required
+        self.required_message = required_message
+        self.checks = checks
+
+    def validate(self, data):
+        # Returns (cleaned, None) on success or (None, error_message)
+        if not isinstance(data, dict):
+            return None, 'Request body must be a JSON object'
+
+        for name in self.required:
+            if not data.get(name):
+                return None, self.required_message
+
+        cleaned = {}
+        for field in self.fields:
+            value = data.get(field.name)
+            if value or field.always:
+                try:
+                    for validator in field.validators:
+                        value = validator(value)
+                except ValueError as e:
+                    return None, str(e)
+            cleaned[field.name] = value
+
+        for check in self.checks:
+            error = check(cleaned)
+            if error:
+                return None, error
+
+        return cleaned, None
+
+    def validate_batch(self, items):
+        # Entry point for bulk endpoints: validates every item and reports all
+        # failures by index instead of stopping at the first one.
+        valid = []
+        errors = []
+        for index, item in enumerate(items):
+            cleaned, error = self.validate(item)
+            if error:
+                errors.append({'index': index, 'error': error})
+            else:
+                valid.append(cleaned)
+        return valid, errors
+
+
+# ===== Schemas =====
+
+_first_name = Field('first_name', matches(NAME_RE, 'First name must contain only letters, spaces, or hyphens'))
+_last_name = Field('last_name', matches(NAME_RE, 'Last name must contain only letters, spaces, or hyphens'))
+
+CLIENT_SCHEMA = Schema(
+    fields=(
+        _first_name,
+        _last_name,
+        Field('country'),
+        Field('company'),
+        Field('email', matches(CLIENT_EMAIL_RE, 'Invalid email format')),
+        Field('contact_nu', matches(CONTACT_RE, 'Contact number must be 10 to 15 digits and may start with "+"')),
+    ),
+    required=('email', 'first_name'),
+    required_message='Client ID, first name, and email are required',
+)
+
+_employee_fields = (
+    _first_name,
+    _last_name,
+    Field('email', matches(EMPLOYEE_EMAIL_RE, 'Invalid email format')),
+    Field('address'),
+    Field('nic', matches(NIC_RE, 'NIC must be 12 digits or 9 digits followed by capital "V"')),
+    Field('birth_day',
+          iso_date('Invalid birth_day format. Use YYYY-MM-DD'),
+          min_age(18, 'Employee must be at least 18 years old'),
+          always=True),
+    Field('role'),
+    Field('workshop_name'),
+    Field('design_category'),
+)
+
+EMPLOYEE_SCHEMA = Schema(
+    fields=_employee_fields + (Field('permission'),),
+    required=('first_name', 'email', 'nic'),
+    required_message='Name, email and NIC are required',
+)
+
+EMPLOYEE_UPDATE_SCHEMA = Schema(
+    fields=_employee_fields + (Field('password'),),
+    required=('first_name', 'email', 'nic'),
+    required_message='First name, email, and NIC are required',
+)
+
+INVENTORY_SCHEMA = Schema(
+    fields=(
+        Field('name'),
+        Field('shop'),
+        Field('buying_date',
+              iso_date('Invalid buying_date format. Use YYYY-MM-DD'),
+              not_future('Buying date must not be in the future')),
+        Field('price',
+              as_float('Price must be a number'),
+              positive('Price must be greater than zero')),
+        Field('quantity',
+              as_int('Quantity must be a whole number'),
+              positive('Quantity must be a positive number')),
+        Field('location'),
+        Field('reorder_threshold',
+              as_int('Reorder threshold must be a whole number'),
+              non_negative('Reorder threshold must not be negative')),
+    ),
+    required=('name', 'buying_date', 'price', 'quantity', 'location'),
+    required_message='Missing one or more required fields: name, buying_date, price, quantity, location',
+)
+
+
+def _start_before_end(cleaned):
+    if cleaned['start_date'] >= cleaned['end_date']:
+        return 'Start Date must be before End Date'
+    return None
+
+
+def _end_in_future(cleaned):
+    if cleaned['end_date'] <= date.today():
+        return 'End Date must be a future date'
+    return None
+
+
+PROJECT_SCHEMA = Schema(
+    fields=(
+        Field('proj_name'),
+        Field('start_date', iso_date('Invalid start_date format. Use YYYY-MM-DD')),
+        Field('end_date', iso_date('Invalid end_date format. Use YYYY-MM-DD')),
+        Field('status'),
+        Field('url'),
+        Field('remarks'),
+        Field('client_id'),
+    ),
+    required=('proj_name', 'start_date', 'end_date', 'status'),
+    required_message='Project Name, Start Date, End Date, and Status are required.',
+    checks=(_start_before_end, _end_in_future),
+)
+
+
+def _assignment_dates(cleaned):
+    if cleaned['start_date'] and cleaned['end_date'] and cleaned['start_date'] > cleaned['end_date']:
+        return 'Start Date must not be after End Date'
+    return None
+
+
+# Dates default to the project's own dates in the handler
+ASSIGNMENT_SCHEMA = Schema(
+    fields=(
+        Field('emp_id', as_int('Employee ID must be a whole number'), positive('Employee ID must be positive')),
+        Field('start_date', iso_date('Invalid start_date format. Use YYYY-MM-DD')),
+        Field('end_date', iso_date('Invalid end_date format. Use YYYY-MM-DD')),
+        Field('allocation_pct',
+              as_int('Allocation must be a whole number'),
+              positive('Allocation must be greater than zero'),
+              at_most(100, 'Allocation cannot exceed 100 percent')),
+    ),
+    required=('emp_id',),
+    required_message='Employee ID is required',
+    checks=(_assignment_dates,),
+)
+
+
+if __name__ == '__main__':
+    # Micro-benchmark of per-request validation cost
+    import timeit
+
+    samples = {
+        'client': (CLIENT_SCHEMA, {
+            'first_name': 'Nimal', 'last_name': 'Perera', 'country': 'Sri Lanka', 'company': 'Acme',
+            'email': 'nimal@example.com', 'contact_nu': '+94771234567'
+        }),
+        'employee': (EMPLOYEE_SCHEMA, {
+            'first_name': 'Kamal', 'last_name': 'Silva', 'email': 'kamal@example.com', 'address': 'Colombo',
+            'nic': '199012345678', 'birth_day': '1990-05-01', 'role': 'designer',
+            'workshop_name': 'Main', 'design_category': 'Interior', 'permission': 'TRUE'
+        }),
+        'inventory': (INVENTORY_SCHEMA, {
+            'name': 'Plywood', 'shop': 'Hardware Co', 'buying_date': '2024-01-15',
+            'price': '2500.00', 'quantity': '40', 'location': 'Store A'
+        }),
+    }
+
+    rounds = 100000
+    for label, (schema, payload) in samples.items():
+        seconds = timeit.timeit(lambda: schema.validate(payload), number=rounds)
+        print(f"{label:<10} {seconds / rounds * 1e6:8.2f} us/validation")
+
+    schema, payload = samples['inventory']
+    batch = [payload] * 1000
+    seconds = timeit.timeit(lambda: schema.validate_batch(batch), number=100)
+    print(f"{'batch':<10} {seconds / 100 * 1e3:8.2f} ms/1000 items")
@@ -1,14 +1,10 @@
 from flask import request, jsonify, Blueprint
 import jwt
 import logging
-from config import get_db_connection
-from dotenv import load_dotenv
-import os
+from config import get_db_connection, SECRET_KEY
+import queries
 from functools import wraps
 
-load_dotenv()
-SECRET_KEY = os.getenv('jwt_secret_key')
-
 tok = Blueprint('verify_jwt_token', __name__)
 
 @tok.route('/verify-token', methods=['GET'])
@@ -21,6 +17,8 @@ def verify_jwt_token():
     if token.startswith("Bearer "):
         token = token[7:]
 
+    connection = None
+    cursor = None
     try:
         decoded = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
         user_id = decoded['user_id']
@@ -28,9 +26,11 @@ def verify_jwt_token():
         logging.info(f"Token decoded for user ID: {user_id} and email: {email}")
 
         connection = get_db_connection()
+        if connection is None:
+            logging.error("Failed to establish database connection for token check")
+            return None, jsonify({'error': 'Database unavailable, try again shortly'}), 503
         cursor = connection.cursor()
-        cursor.execute("SELECT jwt_token FROM login WHERE emp_id = %s AND email = %s", (user_id, email))
-        result = cursor.fetchone()
+        result = queries.fetchone(cursor, queries.LOGIN_TOKEN, (user_id, email))
 
         if result and result[0] == token:
             logging.info(f"Token is valid for user ID: {user_id}")
@@ -71,25 +71,33 @@ def verify_jwt_token():
 #         if connection:
 #             connection.close()
 
+def is_path_allowed(allowed_paths, request_path):
+    # Check if any of the allowed paths is a prefix of the request_path
+    for allowed_path in allowed_paths:
+        # Ensure allowed_path ends with a '/' if it's a directory-like path
+        # and request_path is a sub-path
+        if allowed_path.endswith('/') and request_path.startswith(allowed_path):
+            return True
+        # For exact matches on non-dynamic paths
+        elif request_path == allowed_path:
+            return True
+    return False
+
 def check_path_permission(decoded, request_path):
+    # None when the database could not be reached
     user_role = decoded.get('role')  
     connection = get_db_connection()
+    if connection is None:
+        logging.error(f"Failed to establish database connection for permission check on {request_path}")
+        return None
     cursor = connection.cursor()
 
     try:
-        cursor.execute("SELECT path FROM path_permission WHERE role = %s", (user_role,))
-        allowed_paths = [row[0] for row in cursor.fetchall()]
+        allowed_paths = [row[0] for row in queries.fetchall(cursor, queries.PATH_PERMISSIONS, (user_role,))]
+
+        if is_path_allowed(allowed_paths, request_path):
+            return True
 
-        # Check if any of the allowed paths is a prefix of the request_path
-        for allowed_path in allowed_paths:
-            # Ensure allowed_path ends with a '/' if it's a directory-like path
-            # and request_path is a sub-path
-            if allowed_path.endswith('/') and request_path.startswith(allowed_path):
-                return True
-            # For exact matches on non-dynamic paths
-            elif request_path == allowed_path:
-                return True
-        
         logging.warning(f"Access denied for role: {user_role} on path: {request_path}")
         return False
     finally:
@@ -104,9 +112,17 @@ def token_required(f):
         decoded, error_response, status_code = verify_jwt_token()
         if error_response:
             return error_response, status_code
+
+        # Tokens issued before workshop scoping carry no tenant claim
+        if not decoded.get('tenant'):
+            logging.warning(f"Token without workshop claim for user ID: {decoded.get('user_id')}")
+            return jsonify({'error': 'Token has no workshop, please sign in again'}), 401
         
         request_path = request.path
-        if not check_path_permission(decoded, request_path):
+        allowed = check_path_permission(decoded, request_path)
+        if allowed is None:
+            return jsonify({'error': 'Database unavailable, try again shortly'}), 503
+        if not allowed:
             return jsonify({'error': 'Access denied'}), 403
         
         return f(decoded, *args, **kwargs)
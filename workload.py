@@ -0,0 +1,270 @@
+from flask import Blueprint, jsonify, request
+from config import get_db_connection
+from verify_jwt import token_required
+from validation import ASSIGNMENT_SCHEMA
+from json_provider import rows_response
+from project_management import date_window
+from dashboard import ACTIVE_EMPLOYEES, counter_key
+from datetime import timedelta
+import logging
+import pymysql
+import queries
+
+ER_NO_REFERENCED_ROW = 1452  # foreign key violation on insert
+
+# Employee-to-project assignments and the scheduling views built on them.
+# Every assignment adds its allocation to employee_daily_load (per employee, per
+# day) and daily_capacity (per workshop and day) in the same transaction, so the
+# workload and capacity reads aggregate a bounded window of precomputed rows
+# instead of expanding every assignment on each request.
+# The 'rebuild_workload' job (`python jobs.py enqueue rebuild_workload`)
+# recomputes both tables from project_assignments.
+
+work = Blueprint('workload', __name__)
+
+
+def _days(start, end):
+    day = start
+    while day <= end:
+        yield day
+        day += timedelta(days=1)
+
+
+def apply_load(cursor, tenant, emp_id, start, end, allocation_pct, sign=1):
+    # sign=-1 takes a removed assignment back out of the daily tables
+    days = list(_days(start, end))
+    queries.executemany(cursor, queries.DAILY_LOAD_BUMP,
+                        [(emp_id, day, sign * allocation_pct, sign) for day in days])
+    queries.executemany(cursor, queries.DAILY_CAPACITY_BUMP,
+                        [(tenant, day, sign * allocation_pct, sign) for day in days])
+
+
+def rebuild_daily_load(cursor, payload):
+    # Job handler; the worker commits the rebuild together with the job status.
+    # ASSIGNMENT_ALL holds its locks until then, see queries.
+    load = {}
+    capacity = {}
+    assignments = queries.fetchall(cursor, queries.ASSIGNMENT_ALL)
+    for tenant, emp_id, start, end, allocation_pct in assignments:
+        for day in _days(start, end):
+            entry = load.setdefault((emp_id, day), [0, 0])
+            entry[0] += allocation_pct
+            entry[1] += 1
+            entry = capacity.setdefault((tenant, day), [0, 0])
+            entry[0] += allocation_pct
+            entry[1] += 1
+
+    queries.execute(cursor, queries.DAILY_LOAD_CLEAR)
+    queries.execute(cursor, queries.DAILY_CAPACITY_CLEAR)
+    queries.executemany(cursor, queries.DAILY_LOAD_BUMP,
+                        [(emp_id, day, pct, count) for (emp_id, day), (pct, count) in load.items()])
+    queries.executemany(cursor, queries.DAILY_CAPACITY_BUMP,
+                        [(tenant, day, pct, count) for (tenant, day), (pct, count) in capacity.items()])
+    logging.info(f"Rebuilt daily load from {len(assignments)} assignment(s): {len(load)} employee-days, {len(capacity)} workshop-days")
+    return {'assignments': len(assignments), 'employee_days': len(load), 'workshop_days': len(capacity)}
+
+
+@work.route('/projects/<int:proj_id>/assignments', methods=['POST'])
+@token_required
+def add_assignment(decoded, proj_id):
+    logging.info(f"POST request received for /projects/{proj_id}/assignments")
+    assignment, error = ASSIGNMENT_SCHEMA.validate(request.get_json())
+    if error:
+        logging.warning(f"Assignment validation failed: {error}")
+        return jsonify({'error': error}), 400
+
+    connection = None
+    cursor = None
+    try:
+        connection = get_db_connection(session=decoded['user_id'])
+        if connection is None:
+            logging.error(f"Failed to establish database connection for POST /projects/{proj_id}/assignments")
+            return jsonify({'error': 'Failed to connect to the database'}), 500
+        cursor = connection.cursor()
+
+        tenant = decoded['tenant']
+        project = queries.fetchone(cursor, queries.PROJECT_DATES, (tenant, proj_id))
+        if not project:
+            return jsonify({'error': 'Project not found'}), 404
+        # The foreign key only proves the employee exists somewhere
+        if not queries.fetchone(cursor, queries.EMPLOYEE_IN_WORKSHOP, (tenant, assignment['emp_id'])):
+            return jsonify({'error': 'Employee not found'}), 400
+
+        # Unspecified dates cover the whole project
+        start = assignment['start_date'] or project[0]
+        end = assignment['end_date'] or project[1]
+        if not start or not end:
+            return jsonify({'error': 'The project has no dates; start_date and end_date are required'}), 400
+        if start > end:
+            return jsonify({'error': 'Start Date must not be after End Date'}), 400
+        allocation_pct = assignment['allocation_pct'] or 100
+
+        try:
+            queries.execute(cursor, queries.ASSIGNMENT_INSERT, (proj_id, assignment['emp_id'], start, end, allocation_pct))
+        except pymysql.IntegrityError as e:
+            # The project was checked above, so a missing parent is the employee
+            if e.args[0] != ER_NO_REFERENCED_ROW:
+                raise
+            connection.rollback()
+            return jsonify({'error': 'Employee not found'}), 400
+        assignment_id = cursor.lastrowid
+        apply_load(cursor, tenant, assignment['emp_id'], start, end, allocation_pct)
+        connection.commit()
+
+        logging.info(f"Employee {assignment['emp_id']} assigned to project {proj_id} ({allocation_pct}% from {start} to {end})")
+        return jsonify({'message': 'Employee assigned successfully', 'assignment_id': assignment_id,
+                        'proj_id': proj_id, 'emp_id': assignment['emp_id'], 'start_date': start,
+                        'end_date': end, 'allocation_pct': allocation_pct}), 201
+
+    except Exception as e:
+        if connection:
+            connection.rollback()
+        logging.error(f"Error processing POST request for /projects/{proj_id}/assignments: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            connection.close()
+
+
+@work.route('/projects/<int:proj_id>/assignments', methods=['GET'])
+@token_required
+def get_assignments(decoded, proj_id):
+    logging.info(f"GET request received for /projects/{proj_id}/assignments")
+    connection = None
+    cursor = None
+    try:
+        connection = get_db_connection(read_only=True, session=decoded['user_id'])
+        if connection is None:
+            logging.error(f"Failed to establish database connection for GET /projects/{proj_id}/assignments")
+            return jsonify({'error': 'Failed to connect to the database'}), 500
+        cursor = connection.cursor()
+        results = queries.fetchall(cursor, queries.ASSIGNMENT_LIST_PROJECT, (decoded['tenant'], proj_id))
+        return rows_response(queries.ASSIGNMENT_LIST_PROJECT.columns, results)
+
+    except Exception as e:
+        logging.error(f"Error processing GET request for /projects/{proj_id}/assignments: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            connection.close()
+
+
+@work.route('/assignments/<int:assignment_id>', methods=['DELETE'])
+@token_required
+def delete_assignment(decoded, assignment_id):
+    logging.info(f"DELETE request received for /assignments/{assignment_id}")
+    connection = None
+    cursor = None
+    try:
+        connection = get_db_connection(session=decoded['user_id'])
+        if connection is None:
+            logging.error(f"Failed to establish database connection for DELETE /assignments/{assignment_id}")
+            return jsonify({'error': 'Failed to connect to the database'}), 500
+        cursor = connection.cursor()
+
+        connection.begin()
+        row = queries.fetchone(cursor, queries.ASSIGNMENT_LOCK, (decoded['tenant'], assignment_id))
+        if not row:
+            connection.rollback()
+            return jsonify({'error': 'Assignment not found'}), 404
+        emp_id, start, end, allocation_pct = row
+        queries.execute(cursor, queries.ASSIGNMENT_DELETE, (assignment_id,))
+        apply_load(cursor, decoded['tenant'], emp_id, start, end, allocation_pct, sign=-1)
+        connection.commit()
+
+        logging.info(f"Assignment {assignment_id} removed")
+        return jsonify({'message': 'Assignment removed successfully'}), 200
+
+    except Exception as e:
+        if connection:
+            connection.rollback()
+        logging.error(f"Error processing DELETE request for /assignments/{assignment_id}: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            connection.close()
+
+
+@work.route('/employees/workload', methods=['GET'])
+@token_required
+def get_workload(decoded):
+    # Active employees of the caller's workshop with their load over ?from=&to=,
+    # optionally filtered by ?role= and ?design_category=
+    logging.info(f"GET request received for /employees/workload with args: {dict(request.args)}")
+    window_start, window_end, error = date_window()
+    if error:
+        return jsonify({'error': error}), 400
+    role = request.args.get('role') or None
+    category = request.args.get('design_category') or None
+
+    connection = None
+    cursor = None
+    try:
+        connection = get_db_connection(read_only=True, session=decoded['user_id'])
+        if connection is None:
+            logging.error("Failed to establish database connection for GET /employees/workload")
+            return jsonify({'error': 'Failed to connect to the database'}), 500
+        cursor = connection.cursor()
+        tenant = decoded['tenant']
+        results = queries.fetchall(cursor, queries.EMPLOYEE_WORKLOAD, (
+            tenant, window_start, window_end,
+            tenant, window_start, window_end, window_start, window_end,
+            tenant, window_start, window_end,
+            tenant, role, role, category, category
+        ))
+        logging.info(f"Retrieved workload for {len(results)} employees")
+        return rows_response(queries.EMPLOYEE_WORKLOAD.columns, results)
+
+    except Exception as e:
+        logging.error(f"Error processing GET request for /employees/workload: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            connection.close()
+
+
+@work.route('/workload/capacity', methods=['GET'])
+@token_required
+def get_capacity(decoded):
+    # One row per day in ?from=&to=; capacity is 100% per active employee
+    logging.info(f"GET request received for /workload/capacity with args: {dict(request.args)}")
+    window_start, window_end, error = date_window()
+    if error:
+        return jsonify({'error': error}), 400
+
+    connection = None
+    cursor = None
+    try:
+        connection = get_db_connection(read_only=True, session=decoded['user_id'])
+        if connection is None:
+            logging.error("Failed to establish database connection for GET /workload/capacity")
+            return jsonify({'error': 'Failed to connect to the database'}), 500
+        cursor = connection.cursor()
+        tenant = decoded['tenant']
+        booked = {row[0]: row for row in queries.fetchall(cursor, queries.CAPACITY_RANGE, (tenant, window_start, window_end))}
+        row = queries.fetchone(cursor, queries.COUNTER_VALUE, (counter_key(tenant, ACTIVE_EMPLOYEES),))
+        capacity_pct = (row[0] if row else 0) * 100
+
+        days = []
+        for day in _days(window_start, window_end):
+            _, allocation_pct, assignments = booked.get(day, (day, 0, 0))
+            days.append({'day': day, 'allocated_pct': allocation_pct, 'assignments': assignments,
+                         'capacity_pct': capacity_pct, 'free_pct': capacity_pct - allocation_pct})
+        return jsonify({'from': window_start, 'to': window_end, 'days': days}), 200
+
+    except Exception as e:
+        logging.error(f"Error processing GET request for /workload/capacity: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            connection.close()